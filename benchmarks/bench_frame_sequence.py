@@ -0,0 +1,179 @@
+"""Compare storing an interpolation animation's frames as a PNG each, against storing them in one
+frame sequence file, by disk usage and how long it takes to read one frame.
+
+The animation is synthetic: two images with random detail cross-fade while panning, and are
+dithered to a gif's palette like the model's output is. Keyframes with deltas between them are
+measured too, but aren't a storage option, since dithering makes the deltas compress worse than
+whole frames.
+
+Run with:
+    python -m benchmarks.bench_frame_sequence
+"""
+import os
+import random
+from io import BytesIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.bench_storage import random_detail
+from benchmarks.utils import print_table, time_function
+from portrayt.configuration import PromptInterpolationAnimation
+from portrayt.generators import InterpolationAnimationGenerator
+from portrayt.generators.interpolation_animation_generator import SEQUENCE_SAVE_ARGS
+from portrayt.library import open_image, sequences_in
+
+RESOLUTION = (768, 512)
+FRAME_COUNTS = [15, 60]
+PAN_PIXELS = 64
+KEYFRAME_INTERVAL = 4
+"""How often a whole frame is stored, for keyframes with deltas"""
+
+
+def make_animation(num_frames: int) -> bytes:
+    """A gif that cross-fades between two images while panning across them"""
+    width, height = RESOLUTION
+    scales = [(4, 0.5), (16, 0.3), (64, 0.15), (256, 0.05)]
+    start = np.asarray(random_detail((width + PAN_PIXELS, height), 1, scales), dtype=np.float32)
+    end = np.asarray(random_detail((width + PAN_PIXELS, height), 2, scales), dtype=np.float32)
+
+    frames = []
+    for frame_id in range(num_frames):
+        t = frame_id / (num_frames - 1)
+        pan = int(t * PAN_PIXELS)
+        pixels = (start * (1 - t) + end * t)[:, pan : pan + width]
+        frames.append(Image.fromarray(pixels.astype(np.uint8)).quantize())
+
+    buffer = BytesIO()
+    frames[0].save(buffer, format="GIF", save_all=True, append_images=frames[1:], duration=1000)
+    return buffer.getvalue()
+
+
+def disk_usage(paths: List[Path]) -> int:
+    """The space files take on disk, including the unused end of their last block"""
+    return sum(path.stat().st_blocks * 512 for path in paths)
+
+
+def encode(pixels: "np.ndarray") -> bytes:
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, **SEQUENCE_SAVE_ARGS)
+    return buffer.getvalue()
+
+
+def decode(data: bytes) -> "np.ndarray":
+    with Image.open(BytesIO(data)) as image:
+        return np.asarray(image.convert("RGB"))
+
+
+def keyframes_with_deltas(frames: List["np.ndarray"]) -> List[bytes]:
+    """Encode every KEYFRAME_INTERVAL'th frame whole, and the rest as their difference from the
+    last keyframe, so reading a frame decodes at most two images"""
+    return [
+        encode(
+            pixels
+            if frame_id % KEYFRAME_INTERVAL == 0
+            else pixels - frames[frame_id - frame_id % KEYFRAME_INTERVAL]
+        )
+        for frame_id, pixels in enumerate(frames)
+    ]
+
+
+def time_random_reads(read: Callable[[int], Any], num_frames: int) -> Dict[str, float]:
+    """Time reading frames in a random order, like a shuffled slideshow"""
+    order = list(range(num_frames))
+    random.Random(1337).shuffle(order)
+    position = iter(order * 100)
+    return time_function(lambda: read(next(position)), repeats=min(num_frames, 20))
+
+
+def main() -> None:
+    rows: List[Dict[str, Any]] = []
+    for num_frames in FRAME_COUNTS:
+        gif_data = make_animation(num_frames)
+        with TemporaryDirectory() as temp_dir:
+            layouts = {}
+            for frame_sequence in (False, True):
+                generator = InterpolationAnimationGenerator(
+                    params=PromptInterpolationAnimation(
+                        prompt_start="",
+                        prompt_end="",
+                        prompt_strength=0.8,
+                        seamless_loop=False,
+                        frame_sequence=frame_sequence,
+                    ),
+                    height=RESOLUTION[1],
+                    width=RESOLUTION[0],
+                    seed=0,
+                    cache_dir=Path(temp_dir),
+                    encode_workers=os.cpu_count(),
+                )
+                save_dir = Path(temp_dir) / f"frame_sequence={frame_sequence}"
+                save_dir.mkdir()
+                generator._save_frames(gif_data, save_dir, start_idx=0)
+                layouts[frame_sequence] = save_dir
+
+            png_paths = [layouts[False] / f"{frame_id}.png" for frame_id in range(num_frames)]
+            sequence_path = sequences_in(layouts[True])[0].path
+            frame_paths = sequences_in(layouts[True])[0].frame_paths()
+            png_bytes = disk_usage(png_paths)
+            frames = [decode(path.read_bytes()) for path in png_paths]
+            for frame_path, pixels in zip(frame_paths, frames):
+                with open_image(frame_path) as image:
+                    assert np.array_equal(np.asarray(image.convert("RGB")), pixels)
+
+            def read_png(frame_id: int) -> "np.ndarray":
+                with Image.open(png_paths[frame_id]) as image:
+                    return np.asarray(image.convert("RGB"))
+
+            def read_frame(frame_id: int) -> "np.ndarray":
+                with open_image(frame_paths[frame_id]) as image:
+                    return np.asarray(image.convert("RGB"))
+
+            def read_frame_cold(frame_id: int) -> "np.ndarray":
+                # As if the directory had just changed, so its sequences' indices are read again
+                sequences_in(layouts[True], refresh=True)
+                return read_frame(frame_id)
+
+            deltas = keyframes_with_deltas(frames)
+
+            def read_delta(frame_id: int) -> "np.ndarray":
+                keyframe_id = frame_id - frame_id % KEYFRAME_INTERVAL
+                keyframe = decode(deltas[keyframe_id])
+                return keyframe if keyframe_id == frame_id else keyframe + decode(deltas[frame_id])
+
+            assert all(np.array_equal(read_delta(i), pixels) for i, pixels in enumerate(frames))
+
+            results = {
+                "png per frame (default)": (png_bytes, read_png),
+                "frame sequence": (disk_usage([sequence_path]), read_frame),
+                "frame sequence, index not cached": (disk_usage([sequence_path]), read_frame_cold),
+                f"keyframe every {KEYFRAME_INTERVAL}, with deltas": (
+                    sum(len(data) for data in deltas),
+                    read_delta,
+                ),
+            }
+            for layout, (size_bytes, read) in results.items():
+                timing = time_random_reads(read, num_frames)
+                rows.append(
+                    {
+                        "frames": num_frames,
+                        "layout": layout,
+                        "disk_kb": size_bytes / 1024,
+                        "saved": f"{(1 - size_bytes / png_bytes) * 100:.0f}%",
+                        "read_median_ms": timing["median_ms"],
+                        "read_max_ms": timing["max_ms"],
+                    }
+                )
+
+    print(
+        f"Storing {RESOLUTION[0]}x{RESOLUTION[1]} animation frames, and reading one at random."
+        " Every layout is lossless."
+    )
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Measure end to end generation jobs against a local stand-in for the Replicate API.
+
+Each scenario runs in a fresh process, so that its peak memory can be measured. Results are saved
+as JSON, and can be compared against the results of an earlier version.
+
+Run with:
+    python -m benchmarks.bench_generation --output new.json --compare old.json
+"""
+import argparse
+import resource
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from benchmarks.utils import describe_version, print_comparison, print_table, save_results
+from portrayt.configuration import PromptGenerateVariations, PromptInterpolationAnimation
+from portrayt.generators import (
+    BaseGenerator,
+    Downloader,
+    InterpolationAnimationGenerator,
+    ReplicateBackend,
+    ReplicateClient,
+    VariationGenerator,
+)
+from tests.fakes import FakeReplicateServer
+
+METRICS = ["first_image_s", "all_images_s", "downloaded_kb", "written_kb", "peak_rss_mb"]
+
+
+class Scenario(NamedTuple):
+    generator: str
+    """Either 'variations' or 'interpolation'"""
+    num_images: int
+    """The number of variations, or animation frames, to generate"""
+    width: int
+    height: int
+
+    @property
+    def name(self) -> str:
+        return f"{self.generator} x{self.num_images} {self.width}x{self.height}"
+
+
+SIZES = [(512, 512), (768, 512)]
+SCENARIOS = [
+    *(Scenario("variations", num, *size) for num in (1, 4, 8) for size in SIZES),
+    *(Scenario("interpolation", num, *size) for num in (5, 15) for size in SIZES),
+]
+
+
+def create_generator(
+    scenario: Scenario, api_url: str, cache_dir: Path, downloader: Downloader
+) -> BaseGenerator[Any]:
+    client = ReplicateClient(api_token="fake-token", requests_per_second=1000, burst=100)
+    client.base_url = api_url
+    backend = ReplicateBackend(client, poll_seconds=0.05)
+
+    if scenario.generator == "variations":
+        return VariationGenerator(
+            params=PromptGenerateVariations(prompt="benchmark", num_variations=scenario.num_images),
+            height=scenario.height,
+            width=scenario.width,
+            seed=0,
+            cache_dir=cache_dir,
+            downloader=downloader,
+            backend=backend,
+        )
+    return InterpolationAnimationGenerator(
+        params=PromptInterpolationAnimation(
+            prompt_start="start",
+            prompt_end="end",
+            prompt_strength=0.8,
+            seamless_loop=False,
+            num_animation_frames=scenario.num_images,
+        ),
+        height=scenario.height,
+        width=scenario.width,
+        seed=0,
+        cache_dir=cache_dir,
+        downloader=downloader,
+        backend=backend,
+    )
+
+
+def run_scenario(scenario: Scenario, api_url: str, repeats: int) -> Dict[str, float]:
+    """Run a scenario's job several times. This runs in its own process.
+
+    :return: The median of each timing, the bytes written per job, and the process's peak RSS.
+        The peak doesn't include the processes that frames are encoded in.
+    """
+    first_image: List[float] = []
+    all_images: List[float] = []
+    written_bytes = 0
+
+    with TemporaryDirectory() as temp_dir:
+        downloader = Downloader()
+        generator = create_generator(scenario, api_url, Path(temp_dir), downloader)
+
+        # The first run is a warmup, so that connections are open and the server has rendered
+        # the outputs
+        for run in range(repeats + 1):
+            start = time.perf_counter()
+            first_image_at: Optional[float] = None
+
+            def on_progress(completed: int, total: int) -> None:
+                nonlocal first_image_at
+                if completed and first_image_at is None:
+                    first_image_at = time.perf_counter()
+
+            generator.generate(clear_previous=True, progress_callback=on_progress)
+            end = time.perf_counter()
+            if run == 0:
+                continue
+
+            first_image.append((first_image_at or end) - start)
+            all_images.append(end - start)
+            written_bytes = sum(path.stat().st_size for path in generator.catalog.paths())
+        downloader.close()
+
+    return {
+        "first_image_s": statistics.median(first_image),
+        "all_images_s": statistics.median(all_images),
+        "written_kb": written_bytes / 1024,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_benchmarks(
+    scenarios: List[Scenario], repeats: int, prediction_seconds: float, latency: float
+) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    with FakeReplicateServer(
+        prediction_seconds=prediction_seconds, response_latency=latency
+    ) as server:
+        for scenario in scenarios:
+            bytes_sent = server.bytes_sent
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                metrics = executor.submit(run_scenario, scenario, server.url, repeats).result()
+
+            # Every run, including the warmup, makes the same requests
+            downloaded_kb = (server.bytes_sent - bytes_sent) / (repeats + 1) / 1024
+            rows.append({"scenario": scenario.name, **metrics, "downloaded_kb": downloaded_kb})
+            print(f"Finished {scenario.name}")
+
+    return [{"scenario": row["scenario"], **{m: row[m] for m in METRICS}} for row in rows]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", type=Path, help="Where to save the results")
+    parser.add_argument("--compare", type=Path, help="Results of a previous run to compare with")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs of each scenario")
+    parser.add_argument(
+        "--prediction-seconds", type=float, default=0.5, help="How long each prediction takes"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.01, help="Delay before every response, in seconds"
+    )
+    parser.add_argument(
+        "--only", help="Only run scenarios whose name contains this, such as 'variations'"
+    )
+    args = parser.parse_args()
+
+    scenarios = [s for s in SCENARIOS if args.only is None or args.only in s.name]
+    rows = run_benchmarks(scenarios, args.repeats, args.prediction_seconds, args.latency)
+
+    print(f"\nGeneration against a fake API, at version {describe_version()}")
+    print_table(rows)
+
+    settings = {
+        "repeats": args.repeats,
+        "prediction_seconds": args.prediction_seconds,
+        "latency": args.latency,
+    }
+    output = save_results("generation", rows, settings, args.output)
+    print(f"Saved results to {output}")
+
+    if args.compare is not None:
+        print_comparison(rows, args.compare, keys=["scenario"], metrics=METRICS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compare ways of splitting an interpolation animation into PNG frames.
+
+Run with:
+    python -m benchmarks.bench_gif_frames
+"""
+import os
+from io import BytesIO
+from pathlib import Path
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+from typing import Any, Dict, List
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.utils import print_table, time_function
+from portrayt.configuration import PromptInterpolationAnimation
+from portrayt.generators import InterpolationAnimationGenerator
+
+NUM_FRAMES = 60
+RESOLUTION = (768, 512)
+
+
+def make_animation() -> bytes:
+    """A gif of smoothly changing frames, similar to an interpolation animation"""
+    width, height = RESOLUTION
+    x = np.linspace(0, 1, width, dtype=np.float32)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, np.newaxis]
+    frames = []
+    for frame_id in range(NUM_FRAMES):
+        phase = frame_id / NUM_FRAMES * 2 * np.pi
+        rgb = np.stack(
+            [
+                np.broadcast_to(x, (height, width)),
+                np.broadcast_to(y, (height, width)),
+                (np.sin(x * 12 + phase) * np.cos(y * 9 - phase) + 1) / 2,
+            ],
+            axis=-1,
+        )
+        frames.append(Image.fromarray((rgb * 255).astype(np.uint8)).quantize())
+
+    buffer = BytesIO()
+    frames[0].save(buffer, format="GIF", save_all=True, append_images=frames[1:], duration=1000)
+    return buffer.getvalue()
+
+
+def temp_file_serial(gif_data: bytes, save_dir: Path) -> None:
+    """The previous approach, writing the gif to disk and encoding frames one at a time"""
+    with NamedTemporaryFile() as gif_path:
+        Path(gif_path.name).write_bytes(gif_data)
+        with Image.open(str(gif_path.name)) as gif:
+            for frame_id in range(gif.n_frames):
+                gif.seek(frame_id)
+                gif.save(str(save_dir / f"{frame_id}.png"))
+
+
+def main() -> None:
+    gif_data = make_animation()
+    rows: List[Dict[str, Any]] = []
+
+    with TemporaryDirectory() as temp_dir:
+        save_dir = Path(temp_dir) / "frames"
+        save_dir.mkdir()
+
+        timing = time_function(lambda: temp_file_serial(gif_data, save_dir), repeats=3)
+        rows.append({"method": "temp file, serial (previous)", **timing})
+
+        for encode_workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+            generator = InterpolationAnimationGenerator(
+                params=PromptInterpolationAnimation(
+                    prompt_start="", prompt_end="", prompt_strength=0.8, seamless_loop=False
+                ),
+                height=RESOLUTION[1],
+                width=RESOLUTION[0],
+                seed=0,
+                cache_dir=Path(temp_dir),
+                encode_workers=encode_workers,
+            )
+            timing = time_function(
+                lambda: generator._save_frames(gif_data, save_dir, start_idx=0), repeats=3
+            )
+            rows.append({"method": f"in memory, {encode_workers} workers", **timing})
+
+    print(f"Splitting a {NUM_FRAMES} frame {RESOLUTION[0]}x{RESOLUTION[1]} animation")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
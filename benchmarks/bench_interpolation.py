@@ -0,0 +1,133 @@
+"""Measure how quickly frames can be interpolated on the device, to expand an animation from the
+model into more frames without paying for more API time.
+
+The first table times each step for one pair of frames, at the resolution of each panel. The
+second times whole animations being expanded, interpolated and encoded, on a process pool.
+
+Run with:
+    python -m benchmarks.bench_interpolation
+"""
+import os
+from io import BytesIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import numpy.typing as npt
+from PIL import Image
+
+from benchmarks.bench_storage import random_detail
+from benchmarks.utils import print_table, time_function
+from portrayt.configuration import InterpolationMethod, PromptInterpolationAnimation
+from portrayt.generators import InterpolationAnimationGenerator
+from portrayt.generators.frame_interpolation import (
+    cross_fade,
+    estimate_motion,
+    motion_compensated_blend,
+)
+
+PANEL_RESOLUTIONS = {"inky 5.7 inch": (600, 448), "inky 4 inch": (640, 400)}
+SOURCE_RESOLUTION = (768, 512)
+"""The resolution animations are generated at"""
+SOURCE_FRAMES = 15
+DISPLAY_FRAMES = [57, 225]
+PAN_PIXELS = 6
+"""How far the view pans between two frames"""
+
+
+def panning_frames(size: Tuple[int, int], num_frames: int) -> List["npt.NDArray[np.uint8]"]:
+    """Frames of a detailed image, panning sideways"""
+    width, height = size
+    scales = [(4, 0.5), (16, 0.3), (64, 0.15), (256, 0.05)]
+    image = random_detail((width + PAN_PIXELS * num_frames, height), 1337, scales)
+    pixels = np.asarray(image)
+    return [
+        np.ascontiguousarray(pixels[:, frame_id * PAN_PIXELS : frame_id * PAN_PIXELS + width])
+        for frame_id in range(num_frames)
+    ]
+
+
+def make_gif(frames: List["npt.NDArray[np.uint8]"]) -> bytes:
+    images = [Image.fromarray(pixels).quantize() for pixels in frames]
+    buffer = BytesIO()
+    images[0].save(buffer, format="GIF", save_all=True, append_images=images[1:], duration=1000)
+    return buffer.getvalue()
+
+
+def main() -> None:
+    rows: List[Dict[str, Any]] = []
+    for panel, size in PANEL_RESOLUTIONS.items():
+        start, end = panning_frames(size, 2)
+        motion = estimate_motion(start, end)
+        steps = {
+            "cross fade, per frame": lambda: cross_fade(start, end, 0.5),
+            "estimate motion, per pair": lambda: estimate_motion(start, end),
+            "motion compensated blend, per frame": lambda: motion_compensated_blend(
+                start, end, 0.5, motion
+            ),
+        }
+        for step, function in steps.items():
+            timing = time_function(function, repeats=10)
+            rows.append(
+                {
+                    "panel": f"{panel} ({size[0]}x{size[1]})",
+                    "step": step,
+                    "median_ms": timing["median_ms"],
+                    "frames_per_second": 1000 / timing["median_ms"],
+                }
+            )
+
+    print("Interpolating one pair of frames, on one core")
+    print_table(rows)
+
+    rows = []
+    gif_data = make_gif(panning_frames(SOURCE_RESOLUTION, SOURCE_FRAMES))
+    with TemporaryDirectory() as temp_dir:
+        for num_display_frames in [0] + DISPLAY_FRAMES:
+            for method in InterpolationMethod:
+                if num_display_frames == 0 and method is not InterpolationMethod.CROSS_FADE:
+                    continue
+                for encode_workers in sorted({1, os.cpu_count() or 1}):
+                    generator = InterpolationAnimationGenerator(
+                        params=PromptInterpolationAnimation(
+                            prompt_start="",
+                            prompt_end="",
+                            prompt_strength=0.8,
+                            seamless_loop=False,
+                            num_display_frames=num_display_frames,
+                            interpolation_method=method,
+                        ),
+                        height=SOURCE_RESOLUTION[1],
+                        width=SOURCE_RESOLUTION[0],
+                        seed=0,
+                        cache_dir=Path(temp_dir),
+                        encode_workers=encode_workers,
+                    )
+                    save_dir = Path(temp_dir) / "frames"
+                    save_dir.mkdir(exist_ok=True)
+                    timing = time_function(
+                        lambda: generator._save_frames(gif_data, save_dir, start_idx=0),
+                        repeats=1,
+                        warmup=0,
+                    )
+                    num_output = max(num_display_frames, SOURCE_FRAMES)
+                    rows.append(
+                        {
+                            "frames": f"{SOURCE_FRAMES} -> {num_output}",
+                            "method": "none" if num_display_frames == 0 else method.value,
+                            "workers": encode_workers,
+                            "total_ms": timing["median_ms"],
+                            "ms_per_frame": timing["median_ms"] / num_output,
+                        }
+                    )
+
+    print(
+        f"\nExpanding a {SOURCE_RESOLUTION[0]}x{SOURCE_RESOLUTION[1]} animation, including"
+        " decoding the gif and encoding every frame as a PNG"
+    )
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Compare the palette quantization engine against the inky library's own conversion path.
+
+Run with:
+    python -m benchmarks.bench_quantization
+"""
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.utils import print_table, time_function
+from portrayt.configuration import DitherMode
+from portrayt.renderers.quantization import PaletteQuantizer
+
+RESOLUTIONS: List[Tuple[int, int]] = [(600, 448), (640, 400)]
+
+UC8159_PALETTE = [
+    (57, 48, 57),
+    (255, 255, 255),
+    (58, 91, 70),
+    (61, 59, 94),
+    (156, 72, 75),
+    (208, 190, 71),
+    (177, 106, 73),
+    (255, 255, 255),
+]
+"""The saturated UC8159 palette, as used by the 7 colour inky displays"""
+
+
+def make_test_image(size: Tuple[int, int]) -> Image.Image:
+    """A smooth, colourful image, which is a worst case for dithering"""
+    width, height = size
+    x = np.linspace(0, 1, width, dtype=np.float32)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, np.newaxis]
+    rgb = np.stack(
+        [
+            np.broadcast_to(x, (height, width)),
+            np.broadcast_to(y, (height, width)),
+            (np.sin(x * 12) * np.cos(y * 9) + 1) / 2,
+        ],
+        axis=-1,
+    )
+    return Image.fromarray((rgb * 255).astype(np.uint8))
+
+
+def inky_library_path(image: Image.Image, palette_image: Image.Image) -> Any:
+    """The conversion 'Inky.set_image' performs on an RGB image"""
+    image.load()
+    return np.array(image.im.convert("P", True, palette_image.im), dtype=np.uint8)
+
+
+def main() -> None:
+    rows: List[Dict[str, Any]] = []
+
+    lut_build = time_function(
+        lambda: PaletteQuantizer(UC8159_PALETTE, dither_mode=DitherMode.NONE), repeats=3
+    )
+    rows.append({"resolution": "-", "method": "build lookup table", **lut_build})
+
+    for resolution in RESOLUTIONS:
+        image = make_test_image(resolution)
+        label = f"{resolution[0]}x{resolution[1]}"
+
+        palette_image = PaletteQuantizer(UC8159_PALETTE, DitherMode.NONE).palette_image
+        timing = time_function(lambda: inky_library_path(image, palette_image))
+        rows.append({"resolution": label, "method": "inky library (current)", **timing})
+
+        for dither_mode in DitherMode:
+            quantizer = PaletteQuantizer(UC8159_PALETTE, dither_mode=dither_mode)
+            timing = time_function(lambda: quantizer.quantize(image))
+            rows.append({"resolution": label, "method": f"engine: {dither_mode.value}", **timing})
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
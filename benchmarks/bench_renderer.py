@@ -0,0 +1,156 @@
+"""Time each stage of the Inky rendering pipeline, from decoding an image to packing the panel's
+framebuffer, for every panel resolution and a range of source image sizes. Rendering goes to a
+NullPanel, so no hardware is needed.
+
+Allocations are the peak memory traced while running a stage once. Pillow allocates image
+buffers outside of Python's allocator, so those aren't included, but NumPy's arrays are.
+
+Run with:
+    python -m benchmarks.bench_renderer --compare benchmarks/results/renderer-<old version>.json
+"""
+import argparse
+import tracemalloc
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.utils import (
+    describe_version,
+    print_comparison,
+    print_table,
+    save_results,
+    time_function,
+)
+from portrayt.configuration import RendererParams
+from portrayt.renderers import RENDERER_TYPES, NullPanelRenderer
+from portrayt.renderers.crop_utils import resize_cover, resize_crop
+
+SOURCE_SIZES: List[Tuple[int, int]] = [(512, 512), (768, 512), (1024, 768), (2048, 1536)]
+METRICS = ["min_ms", "median_ms", "alloc_kb"]
+
+
+def panel_resolutions() -> List[Tuple[int, int]]:
+    """Every resolution a renderer type renders at"""
+    resolutions: Set[Tuple[int, int]] = set()
+    for renderer_type in RENDERER_TYPES.values():
+        resolution = getattr(renderer_type, "resolution", None)
+        if isinstance(resolution, tuple):
+            resolutions.add((int(resolution[0]), int(resolution[1])))
+    return sorted(resolutions)
+
+
+def make_source_image(size: Tuple[int, int], path: Path) -> None:
+    """Save a PNG with gradients and noise, which is about as hard to quantize as a photo"""
+    width, height = size
+    rng = np.random.default_rng(1337)
+    x = np.linspace(0, 1, width, dtype=np.float32)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, np.newaxis]
+    rgb = np.stack(
+        [np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width)), (x + y) / 2],
+        axis=-1,
+    )
+    noise = rng.normal(0, 0.05, size=(height, width, 3)).astype(np.float32)
+    pixels = (np.clip(rgb + noise, 0, 1) * 255).astype(np.uint8)
+    Image.fromarray(pixels).save(path)
+
+
+def traced_peak_kb(fn: Callable[[], Any]) -> float:
+    """The peak memory allocated while running a function once, in KiB"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_panel(
+    resolution: Tuple[int, int], source_path: Path, repeats: int
+) -> List[Dict[str, Any]]:
+    with TemporaryDirectory() as empty_dir:
+        # The renderer has no images of its own, so its render loop stays idle
+        renderer = NullPanelRenderer(
+            Path(empty_dir),
+            RendererParams(seconds_between_images=1000, shuffle=False),
+            resolution=resolution,
+        )
+        try:
+            with Image.open(source_path) as image:
+                image.load()
+                rgb = image.convert("RGB")
+            resized = resize_cover(rgb, resolution)
+            renderer.prerender(source_path)
+            frame = renderer._prepare(source_path)
+            renderer.panel.set_image(frame)
+
+            def decode() -> None:
+                with Image.open(source_path) as image:
+                    image.convert("RGB")
+
+            stages: Dict[str, Callable[[], Any]] = {
+                "decode": decode,
+                "resize_cover": lambda: resize_cover(rgb, resolution),
+                "resize_crop": lambda: resize_crop(rgb, resolution),
+                "quantize": lambda: renderer._quantizer.quantize(resized),
+                "prerender (all of the above)": lambda: renderer.prerender(source_path),
+                "load prerendered": lambda: renderer._prepare(source_path),
+                "set_image": lambda: renderer.panel.set_image(frame),
+                "show (flip and pack)": renderer.panel.show,
+            }
+            rows = []
+            for stage, fn in stages.items():
+                timing = time_function(fn, repeats=repeats)
+                rows.append(
+                    {
+                        "panel": f"{resolution[0]}x{resolution[1]}",
+                        "stage": stage,
+                        "min_ms": timing["min_ms"],
+                        "median_ms": timing["median_ms"],
+                        "alloc_kb": traced_peak_kb(fn),
+                    }
+                )
+        finally:
+            renderer.close()
+
+    (refresh, *_) = renderer.panel.refreshes
+    print(
+        f"A real {resolution[0]}x{resolution[1]} panel would spend"
+        f" {refresh.transfer_seconds * 1000:.0f}ms sending {refresh.transfer_bytes} bytes, and"
+        f" {refresh.refresh_seconds:.0f}s redrawing"
+    )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", type=Path, help="Where to save the results")
+    parser.add_argument("--compare", type=Path, help="Results of a previous run to compare with")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs of each stage")
+    args = parser.parse_args()
+
+    rows: List[Dict[str, Any]] = []
+    with TemporaryDirectory() as temp_dir:
+        for width, height in SOURCE_SIZES:
+            # Images are named by their index in an images directory, like generated ones
+            source_path = Path(temp_dir) / f"{width}x{height}" / "0.png"
+            source_path.parent.mkdir()
+            make_source_image((width, height), source_path)
+            for resolution in panel_resolutions():
+                for row in benchmark_panel(resolution, source_path, args.repeats):
+                    rows.append({"source": source_path.parent.name, **row})
+
+    print(f"\nRendering pipeline stages, at version {describe_version()}")
+    print_table(rows)
+
+    output = save_results("renderer", rows, {"repeats": args.repeats}, args.output)
+    print(f"Saved results to {output}")
+
+    if args.compare is not None:
+        print_comparison(rows, args.compare, keys=["source", "panel", "stage"], metrics=METRICS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Compare the resize_cover fast paths against the previous implementation, which copied the
+image, resampled all of it with LANCZOS, and then copied it again to crop it. The output of each
+is compared pixel by pixel against the previous implementation's.
+
+Run with:
+    python -m benchmarks.bench_resize
+"""
+import math
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.utils import print_table, time_function
+from portrayt.renderers.crop_utils import draft_for_cover, resize_cover
+
+PANEL_SIZE = (600, 448)
+SOURCE_SIZES: List[Tuple[int, int]] = [
+    (600, 448),
+    (1200, 896),
+    (768, 512),
+    (1024, 768),
+    (2048, 1536),
+    (4000, 3000),
+]
+
+
+def previous_resize_cover(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """The previous implementation of resize_cover"""
+    img = image.copy()
+    ratio = max(size[0] / img.size[0], size[1] / img.size[1])
+    new_size = (int(math.ceil(img.size[0] * ratio)), int(math.ceil(img.size[1] * ratio)))
+    img = img.resize(new_size, Image.LANCZOS).copy()
+    left = (new_size[0] - size[0]) / 2
+    top = (new_size[1] - size[1]) / 2
+    box = [math.ceil(x) for x in (left, top, new_size[0] - left, new_size[1] - top)]
+    return img.crop((box[0], box[1], box[2], box[3]))
+
+
+def make_source(size: Tuple[int, int]) -> Image.Image:
+    width, height = size
+    x = np.linspace(0, 200, width)[np.newaxis, :]
+    y = np.linspace(0, 200, height)[:, np.newaxis]
+    gradient = np.stack(np.broadcast_arrays(x, y, (x + y) / 2), axis=-1)
+    noise = np.random.default_rng(1337).integers(0, 56, size=(height, width, 3))
+    return Image.fromarray((gradient + noise).astype(np.uint8))
+
+
+def decode_and_resize(jpeg: bytes, draft: bool) -> Image.Image:
+    with Image.open(BytesIO(jpeg)) as image:
+        if draft:
+            draft_for_cover(image, PANEL_SIZE)
+        return resize_cover(image.convert("RGB"), PANEL_SIZE)
+
+
+def difference(a: Image.Image, b: Image.Image) -> Dict[str, float]:
+    diff = np.abs(np.asarray(a).astype(np.int16) - np.asarray(b).astype(np.int16))
+    return {"max_diff": int(diff.max()), "mean_diff": float(diff.mean())}
+
+
+def main() -> None:
+    rows: List[Dict[str, Any]] = []
+    for source_size in SOURCE_SIZES:
+        source = make_source(source_size)
+        reference = previous_resize_cover(source, PANEL_SIZE)
+        methods: Dict[str, Callable[[], Image.Image]] = {
+            "previous": lambda: previous_resize_cover(source, PANEL_SIZE),
+            "cropped region only": lambda: resize_cover(source, PANEL_SIZE, reducing_gap=None),
+            "cropped region, reduced first": lambda: resize_cover(source, PANEL_SIZE),
+        }
+        for method, fn in methods.items():
+            rows.append(
+                {
+                    "source": f"{source_size[0]}x{source_size[1]}",
+                    "method": method,
+                    **time_function(fn, repeats=5),
+                    **difference(fn(), reference),
+                }
+            )
+
+        # JPEGs can also be shrunk while they're decoded
+        buffer = BytesIO()
+        source.save(buffer, format="JPEG", quality=90)
+        jpeg = buffer.getvalue()
+        full_decode = decode_and_resize(jpeg, draft=False)
+        for draft in (False, True):
+            rows.append(
+                {
+                    "source": f"{source_size[0]}x{source_size[1]}",
+                    "method": f"jpeg decode + resize, {'with' if draft else 'without'} draft",
+                    **time_function(lambda: decode_and_resize(jpeg, draft), repeats=5),
+                    **difference(decode_and_resize(jpeg, draft), full_decode),
+                }
+            )
+
+    print(f"Resizing to cover {PANEL_SIZE[0]}x{PANEL_SIZE[1]}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
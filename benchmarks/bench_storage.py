@@ -0,0 +1,101 @@
+"""Measure how much disk space each storage format saves on generated images, and what that costs
+when images are transcoded and decoded for display.
+
+The images are synthetic. "Smooth" and "detailed" have random detail at a few scales, like a
+generated image, and "noisy gradient" is the image the fake Replicate API serves, which
+compresses worse than most real images.
+
+Run with:
+    python -m benchmarks.bench_storage
+"""
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.utils import print_table, time_function
+from tests.fakes import make_fake_image
+
+SIZES: List[Tuple[int, int]] = [(512, 512), (768, 512)]
+
+FORMATS: Dict[str, Dict[str, Any]] = {
+    "png (as downloaded)": {"format": "PNG"},
+    "png, optimized": {"format": "PNG", "optimize": True},
+    "webp lossless, effort 0": {"format": "WEBP", "lossless": True, "quality": 0},
+    "webp lossless, effort 50": {"format": "WEBP", "lossless": True, "quality": 50},
+    "webp lossless, effort 80": {"format": "WEBP", "lossless": True, "quality": 80},
+    "webp lossless, effort 100": {"format": "WEBP", "lossless": True, "quality": 100},
+}
+"""Arguments to Image.save for each format"""
+
+
+def random_detail(
+    size: Tuple[int, int], seed: int, scales: Sequence[Tuple[int, float]]
+) -> Image.Image:
+    """Random noise upscaled from several sizes, and summed, which looks like a blurry photo
+
+    :param size: The size of the image
+    :param seed: The random seed
+    :param scales: The width of each layer of noise before it's upscaled, and its weight
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    pixels = np.zeros((height, width, 3), dtype=np.float32)
+    for scale, weight in scales:
+        small = rng.integers(0, 256, size=(max(1, height * scale // width), scale, 3))
+        layer = Image.fromarray(small.astype(np.uint8)).resize(size, Image.BICUBIC)
+        pixels += np.asarray(layer, dtype=np.float32) * weight
+    return Image.fromarray(pixels.clip(0, 255).astype(np.uint8))
+
+
+def noisy_gradient(size: Tuple[int, int], seed: int) -> Image.Image:
+    return Image.open(BytesIO(make_fake_image(size[0], size[1], seed))).convert("RGB")
+
+
+def encode(image: Image.Image, save_args: Dict[str, Any]) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, **save_args)
+    return buffer.getvalue()
+
+
+def decode(data: bytes) -> Image.Image:
+    with Image.open(BytesIO(data)) as image:
+        return image.convert("RGB")
+
+
+def main() -> None:
+    sources: Dict[str, Callable[[Tuple[int, int], int], Image.Image]] = {
+        "smooth": lambda size, seed: random_detail(size, seed, [(4, 0.5), (16, 0.5)]),
+        "detailed": lambda size, seed: random_detail(
+            size, seed, [(4, 0.5), (16, 0.3), (64, 0.15), (256, 0.05)]
+        ),
+        "noisy gradient": noisy_gradient,
+    }
+
+    rows: List[Dict[str, Any]] = []
+    for source_name, make_source in sources.items():
+        for size in SIZES:
+            image = make_source(size, 1337)
+            original_bytes = len(encode(image, FORMATS["png (as downloaded)"]))
+            for format_name, save_args in FORMATS.items():
+                data = encode(image, save_args)
+                assert np.array_equal(np.asarray(decode(data)), np.asarray(image))
+                rows.append(
+                    {
+                        "image": f"{source_name} {size[0]}x{size[1]}",
+                        "format": format_name,
+                        "size_kb": len(data) / 1024,
+                        "saved": f"{(1 - len(data) / original_bytes) * 100:.0f}%",
+                        "images_per_gb": int(1024**3 / len(data)),
+                        "encode_ms": time_function(lambda: encode(image, save_args), 3)["min_ms"],
+                        "decode_ms": time_function(lambda: decode(data), 5)["min_ms"],
+                    }
+                )
+
+    print("Storage formats for generated images. Every format is lossless.")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
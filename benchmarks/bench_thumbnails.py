@@ -0,0 +1,54 @@
+"""Compare how much the dashboard downloads to show an image full size, as a preview, and as a
+gallery thumbnail, and time making the thumbnails after an image is generated.
+
+Run with:
+    python -m benchmarks.bench_thumbnails
+"""
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Dict, List
+
+from benchmarks.bench_storage import random_detail
+from benchmarks.utils import print_table, time_function
+from portrayt.interface.image_server import GALLERY_PAGE_SIZE
+from portrayt.library import PREVIEW, THUMBNAIL, make_thumbnails, thumbnail_path
+
+RESOLUTIONS = [(768, 512), (1024, 768)]
+
+
+def main() -> None:
+    rows: List[Dict[str, Any]] = []
+    scales = [(4, 0.5), (16, 0.3), (64, 0.15), (256, 0.05)]
+    with TemporaryDirectory() as temp_dir:
+        for width, height in RESOLUTIONS:
+            image_path = Path(temp_dir) / "0.png"
+            random_detail((width, height), 1337, scales).save(image_path)
+            timing = time_function(lambda: make_thumbnails(image_path), repeats=5)
+
+            full_bytes = image_path.stat().st_size
+            variants = {
+                "full size png": full_bytes,
+                "preview": thumbnail_path(image_path, PREVIEW).stat().st_size,
+                "thumbnail": thumbnail_path(image_path, THUMBNAIL).stat().st_size,
+            }
+            for variant, size_bytes in variants.items():
+                rows.append(
+                    {
+                        "image": f"{width}x{height}",
+                        "variant": variant,
+                        "kb": size_bytes / 1024,
+                        "gallery_page_kb": size_bytes * GALLERY_PAGE_SIZE / 1024,
+                        "saved": f"{(1 - size_bytes / full_bytes) * 100:.0f}%",
+                        "make_all_ms": timing["median_ms"],
+                    }
+                )
+
+    print(
+        "Bytes downloaded per image, and per gallery page of"
+        f" {GALLERY_PAGE_SIZE} images. Unchanged images are revalidated instead of downloaded."
+    )
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
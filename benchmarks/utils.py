@@ -0,0 +1,126 @@
+import json
+import statistics
+import subprocess
+import time
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def time_function(fn: Callable[[], Any], repeats: int = 5, warmup: int = 1) -> Dict[str, float]:
+    """Time a function over several runs
+
+    :param fn: The function to time
+    :param repeats: How many timed runs to do
+    :param warmup: How many untimed runs to do first
+    :return: The min, median, and max run time in milliseconds
+    """
+    for _ in range(warmup):
+        fn()
+
+    timings: List[float] = []
+    for _ in range(repeats):
+        start = perf_counter()
+        fn()
+        timings.append((perf_counter() - start) * 1000)
+
+    return {
+        "min_ms": min(timings),
+        "median_ms": statistics.median(timings),
+        "max_ms": max(timings),
+    }
+
+
+def print_table(rows: Sequence[Dict[str, Any]]) -> None:
+    """Print a list of dictionaries with the same keys as an aligned table"""
+    if not rows:
+        return
+
+    columns = list(rows[0].keys())
+    cells = [[_format(row[column]) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(row[i]) for row in cells)) for i, column in enumerate(columns)]
+
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+
+def describe_version() -> str:
+    """The git commit being benchmarked, so results from different versions can be told apart"""
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(
+    benchmark: str,
+    rows: Sequence[Dict[str, Any]],
+    settings: Dict[str, Any],
+    output: Optional[Path] = None,
+) -> Path:
+    """Save a benchmark's results as json, so later versions can be compared against them
+
+    :param benchmark: The name of the benchmark
+    :param rows: The results
+    :param settings: Anything that affects the results, other than the code being benchmarked
+    :param output: Where to save the results. Defaults to a file named by the benchmark and the
+        current version, under RESULTS_DIR.
+    :return: The path the results were saved to
+    """
+    version = describe_version()
+    output = output or RESULTS_DIR / f"{benchmark}-{version}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    results = {
+        "benchmark": benchmark,
+        "version": version,
+        "created_at": time.time(),
+        "settings": settings,
+        "results": list(rows),
+    }
+    output.write_text(json.dumps(results, indent=4))
+    return output
+
+
+def print_comparison(
+    rows: Sequence[Dict[str, Any]], previous_path: Path, keys: Sequence[str], metrics: Sequence[str]
+) -> None:
+    """Print each metric as a ratio of its value in earlier results, where above 1 means it
+    increased
+
+    :param rows: The current results
+    :param previous_path: A file written by save_results
+    :param keys: The columns that identify a row, for matching it up with the previous results
+    :param metrics: The columns to compare
+    """
+    previous = json.loads(previous_path.read_text())
+    previous_rows = {tuple(row[k] for k in keys): row for row in previous["results"]}
+
+    comparison: List[Dict[str, Any]] = []
+    for row in rows:
+        old = previous_rows.get(tuple(row[k] for k in keys))
+        if old is None:
+            continue
+        comparison.append(
+            {
+                **{k: row[k] for k in keys},
+                **{m: row[m] / old[m] if old.get(m) else float("nan") for m in metrics},
+            }
+        )
+
+    print(f"\nCompared to version {previous['version']} (ratio of new to old)")
+    print_table(comparison)
+
+
+def _format(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
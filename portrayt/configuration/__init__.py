@@ -1,4 +1,5 @@
-from .rendering import RendererParams  # isort: skip
+from .rendering import DitherMode, RendererParams  # isort: skip
+from .storage import EvictionPolicy, StorageFormat, StorageParams  # isort: skip
 from .main_schema import Configuration
-from .prompt_interpolation_animation import PromptInterpolationAnimation
+from .prompt_interpolation_animation import InterpolationMethod, PromptInterpolationAnimation
 from .prompt_variations import PromptGenerateVariations
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from portrayt.configuration import RendererParams
+from portrayt.configuration import RendererParams, StorageParams
 from portrayt.configuration.prompt_interpolation_animation import PromptInterpolationAnimation
 from portrayt.configuration.prompt_variations import PromptGenerateVariations
 
@@ -24,6 +24,13 @@ class Configuration(BaseModel):
     seed: int
     clear_results_between_images: bool
 
+    result_cache_megabytes: int = Field(default=1024, ge=0)
+    """How much disk space to use for remembering past predictions, so that repeated requests are
+    free. Set to 0 to disable the cache."""
+
+    storage: StorageParams = StorageParams()
+    """How much disk space generated images may use, and how they're stored"""
+
     class Config:
         validate_assignment = True
         validate_all = True
@@ -1,6 +1,16 @@
+from enum import Enum
+
 from pydantic import BaseModel, Field
 
 
+class InterpolationMethod(Enum):
+    CROSS_FADE = "cross_fade"
+    """Blend each pair of frames. This is the quickest, but moving edges show up twice."""
+    MOTION_COMPENSATED = "motion_compensated"
+    """Estimate how each block of the image moves between frames, and blend the blocks part of
+    the way along their motion. Slower, but motion looks smoother."""
+
+
 class PromptInterpolationAnimation(BaseModel):
     """Information for the Replicate API to generate variations of a prompt"""
 
@@ -9,3 +19,15 @@ class PromptInterpolationAnimation(BaseModel):
     prompt_strength: float
     seamless_loop: bool
     num_animation_frames: int = Field(default=15, ge=3, le=60)
+    frame_sequence: bool = False
+    """Store the frames in one frame sequence file, instead of a PNG file each. Sequences take
+    less than half the space, and any frame can still be read without decoding the others."""
+    num_display_frames: int = Field(default=0, ge=0, le=600)
+    """How many frames to expand the animation to, by interpolating frames between the model's
+    frames on this device. This doesn't cost any more API time. Set to 0 to only keep the model's
+    frames."""
+    interpolation_method: InterpolationMethod = InterpolationMethod.CROSS_FADE
+    """How frames are interpolated, when num_display_frames adds frames"""
+    encode_workers: int = Field(default=0, ge=0, le=64)
+    """How many processes to interpolate and encode frames with. Set to 0 to use one per CPU.
+    This only changes how quickly frames are made on this device, not the frames themselves."""
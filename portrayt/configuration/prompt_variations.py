@@ -6,3 +6,8 @@ class PromptGenerateVariations(BaseModel):
 
     prompt: str
     num_variations: int = Field(default=1, ge=1, le=10)
+    max_concurrent_predictions: int = Field(default=4, ge=1, le=10)
+    """How many variations may be predicted and downloaded in parallel"""
+    outputs_per_prediction: int = Field(default=1, ge=1, le=4)
+    """How many variations to request from each prediction. Batching variations costs less and
+    waits on fewer cold starts, but produces different images than unbatched predictions."""
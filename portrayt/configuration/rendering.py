@@ -1,6 +1,27 @@
-from pydantic import BaseModel
+from enum import Enum
+
+from pydantic import BaseModel, Field
+
+
+class DitherMode(Enum):
+    NONE = "none"
+    """Map each pixel to its nearest palette colour"""
+    ORDERED = "ordered"
+    """Offset pixels by a tiled Bayer matrix before mapping them to the palette"""
+    ERROR_DIFFUSION = "error_diffusion"
+    """Floyd-Steinberg dithering, spreading each pixel's error onto its neighbours"""
 
 
 class RendererParams(BaseModel):
     seconds_between_images: int
     shuffle: bool
+    saturation: float = Field(default=0.6, ge=0, le=1)
+    """How saturated the colour palette should be, for renderers with a limited palette"""
+    dither_mode: DitherMode = DitherMode.ERROR_DIFFUSION
+    """How to dither images, for renderers with a limited palette"""
+    prefetch_frames: int = Field(default=1, ge=0, le=2)
+    """How many upcoming images to prepare while the current one is shown. Each prepared image is
+    held in memory until it's shown."""
+    refresh_threshold: float = Field(default=0.0, ge=0, le=0.5)
+    """The fraction of pixels that must change for a slow display to be refreshed. At 0, only
+    frames identical to what's already displayed are skipped."""
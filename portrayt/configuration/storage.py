@@ -0,0 +1,31 @@
+from enum import Enum
+
+from pydantic import BaseModel, Field
+
+
+class EvictionPolicy(Enum):
+    OLDEST = "oldest"
+    """Delete the oldest images first. Favourites are deleted last."""
+    LEAST_SHOWN = "least_shown"
+    """Delete the images that have been shown the fewest times first. Favourites, and images that
+    haven't been shown yet, are deleted last."""
+    NOT_FAVOURITE = "not_favourite"
+    """Delete the oldest images that aren't favourites. Favourites are never deleted."""
+
+
+class StorageFormat(Enum):
+    ORIGINAL = "original"
+    """Keep images in the format they were generated in"""
+    WEBP_LOSSLESS = "webp_lossless"
+    """Transcode images to lossless WebP, which looks the same as PNG but is usually 10-30%
+    smaller"""
+
+
+class StorageParams(BaseModel):
+    max_megabytes: int = Field(default=0, ge=0)
+    """How much disk space generated images may use, across every prompt type, before images are
+    deleted. Set to 0 for no limit."""
+    eviction_policy: EvictionPolicy = EvictionPolicy.NOT_FAVOURITE
+    """Which images to delete first when over the limit"""
+    storage_format: StorageFormat = StorageFormat.ORIGINAL
+    """The format images are kept in, after they've been generated"""
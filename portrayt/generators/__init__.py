@@ -1,9 +1,93 @@
-from typing import Dict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Type
 
 from portrayt import configuration
+from portrayt.lazy_imports import LazyRegistry, lazy_attributes
 
-from .base_generator import BaseGenerator
-from .interpolation_animation_generator import InterpolationAnimationGenerator
-from .variation_generator import VariationGenerator
+if TYPE_CHECKING:
+    from .base_generator import BaseGenerator
+    from .downloads import Downloader, DownloadError
+    from .generation_queue import GenerationCancelled, GenerationJob, GenerationQueue, JobStatus
+    from .interpolation_animation_generator import InterpolationAnimationGenerator
+    from .prediction_backend import PredictionBackend, ReplicateBackend
+    from .prediction_journal import JournalJob, PredictionJournal
+    from .rate_limiting import AdaptiveConcurrencyLimiter, TokenBucket
+    from .replicate_client import ClientLimits, ReplicateClient
+    from .result_cache import CacheStats, ResultCache
+    from .variation_generator import VariationGenerator
 
-__all__ = ["BaseGenerator", "VariationGenerator", "InterpolationAnimationGenerator"]
+# Generators depend on replicate and requests, which aren't needed to display cached images, so
+# they're only imported once they're used
+__getattr__ = lazy_attributes(
+    __name__,
+    {
+        "BaseGenerator": ".base_generator",
+        "VariationGenerator": ".variation_generator",
+        "InterpolationAnimationGenerator": ".interpolation_animation_generator",
+        "GenerationQueue": ".generation_queue",
+        "GenerationJob": ".generation_queue",
+        "GenerationCancelled": ".generation_queue",
+        "JobStatus": ".generation_queue",
+        "Downloader": ".downloads",
+        "DownloadError": ".downloads",
+        "ResultCache": ".result_cache",
+        "CacheStats": ".result_cache",
+        "PredictionBackend": ".prediction_backend",
+        "ReplicateBackend": ".prediction_backend",
+        "PredictionJournal": ".prediction_journal",
+        "JournalJob": ".prediction_journal",
+        "ReplicateClient": ".replicate_client",
+        "ClientLimits": ".replicate_client",
+        "TokenBucket": ".rate_limiting",
+        "AdaptiveConcurrencyLimiter": ".rate_limiting",
+    },
+)
+
+GENERATOR_TYPES: "LazyRegistry[str, Type[BaseGenerator[Any]]]" = LazyRegistry(
+    {
+        configuration.PromptGenerateVariations.__name__: (
+            f"{__name__}.variation_generator:VariationGenerator"
+        ),
+        configuration.PromptInterpolationAnimation.__name__: (
+            f"{__name__}.interpolation_animation_generator:InterpolationAnimationGenerator"
+        ),
+    }
+)
+"""The generator for each type of prompt, keyed by the name of the prompt's schema. Each
+generator is imported the first time it's looked up."""
+
+
+def images_dir_for(cache_dir: Path, prompt_type: str) -> Path:
+    """The directory that the generator for a type of prompt saves images to, found without
+    importing the generator
+
+    :param cache_dir: The cache directory that generators are created with
+    :param prompt_type: The name of the prompt's schema
+    :return: The generator's images_dir
+    """
+    return cache_dir / GENERATOR_TYPES.attribute_name(prompt_type)
+
+
+__all__ = [
+    "BaseGenerator",
+    "VariationGenerator",
+    "InterpolationAnimationGenerator",
+    "GenerationQueue",
+    "GenerationJob",
+    "GenerationCancelled",
+    "JobStatus",
+    "Downloader",
+    "DownloadError",
+    "ResultCache",
+    "CacheStats",
+    "PredictionBackend",
+    "ReplicateBackend",
+    "PredictionJournal",
+    "JournalJob",
+    "ReplicateClient",
+    "ClientLimits",
+    "TokenBucket",
+    "AdaptiveConcurrencyLimiter",
+    "GENERATOR_TYPES",
+    "images_dir_for",
+]
@@ -1,20 +1,62 @@
+import json
 import logging
+import os
 import shutil
+import time
 from abc import ABC, abstractmethod
 from pathlib import Path
-from tempfile import TemporaryDirectory
-from typing import Generic, TypeVar
+from tempfile import mkdtemp
+from typing import Any, Callable, Dict, FrozenSet, Generic, List, Optional, Sequence, Tuple, TypeVar
+from uuid import uuid4
 
 from pydantic import BaseModel
 
+from portrayt.library import (
+    IMAGE_SUFFIXES,
+    SEQUENCE_SUFFIX,
+    CatalogEntry,
+    ImageCatalog,
+    sequences_in,
+)
+
+from .downloads import Downloader, shared_downloader
+from .prediction_backend import PredictionBackend, ReplicateBackend
+from .prediction_journal import JournalJob, PredictionJournal
+from .result_cache import ResultCache
+
 PARAMS = TypeVar("PARAMS", bound=BaseModel)
 
+ProgressCallback = Callable[[int, int], None]
+"""Called with (completed, total) as images are generated. It may raise to abort generation."""
+
+PostProcessor = Callable[[Path], None]
+"""Called with the path of each newly generated image, before it's added to the cache directory"""
+
 
 class BaseGenerator(ABC, Generic[PARAMS]):
     """The base class for an object that can call API's and generate a series of images
     and save them to a given directory, in some kind of alphanumeric order"""
 
-    def __init__(self, params: PARAMS, height: int, width: int, seed: int, cache_dir: Path) -> None:
+    LOCAL_PARAMS: FrozenSet[str] = frozenset()
+    """Parameters that only change how results are made on this device, not what is made, so
+    they're left out of the fingerprint"""
+
+    SWAP_ATTEMPTS = 5
+    """How many times to try replacing an images directory from an older version with a symlink"""
+
+    def __init__(
+        self,
+        params: PARAMS,
+        height: int,
+        width: int,
+        seed: int,
+        cache_dir: Path,
+        post_processors: Sequence[PostProcessor] = (),
+        downloader: Optional[Downloader] = None,
+        result_cache: Optional[ResultCache] = None,
+        backend: Optional[PredictionBackend] = None,
+        journal: Optional[PredictionJournal] = None,
+    ) -> None:
         # Parameters common to this specific generator
         self._params = params
 
@@ -24,47 +66,235 @@ class BaseGenerator(ABC, Generic[PARAMS]):
         self._seed = seed
         self.images_dir = cache_dir / self.__class__.__name__
         self.images_dir.mkdir(parents=True, exist_ok=True)
+        self.catalog = ImageCatalog(self.images_dir)
+
+        # Stages run on each image after generation, such as pre-rendering for a display
+        self._post_processors = post_processors
+        self._progress_callback: Optional[ProgressCallback] = None
+
+        # Used to fetch the outputs of predictions
+        self._downloader = downloader or shared_downloader()
+
+        # If set, predictions that were already made are reused instead of being paid for again
+        self._result_cache = result_cache
+
+        # Runs predictions. If a journal is set, they're recorded so that an interrupted
+        # generation can be finished without paying for them again.
+        self._backend = backend or ReplicateBackend()
+        self._journal = journal
+        self._job: Optional[JournalJob] = None
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}({self.images_dir=}, {self._params=})"
 
+    @property
+    def fingerprint(self) -> str:
+        """A string that is identical for two generators that would make the same request"""
+        return json.dumps(
+            {
+                "generator": self.__class__.__name__,
+                "images_dir": str(self.images_dir),
+                # Through JSON, so that fields like enums are serialized the way pydantic does it
+                "params": json.loads(self._params.json(exclude=set(self.LOCAL_PARAMS))),
+                "height": self._height,
+                "width": self._width,
+                "seed": self._seed,
+            },
+            sort_keys=True,
+        )
+
     @property
     def next_idx(self) -> int:
         """The name of the index the next image will be saved as"""
-        image_paths = list(self.images_dir.glob("*.png"))
-        image_paths.sort(key=lambda p: int(p.stem))
-        if len(image_paths):
-            return int(image_paths[-1].stem) + 1
-        return 0
+        return self.catalog.next_idx
 
-    def generate(self, clear_previous: bool) -> None:
+    def generate(
+        self, clear_previous: bool, progress_callback: Optional[ProgressCallback] = None
+    ) -> None:
         """Generate new images and then clear the existing images from the cache directory and
         replace them.
 
         :param clear_previous: If True, previous generations will be deleted and replaced by the new
             ones. If false, new oens will be added, in sequential order after the existing ones.
+        :param progress_callback: If set, it will be called as images are completed. If it raises,
+            generation is aborted and the cache directory is left untouched.
         """
 
+        self._progress_callback = progress_callback
+        staging_dir, start_idx, self._job = self._start_job(clear_previous)
+        try:
+            entries = None if self._job is None else self._job.entries
+            if entries is None:
+                entries = self._generate_staged(staging_dir, start_idx)
+                if self._journal is not None and self._job is not None:
+                    self._journal.commit_job(self._job.job_id, entries)
+
+            if clear_previous:
+                # If the job was interrupted after the swap, there's nothing left to publish
+                if staging_dir.is_dir():
+                    ImageCatalog(staging_dir).add(entries)
+                    self._swap_images_dir(staging_dir)
+            else:
+                self._publish_files(staging_dir)
+                self.catalog.add(entries)
+        finally:
+            if self._journal is not None and self._job is not None:
+                self._journal.finish_job(self._job.job_id)
+            self._progress_callback = None
+            self._job = None
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def _start_job(self, clear_previous: bool) -> Tuple[Path, int, Optional[JournalJob]]:
+        """Create a staging directory for a generation, or resume an interrupted generation that
+        was making the same request
+
+        :return: The staging directory, the index to start numbering images from, and the job
+            in the journal, if there is a journal
+        """
         start_idx = 0 if clear_previous else self.next_idx
+        journal = self._journal
+        job = None if journal is None else journal.find_job(self.fingerprint, clear_previous)
 
-        with TemporaryDirectory() as tempdir:
-            logging.info(f"Starting generation for {self}. {start_idx=}. This may take a while.")
-            self._generate(Path(tempdir), start_idx)
-            logging.info("Done generating!")
+        if journal is None or job is None:
+            # Stage results on the same filesystem as the images directory, so they can be
+            # published by renaming them instead of copying them
+            staging_dir = Path(
+                mkdtemp(dir=self.images_dir.parent, prefix=f".{self.images_dir.name}.staging-")
+            )
+            if journal is not None:
+                job = journal.start_job(self.fingerprint, clear_previous, start_idx, staging_dir)
+            return staging_dir, start_idx, job
 
-            if clear_previous:
-                # Since generation completed successfully, delete the current images directory and
-                # copy the new one over.
-                shutil.rmtree(self.images_dir)
-                self.images_dir.unlink(missing_ok=True)
-
-            # Write the parameters used to generate each image
-            for image_path in Path(tempdir).glob("*.png"):
-                params_file = image_path.with_name(f"{int(image_path.stem)}.json")
-                params_file.write_text(self._params.json(indent=4))
-
-            # Copy everything in to the main directory
-            shutil.copytree(tempdir, self.images_dir, dirs_exist_ok=True)
+        logging.info(f"Resuming interrupted generation {job.job_id} for {self}")
+        if job.entries is None and (job.start_idx != start_idx or not job.staging_dir.is_dir()):
+            # Images were added since the job was interrupted, or its files were lost, so any
+            # downloads must be redone. Finished predictions can still be reused.
+            shutil.rmtree(job.staging_dir, ignore_errors=True)
+            job.staging_dir.mkdir(parents=True)
+            journal.move_job(job.job_id, start_idx)
+            job = job._replace(start_idx=start_idx)
+        return job.staging_dir, job.start_idx, job
+
+    def _generate_staged(self, staging_dir: Path, start_idx: int) -> List[CatalogEntry]:
+        """Generate and post-process images in the staging directory
+
+        :return: Catalog entries for the new images
+        """
+        logging.info(f"Starting generation for {self}. {start_idx=}. This may take a while")
+        self._generate(staging_dir, start_idx)
+        logging.info("Done generating!")
+
+        image_paths = list(staging_dir.glob("*.png"))
+        for sequence in sequences_in(staging_dir, refresh=True):
+            image_paths += sequence.frame_paths()
+        image_paths.sort(key=lambda path: int(path.stem))
+        for image_path in image_paths:
+            for post_processor in self._post_processors:
+                post_processor(image_path)
+
+        # Record the new images, and the parameters used to generate them
+        return [
+            CatalogEntry(
+                idx=int(image_path.stem),
+                filename=image_path.name,
+                generator=self.__class__.__name__,
+                params=self._params.json(),
+                created_at=time.time(),
+            )
+            for image_path in image_paths
+        ]
+
+    def _predict(self, model: str, version: str, inputs: Dict[str, Any]) -> List[Any]:
+        """Run a prediction, reusing its outputs if an interrupted run of this job already ran it
+
+        :param model: The model's name
+        :param version: The ID of the model version to run
+        :param inputs: The inputs to the model
+        :return: The outputs of the prediction
+        """
+        job, journal = self._job, self._journal
+        if job is None or journal is None:
+            with self._backend.reserve(self.images_dir.name):
+                return self._backend.wait(self._backend.create(model, version, inputs))
+
+        request_key = ResultCache.key(f"{model}:{version}", inputs)
+        journaled = journal.get_prediction(job.job_id, request_key)
+        if journaled is not None and journaled.outputs is not None:
+            return journaled.outputs
+
+        with self._backend.reserve(self.images_dir.name):
+            if journaled is not None:
+                prediction_id = journaled.prediction_id
+            else:
+                prediction_id = self._backend.create(model, version, inputs)
+                journal.record_prediction(job.job_id, request_key, prediction_id)
+
+            outputs = self._backend.wait(prediction_id)
+        journal.record_outputs(job.job_id, request_key, outputs)
+        return outputs
+
+    def _download(self, url: str, path: Path) -> None:
+        """Download a prediction's output, unless an interrupted run of this job already did"""
+        job, journal = self._job, self._journal
+        if job is not None and journal is not None:
+            if path.is_file() and journal.is_downloaded(job.job_id, path.name):
+                return
+
+        self._downloader.download(url, path)
+        if job is not None and journal is not None:
+            journal.record_download(job.job_id, path.name)
+
+    def _swap_images_dir(self, staging_dir: Path) -> None:
+        """Replace the images directory with the staging directory, in one atomic step.
+
+        The images directory is a symlink to a hidden directory next to it, so that it can be
+        swapped for a new one with a rename. Readers either see all of the old images, or all of
+        the new ones.
+        """
+        version_dir = self.images_dir.with_name(f".{self.images_dir.name}.{uuid4().hex[:8]}")
+        staging_dir.rename(version_dir)
+
+        link_path = self.images_dir.with_name(f".{self.images_dir.name}.link-{uuid4().hex[:8]}")
+        link_path.symlink_to(version_dir.name, target_is_directory=True)
+
+        previous_dirs: List[Path] = []
+        if self.images_dir.is_symlink():
+            previous_dirs.append(self.images_dir.resolve())
+
+        for attempt in range(self.SWAP_ATTEMPTS):
+            if self.images_dir.is_dir() and not self.images_dir.is_symlink():
+                # Directories from older versions can't be replaced atomically. Move it out of the
+                # way once, and the images directory will be a symlink from then on.
+                previous_dir = self.images_dir.with_name(
+                    f".{self.images_dir.name}.{uuid4().hex[:8]}"
+                )
+                self.images_dir.rename(previous_dir)
+                previous_dirs.append(previous_dir)
+            try:
+                os.replace(link_path, self.images_dir)
+                break
+            except IsADirectoryError:
+                # Opening a catalog creates the images directory if it's missing, so anything that
+                # opened it in the meantime recreated it. That only holds an empty catalog, so it's
+                # moved away too.
+                if attempt == self.SWAP_ATTEMPTS - 1:
+                    link_path.unlink()
+                    raise
+
+        for previous_dir in previous_dirs:
+            shutil.rmtree(previous_dir, ignore_errors=True)
+
+    def _publish_files(self, staging_dir: Path) -> None:
+        """Move staged files into the images directory. Images and frame sequences are moved last,
+        so any file derived from an image is in place before the image is."""
+        image_suffixes = IMAGE_SUFFIXES + (SEQUENCE_SUFFIX,)
+        for path in sorted(staging_dir.iterdir(), key=lambda p: p.suffix in image_suffixes):
+            os.replace(path, self.images_dir / path.name)
+
+    def _report_progress(self, completed: int, total: int) -> None:
+        """Generators should call this as images are completed, so progress can be tracked"""
+        if self._progress_callback is not None:
+            self._progress_callback(completed, total)
 
     @abstractmethod
     def _generate(self, save_dir: Path, start_idx: int) -> None:
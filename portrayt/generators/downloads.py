@@ -0,0 +1,174 @@
+import logging
+import os
+import re
+import time
+from io import SEEK_END, BytesIO
+from pathlib import Path
+from threading import Lock
+from typing import BinaryIO, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class DownloadError(Exception):
+    """Raised when a file couldn't be downloaded, even after retrying"""
+
+
+class _RetryableDownloadError(DownloadError):
+    pass
+
+
+class Downloader:
+    """Downloads generated outputs to disk over a pooled HTTP session.
+
+    Responses are streamed straight to a partial file next to the destination, and failed
+    downloads are retried with exponential backoff. When possible, retries resume from where the
+    partial file ended using a Range request. The destination only appears once the full file has
+    been received, so a failed download never leaves a truncated file behind.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30,
+        max_attempts: int = 5,
+        backoff_seconds: float = 1,
+        chunk_size: int = 64 * 1024,
+        pool_size: int = 10,
+    ) -> None:
+        """
+        :param timeout: Seconds to wait to connect, and between bytes received, before retrying
+        :param max_attempts: How many times to try a download before giving up
+        :param backoff_seconds: The delay before the first retry. It doubles with each retry.
+        :param chunk_size: How many bytes to read into memory at once
+        :param pool_size: How many connections to keep open per host. This should be at least
+            the number of concurrent downloads.
+        """
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.chunk_size = chunk_size
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def download(self, url: str, path: Path) -> None:
+        """Download a url to a file, retrying and resuming if the download is interrupted
+
+        :param url: The url to download
+        :param path: Where to save the file. It's replaced if it already exists.
+        :raises DownloadError: If the file couldn't be downloaded
+        """
+        partial_path = path.with_name(f".{path.name}.part")
+        try:
+            with partial_path.open("w+b") as partial_file:
+                self._download_with_retries(url, partial_file)
+            os.replace(partial_path, path)
+        finally:
+            partial_path.unlink(missing_ok=True)
+
+    def fetch(self, url: str) -> bytes:
+        """Download a url into memory, retrying and resuming if the download is interrupted
+
+        :param url: The url to download
+        :return: The contents of the response
+        :raises DownloadError: If the file couldn't be downloaded
+        """
+        buffer = BytesIO()
+        self._download_with_retries(url, buffer)
+        return buffer.getvalue()
+
+    def _download_with_retries(self, url: str, buffer: BinaryIO) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self._download_attempt(url, buffer)
+                return
+            except (_RetryableDownloadError, requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_attempts:
+                    raise DownloadError(
+                        f"Gave up downloading {url} after {attempt} attempts"
+                    ) from e
+
+                delay = self.backoff_seconds * 2 ** (attempt - 1)
+                logging.warning(f"Download of {url} failed: {e!r}. Retrying in {delay}s")
+                time.sleep(delay)
+            except requests.RequestException as e:
+                raise DownloadError(f"Failed to download {url}") from e
+
+    def _download_attempt(self, url: str, buffer: BinaryIO) -> None:
+        """Download the rest of the file into the buffer, resuming from wherever it ends"""
+        resume_from = buffer.seek(0, SEEK_END)
+        headers = {"Range": f"bytes={resume_from}-"} if resume_from else {}
+
+        with self._session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                raise _RetryableDownloadError(f"Server responded with {response.status_code}")
+            if response.status_code == 416:
+                # The partial download can't be resumed, so start again from scratch
+                buffer.truncate(0)
+                raise _RetryableDownloadError("Server couldn't resume the download")
+            response.raise_for_status()
+
+            start, total_size = self._response_range(response)
+            if start != resume_from:
+                if start != 0:
+                    buffer.truncate(0)
+                    raise _RetryableDownloadError(f"Server resumed from {start}, not {resume_from}")
+
+                # The server ignored the Range header, and is sending the whole file
+                buffer.seek(0)
+                buffer.truncate()
+
+            try:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    buffer.write(chunk)
+            except requests.exceptions.ChunkedEncodingError as e:
+                raise _RetryableDownloadError("The connection was interrupted") from e
+            received_size = buffer.tell()
+
+        if total_size is not None and received_size != total_size:
+            if received_size > total_size:
+                buffer.truncate(0)
+            raise _RetryableDownloadError(f"Received {received_size} of {total_size} bytes")
+
+    @staticmethod
+    def _response_range(response: requests.Response) -> Tuple[int, Optional[int]]:
+        """Return the offset the response body starts at, and the total size of the file if the
+        server reported it"""
+        if response.status_code == 206:
+            match = _CONTENT_RANGE.fullmatch(response.headers.get("Content-Range", ""))
+            if match is None:
+                raise DownloadError("Received a partial response without a valid Content-Range")
+            total = match.group(3)
+            return int(match.group(1)), None if total == "*" else int(total)
+
+        # The body is decompressed as it's read, so the Content-Length wouldn't match it
+        content_length = response.headers.get("Content-Length")
+        if (
+            content_length is None
+            or response.headers.get("Content-Encoding", "identity") != "identity"
+        ):
+            return 0, None
+        return 0, int(content_length)
+
+    def close(self) -> None:
+        self._session.close()
+
+
+_shared_downloader: Optional[Downloader] = None
+_shared_downloader_lock = Lock()
+
+
+def shared_downloader() -> Downloader:
+    """Return a downloader shared by all generators, so connections are reused between them"""
+    global _shared_downloader
+    with _shared_downloader_lock:
+        if _shared_downloader is None:
+            _shared_downloader = Downloader()
+        return _shared_downloader
@@ -0,0 +1,175 @@
+from typing import List, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from portrayt.configuration import InterpolationMethod
+
+BLOCK_SIZE = 16
+"""The width and height of the blocks that motion is estimated for, in pixels"""
+
+SEARCH_RADIUS = 8
+"""How far, in pixels, a block may move between frames. Estimating motion costs the square of
+this, so it's kept to the motion of a slow pan or zoom."""
+
+SEARCH_SCALE = 2
+"""How much frames are shrunk before motion is searched for, which makes the search 4 times
+cheaper. Vectors are found to within this many pixels."""
+
+STILL_BIAS = 2.0
+"""How much worse, in grey levels per pixel, standing still has to match than moving for a block
+to move. This keeps flat regions, where every vector matches about as well, from wandering."""
+
+
+def segment_positions(num_frames: int, num_output: int) -> List[List[float]]:
+    """Spread output frames evenly over the time between the first and last input frames
+
+    :param num_frames: How many frames there are
+    :param num_output: How many frames there should be. The first and last are the input's.
+    :return: For each input frame, how far towards the next frame each output frame from it is,
+        from 0 up to but not including 1. An output frame at 0 is the input frame itself.
+    """
+    segments: List[List[float]] = [[] for _ in range(num_frames)]
+    for position in np.linspace(0, num_frames - 1, max(num_output, num_frames)):
+        frame_id = min(int(position), num_frames - 1)
+        segments[frame_id].append(float(position - frame_id))
+    return segments
+
+
+def cross_fade(
+    start: "npt.NDArray[np.uint8]", end: "npt.NDArray[np.uint8]", alpha: float
+) -> "npt.NDArray[np.uint8]":
+    """Blend two frames
+
+    :param start: The frame at alpha 0
+    :param end: The frame at alpha 1
+    :param alpha: How far from start towards end the blend is
+    """
+    # Fixed point weights out of 256 keep the blend in 16 bit integers, which is much quicker
+    # than floats on a Raspberry Pi
+    weight = np.uint16(round(alpha * 256))
+    blended = start.astype(np.uint16) * (256 - weight)
+    blended += end.astype(np.uint16) * weight
+    blended += 128
+    return (blended >> 8).astype(np.uint8)
+
+
+def estimate_motion(
+    start: "npt.NDArray[np.uint8]", end: "npt.NDArray[np.uint8]"
+) -> "npt.NDArray[np.int32]":
+    """Find where each block of the end frame was in the start frame, by trying every offset
+    within SEARCH_RADIUS for all blocks at once
+
+    :param start: The earlier frame
+    :param end: The later frame
+    :return: The (dy, dx) offset from each block in the end frame to where it best matches the
+        start frame, in pixels, of shape (blocks down, blocks across, 2)
+    """
+    start_luma, end_luma = _search_luma(start), _search_luma(end)
+    block = BLOCK_SIZE // SEARCH_SCALE
+    radius = SEARCH_RADIUS // SEARCH_SCALE
+    blocks_y, blocks_x = end_luma.shape[0] // block, end_luma.shape[1] // block
+    height, width = blocks_y * block, blocks_x * block
+    end_luma = end_luma[:height, :width]
+    padded = np.pad(start_luma[:height, :width], radius, mode="edge")
+
+    best_cost = np.full((blocks_y, blocks_x), np.inf, dtype=np.float32)
+    best = np.zeros((blocks_y, blocks_x, 2), dtype=np.int32)
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            shifted = padded[radius + dy : radius + dy + height, radius + dx : radius + dx + width]
+            cost = np.abs(shifted - end_luma).reshape(blocks_y, block, blocks_x, block)
+            block_cost = cost.sum(axis=(1, 3))
+            if dy or dx:
+                block_cost += STILL_BIAS * block * block
+            better = block_cost < best_cost
+            best_cost[better] = block_cost[better]
+            best[better] = (dy, dx)
+    return best * SEARCH_SCALE
+
+
+def motion_compensated_blend(
+    start: "npt.NDArray[np.uint8]",
+    end: "npt.NDArray[np.uint8]",
+    alpha: float,
+    motion: "npt.NDArray[np.int32]",
+) -> "npt.NDArray[np.uint8]":
+    """Blend two frames, moving each block part of the way along its motion
+
+    :param start: The frame at alpha 0
+    :param end: The frame at alpha 1
+    :param alpha: How far from start towards end the blend is
+    :param motion: The frames' motion, from estimate_motion
+    """
+    height, width = end.shape[:2]
+    offsets = np.repeat(np.repeat(motion, BLOCK_SIZE, axis=0), BLOCK_SIZE, axis=1)
+    # Pixels past the last whole block move with the block next to them
+    offsets = np.pad(
+        offsets,
+        ((0, height - offsets.shape[0]), (0, width - offsets.shape[1]), (0, 0)),
+        mode="edge",
+    )
+
+    # A block that was at p + offset in start is at p in end. Part of the way there, its pixels
+    # are alpha * offset further along in start, and (1 - alpha) * offset back in end.
+    rows = np.arange(height, dtype=np.int32)[:, np.newaxis]
+    columns = np.arange(width, dtype=np.int32)[np.newaxis, :]
+    from_start = _sample(start, rows, columns, offsets, alpha)
+    from_end = _sample(end, rows, columns, offsets, alpha - 1)
+    return cross_fade(from_start, from_end, alpha)
+
+
+def interpolate(
+    start: "npt.NDArray[np.uint8]",
+    end: "npt.NDArray[np.uint8]",
+    alphas: Sequence[float],
+    method: InterpolationMethod,
+) -> List["npt.NDArray[np.uint8]"]:
+    """Make frames between two frames
+
+    :param start: The frame at alpha 0, as an RGB array of shape (height, width, 3)
+    :param end: The frame at alpha 1
+    :param alphas: How far from start towards end each frame should be
+    :param method: How to make the frames
+    :return: A frame for each alpha, in order
+    """
+    if method is InterpolationMethod.CROSS_FADE:
+        return [start if alpha == 0 else cross_fade(start, end, alpha) for alpha in alphas]
+
+    # The motion is the same for every frame in between, so it's only estimated once
+    motion = estimate_motion(start, end) if any(alphas) else None
+    return [
+        start
+        if alpha == 0 or motion is None
+        else motion_compensated_blend(start, end, alpha, motion)
+        for alpha in alphas
+    ]
+
+
+def _search_luma(frame: "npt.NDArray[np.uint8]") -> "npt.NDArray[np.float32]":
+    """The frame's brightness, averaged over SEARCH_SCALE sized squares"""
+    height = frame.shape[0] // SEARCH_SCALE * SEARCH_SCALE
+    width = frame.shape[1] // SEARCH_SCALE * SEARCH_SCALE
+    luma = frame[:height, :width].astype(np.float32) @ np.array(
+        [0.299, 0.587, 0.114], dtype=np.float32
+    )
+    squares = luma.reshape(
+        height // SEARCH_SCALE, SEARCH_SCALE, width // SEARCH_SCALE, SEARCH_SCALE
+    )
+    return np.asarray(squares.mean(axis=(1, 3)), dtype=np.float32)
+
+
+def _sample(
+    frame: "npt.NDArray[np.uint8]",
+    rows: "npt.NDArray[np.int32]",
+    columns: "npt.NDArray[np.int32]",
+    offsets: "npt.NDArray[np.int32]",
+    scale: float,
+) -> "npt.NDArray[np.uint8]":
+    """Read each pixel from its offset, scaled, clamped to the edges of the frame"""
+    height, width = frame.shape[:2]
+    sample_rows = np.clip(rows + np.rint(offsets[..., 0] * scale).astype(np.int32), 0, height - 1)
+    sample_columns = np.clip(
+        columns + np.rint(offsets[..., 1] * scale).astype(np.int32), 0, width - 1
+    )
+    return np.asarray(frame[sample_rows, sample_columns], dtype=np.uint8)
@@ -0,0 +1,204 @@
+import logging
+import uuid
+from collections import OrderedDict
+from enum import Enum
+from pathlib import Path
+from queue import Queue
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, List, Optional
+
+from .base_generator import BaseGenerator
+
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class GenerationCancelled(Exception):
+    """Raised inside of a running generation when its job has been cancelled"""
+
+
+class GenerationJob:
+    """A request to run a generator, which is tracked by the GenerationQueue"""
+
+    def __init__(self, generator: BaseGenerator[Any], clear_previous: bool) -> None:
+        self.job_id = uuid.uuid4().hex[:8]
+        self.generator = generator
+        self.clear_previous = clear_previous
+        self.status = JobStatus.QUEUED
+        self.completed = 0
+        self.total: Optional[int] = None
+        self.error: Optional[str] = None
+
+        self._cancelled = Event()
+        self._finished = Event()
+
+    @property
+    def key(self) -> str:
+        """Jobs with the same key would produce the same results, so they can be coalesced"""
+        return f"{self.generator.fingerprint}-{self.clear_previous}"
+
+    @property
+    def is_finished(self) -> bool:
+        return self._finished.is_set()
+
+    def cancel(self) -> bool:
+        """Request that the job stops. Queued jobs never start, running jobs stop at the next
+        completed image.
+
+        :return: True if the job was still able to be cancelled
+        """
+        if self.is_finished:
+            return False
+        self._cancelled.set()
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job has finished
+        :param timeout: How long to wait, in seconds
+        :return: True if the job finished
+        """
+        return self._finished.wait(timeout=timeout)
+
+    def to_json(self) -> Dict[str, Any]:
+        """A summary of the job, suitable for displaying in the UI"""
+        return {
+            "job_id": self.job_id,
+            "generator": self.generator.__class__.__name__,
+            "status": self.status.value,
+            "progress": f"{self.completed}/{'?' if self.total is None else self.total}",
+            "error": self.error,
+        }
+
+    def _on_progress(self, completed: int, total: int) -> None:
+        if self._cancelled.is_set():
+            raise GenerationCancelled(f"Job {self.job_id} was cancelled")
+        self.completed = completed
+        self.total = total
+
+    def _run(self) -> None:
+        if self._cancelled.is_set():
+            self.status = JobStatus.CANCELLED
+            return
+
+        self.status = JobStatus.RUNNING
+        try:
+            self.generator.generate(
+                clear_previous=self.clear_previous, progress_callback=self._on_progress
+            )
+        except GenerationCancelled:
+            self.status = JobStatus.CANCELLED
+        except Exception as e:
+            logging.exception(f"Generation job {self.job_id} failed")
+            self.status = JobStatus.FAILED
+            self.error = str(e)
+        else:
+            self.status = JobStatus.SUCCEEDED
+
+
+class GenerationQueue:
+    """Runs generation jobs on a pool of background workers, so that callers don't have to block
+    on API calls. Jobs that write to the same images directory are run one at a time."""
+
+    def __init__(
+        self,
+        num_workers: int = 2,
+        on_job_finished: Optional[Callable[[GenerationJob], None]] = None,
+        max_history: int = 20,
+    ) -> None:
+        """
+        :param num_workers: How many jobs may run at once
+        :param on_job_finished: Called from a worker thread after each job finishes
+        :param max_history: How many finished jobs to remember for status queries
+        """
+        self._on_job_finished = on_job_finished
+        self._max_history = max_history
+
+        self._lock = Lock()
+        self._jobs: "OrderedDict[str, GenerationJob]" = OrderedDict()
+        self._dir_locks: Dict[Path, Lock] = {}
+        self._queue: "Queue[Optional[GenerationJob]]" = Queue()
+
+        self._workers = [
+            Thread(target=self._work_loop, daemon=True, name=f"generation-worker-{i}")
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, generator: BaseGenerator[Any], clear_previous: bool) -> GenerationJob:
+        """Queue a generation. If an identical job is already queued or running, that job is
+        returned instead of starting a duplicate one."""
+        job = GenerationJob(generator=generator, clear_previous=clear_previous)
+
+        with self._lock:
+            for existing in self._jobs.values():
+                if not existing.is_finished and existing.key == job.key:
+                    logging.info(f"Coalescing duplicate request into job {existing.job_id}")
+                    return existing
+
+            self._jobs[job.job_id] = job
+            self._trim_history()
+
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job by ID
+        :param job_id: The ID of the job to cancel
+        :return: True if the job existed and was cancellable
+        """
+        job = self.get(job_id)
+        return job is not None and job.cancel()
+
+    @property
+    def jobs(self) -> List[GenerationJob]:
+        """All pending jobs and recently finished jobs, oldest first"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def close(self) -> None:
+        """Cancel all unfinished jobs and stop the workers"""
+        for job in self.jobs:
+            job.cancel()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def _work_loop(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            # Only one job may write to a given images directory at a time
+            with self._dir_lock(job.generator.images_dir):
+                job._run()
+            job._finished.set()
+
+            if self._on_job_finished is not None:
+                try:
+                    self._on_job_finished(job)
+                except Exception:
+                    logging.exception(f"Error while handling completion of job {job.job_id}")
+
+    def _dir_lock(self, images_dir: Path) -> Lock:
+        """The lock for an images directory. It's created under the queue's lock, so workers
+        never create two locks for the same directory."""
+        with self._lock:
+            return self._dir_locks.setdefault(images_dir, Lock())
+
+    def _trim_history(self) -> None:
+        """Forget the oldest finished jobs, once there are too many"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[: max(0, len(finished) - self._max_history)]:
+            del self._jobs[job_id]
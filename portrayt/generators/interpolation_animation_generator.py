@@ -1,51 +1,220 @@
 import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from io import BytesIO
 from pathlib import Path
-from tempfile import NamedTemporaryFile
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
 
-import replicate
-import requests
+import numpy as np
 from PIL import Image
 
-from portrayt.configuration import PromptInterpolationAnimation
+from portrayt.configuration import InterpolationMethod, PromptInterpolationAnimation
+from portrayt.library import SEQUENCE_SUFFIX, FrameSequenceWriter
+from portrayt.library.storage_manager import WEBP_EFFORT
 
-from .base_generator import BaseGenerator
+from .base_generator import BaseGenerator, PostProcessor
+from .downloads import Downloader
+from .frame_interpolation import interpolate, segment_positions
+from .prediction_backend import PredictionBackend
+from .prediction_journal import PredictionJournal
+from .result_cache import ResultCache
+
+MODEL_NAME = "andreasjansson/stable-diffusion-animation"
+
+PNG_SAVE_ARGS: Dict[str, Any] = {"format": "PNG"}
+"""How frames are encoded when each is saved to its own file"""
+
+SEQUENCE_SAVE_ARGS: Dict[str, Any] = {"format": "WEBP", "lossless": True, "quality": WEBP_EFFORT}
+"""How frames are encoded in a frame sequence. Each frame is encoded on its own, because the gif's
+dithering makes the differences between frames compress worse than whole frames do. See
+benchmarks.bench_frame_sequence."""
 
 
 class InterpolationAnimationGenerator(BaseGenerator[PromptInterpolationAnimation]):
+    LOCAL_PARAMS = frozenset({"encode_workers"})
+
+    def __init__(
+        self,
+        params: PromptInterpolationAnimation,
+        height: int,
+        width: int,
+        seed: int,
+        cache_dir: Path,
+        post_processors: Sequence[PostProcessor] = (),
+        downloader: Optional[Downloader] = None,
+        result_cache: Optional[ResultCache] = None,
+        backend: Optional[PredictionBackend] = None,
+        journal: Optional[PredictionJournal] = None,
+        encode_workers: Optional[int] = None,
+    ) -> None:
+        """
+        :param encode_workers: How many processes to interpolate and encode frames with. Defaults
+            to the parameters' encode_workers, or one per CPU if that's 0.
+        """
+        super().__init__(
+            params,
+            height,
+            width,
+            seed,
+            cache_dir,
+            post_processors=post_processors,
+            downloader=downloader,
+            result_cache=result_cache,
+            backend=backend,
+            journal=journal,
+        )
+        self._encode_workers = encode_workers or params.encode_workers or os.cpu_count() or 1
+
     def _generate(self, save_dir: Path, start_idx: int) -> None:
+        self._report_progress(0, self._params.num_animation_frames)
+
+        inputs = {
+            "prompt_start": self._params.prompt_start,
+            "prompt_end": self._params.prompt_end,
+            "propmt_strength": self._params.prompt_strength,
+            "num_animation_frames": self._params.num_animation_frames,
+            "gif_ping_pong": self._params.seamless_loop,
+            "width": self._width,
+            "height": self._height,
+            "seed": self._seed,
+            "film_interpolation": True,
+            "num_interpolation_steps": 1,
+            "guidance_scale": 7.5,
+            "gif_frames_per_second": 1,  # irrelevant
+            "output_format": "gif",
+            "num_inference_steps": 50,
+        }
+        # A new version of the model makes different animations, so it's part of the cache key
+        version = self._backend.latest_version(MODEL_NAME)
+        cache_key = ResultCache.key(f"{MODEL_NAME}:{version}", inputs)
+        cached_path = None if self._result_cache is None else self._result_cache.get(cache_key)
+        if cached_path is not None:
+            gif_data = cached_path.read_bytes()
+        else:
+            gif_url = self._predict(MODEL_NAME, version, inputs)[0]
+            logging.info(f"Generated gif {gif_url}")
+
+            gif_data = self._downloader.fetch(gif_url)
+            if self._result_cache is not None:
+                self._result_cache.put_bytes(cache_key, gif_data)
+
+        self._save_frames(gif_data, save_dir, start_idx)
+
+    def _save_frames(self, gif_data: bytes, save_dir: Path, start_idx: int) -> None:
+        """Save each frame of the gif as a PNG, or all of them in one frame sequence"""
+        if self._params.frame_sequence:
+            with FrameSequenceWriter(save_dir / f"{start_idx}{SEQUENCE_SUFFIX}") as writer:
+                for frame_data in self._encode_frames(gif_data, SEQUENCE_SAVE_ARGS):
+                    writer.append(frame_data)
+            return
 
-        model = replicate.models.get("andreasjansson/stable-diffusion-animation")
-        gif_url = next(
-            model.predict(
-                prompt_start=self._params.prompt_start,
-                prompt_end=self._params.prompt_end,
-                propmt_strength=self._params.prompt_strength,
-                num_animation_frames=self._params.num_animation_frames,
-                gif_ping_pong=self._params.seamless_loop,
-                width=self._width,
-                height=self._height,
-                seed=self._seed,
-                film_interpolation=True,
-                num_interpolation_steps=1,
-                guidance_scale=7.5,
-                gif_frames_per_second=1,  # irrelevant
-                output_format="gif",
-                num_inference_steps=50,
-            )
+        for frame_id, frame_data in enumerate(self._encode_frames(gif_data, PNG_SAVE_ARGS)):
+            (save_dir / f"{start_idx + frame_id}.png").write_bytes(frame_data)
+
+    def _encode_frames(self, gif_data: bytes, save_args: Dict[str, Any]) -> Iterator[bytes]:
+        """Decode each frame of the gif in memory, interpolate any frames that are added between
+        them, and encode them all in parallel
+
+        :param gif_data: The gif
+        :param save_args: Arguments to Image.save for each frame
+        :return: The encoded frames, in order
+        """
+        with Image.open(BytesIO(gif_data)) as gif:
+            segments = segment_positions(gif.n_frames, self._params.num_display_frames)
+            num_output = sum(len(alphas) for alphas in segments)
+            completed = 0
+            for encoded in self._encode_segments(gif, segments, save_args):
+                yield from encoded
+                completed += len(encoded)
+                self._report_progress(completed, num_output)
+
+    def _encode_segments(
+        self, gif: Image.Image, segments: List[List[float]], save_args: Dict[str, Any]
+    ) -> Iterator[List[bytes]]:
+        """Encode each frame of the gif, with the frames interpolated after it, in order"""
+        method = self._params.interpolation_method
+        tasks = (
+            (start, end, alphas, method, save_args)
+            for (start, end), alphas in zip(_frame_pairs(gif), segments)
+        )
+        if self._encode_workers == 1:
+            # Sending frames to another process would only add overhead
+            for task in tasks:
+                yield _encode_segment(*task)
+            return
+
+        # Forking would copy this process's threads' locks in whatever state they're in, such as
+        # the generation queue's or a renderer's, so workers are started from a clean process
+        start_method = (
+            "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
         )
+        with ProcessPoolExecutor(
+            max_workers=self._encode_workers, mp_context=multiprocessing.get_context(start_method)
+        ) as executor:
+            pending: Deque["Future[List[bytes]]"] = deque()
+            try:
+                for task in tasks:
+                    # Limit how many decoded frames are held in memory at once
+                    if len(pending) >= self._encode_workers * 2:
+                        yield pending.popleft().result()
+                    pending.append(executor.submit(_encode_segment, *task))
+
+                while pending:
+                    yield pending.popleft().result()
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+
+
+def _frame_pairs(gif: Image.Image) -> Iterator[Tuple[Image.Image, Optional[Image.Image]]]:
+    """Each frame of the gif, and the frame after it. Frames are decoded in order, since seeking
+    backwards in a gif decodes it again from the start."""
+    gif.seek(0)
+    previous = gif.copy()
+    for frame_id in range(1, gif.n_frames):
+        gif.seek(frame_id)
+        current = gif.copy()
+        yield previous, current
+        previous = current
+    yield previous, None
+
 
-        logging.info(f"Generated gif {gif_url}")
+def _encode_segment(
+    start: Image.Image,
+    end: Optional[Image.Image],
+    alphas: Sequence[float],
+    method: InterpolationMethod,
+    save_args: Dict[str, Any],
+) -> List[bytes]:
+    """Encode a frame, and the frames interpolated between it and the next frame. This usually
+    runs in a worker process.
 
-        gif_data = requests.get(gif_url).content
+    :param start: The frame
+    :param end: The next frame, or None if this is the last frame
+    :param alphas: How far towards the next frame each frame to encode is. At 0, it's the frame
+        itself.
+    :param method: How to interpolate frames
+    :param save_args: Arguments to Image.save for each frame
+    :return: The encoded frames, in order
+    """
+    if end is None or not any(alphas):
+        return [_encode_frame(start, save_args) for _ in alphas]
 
-        # Write the gif to a temporary file, then save each individual frame
-        with NamedTemporaryFile() as gif_path:
-            Path(gif_path.name).write_bytes(gif_data)
+    frames = interpolate(
+        np.asarray(start.convert("RGB")), np.asarray(end.convert("RGB")), alphas, method
+    )
+    return [
+        # Frames from the gif are encoded as they are, since their palette makes them smaller
+        _encode_frame(start if alpha == 0 else Image.fromarray(pixels), save_args)
+        for alpha, pixels in zip(alphas, frames)
+    ]
 
-            # Open the gif and save the individual frames
-            with Image.open(str(gif_path.name)) as gif:
-                for frame_id in range(gif.n_frames):
-                    gif.seek(frame_id)
 
-                    image_path = save_dir / f"{start_idx + frame_id}.png"
-                    gif.save(str(image_path))
+def _encode_frame(frame: Image.Image, save_args: Dict[str, Any]) -> bytes:
+    """Encode a frame"""
+    buffer = BytesIO()
+    frame.save(buffer, **save_args)
+    return buffer.getvalue()
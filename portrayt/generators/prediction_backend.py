@@ -0,0 +1,104 @@
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from replicate.exceptions import ModelError
+
+from .replicate_client import ClientLimits, ReplicateClient, shared_replicate_client
+
+
+class PredictionBackend(ABC):
+    """Runs predictions on a hosted model. Predictions are identified by an ID, so that one that
+    was started before a restart can be waited on again afterwards."""
+
+    @contextmanager
+    def reserve(self, job: str) -> Iterator[None]:
+        """Hold one of the backend's prediction slots while a prediction is created and waited on.
+        By default there's no limit on how many predictions can run at once.
+
+        :param job: Identifies the job the prediction is for, so slots can be shared fairly
+        """
+        yield
+
+    @abstractmethod
+    def latest_version(self, model: str) -> str:
+        """Return the ID of the newest version of a model
+
+        :param model: The model's name, such as 'stability-ai/stable-diffusion'
+        """
+
+    @abstractmethod
+    def create(self, model: str, version: str, inputs: Dict[str, Any]) -> str:
+        """Start a prediction, without waiting for it to finish
+
+        :param model: The model's name
+        :param version: The ID of the model version to run
+        :param inputs: The inputs to the model
+        :return: The ID of the prediction
+        """
+
+    @abstractmethod
+    def wait(self, prediction_id: str) -> List[Any]:
+        """Wait for a prediction to finish
+
+        :param prediction_id: The ID returned by 'create'
+        :return: The outputs of the prediction, as a list even if the model returns a single value
+        :raises ModelError: If the prediction failed or was cancelled
+        """
+
+
+class ReplicateBackend(PredictionBackend):
+    """Runs predictions with the Replicate API"""
+
+    FINISHED_STATUSES = {"succeeded", "failed", "canceled"}
+
+    def __init__(self, client: Optional[ReplicateClient] = None, poll_seconds: float = 0.5) -> None:
+        """
+        :param client: The client to make requests with. By default, a client shared by every
+            backend is used, so that they're all throttled together.
+        :param poll_seconds: How often to check whether a prediction has finished
+        """
+        self._client = client or shared_replicate_client()
+        self._poll_seconds = poll_seconds
+        self._lock = Lock()
+        self._versions: Dict[Tuple[str, str], Any] = {}
+
+    @property
+    def limits(self) -> ClientLimits:
+        """The client's current limits, and how long requests have waited for them"""
+        return self._client.limits
+
+    @contextmanager
+    def reserve(self, job: str) -> Iterator[None]:
+        with self._client.concurrency.slot(job):
+            yield
+
+    def latest_version(self, model: str) -> str:
+        version = self._client.models.get(model).versions.list()[0]
+        with self._lock:
+            self._versions[(model, version.id)] = version
+        return str(version.id)
+
+    def create(self, model: str, version: str, inputs: Dict[str, Any]) -> str:
+        with self._lock:
+            model_version = self._versions.get((model, version))
+        if model_version is None:
+            model_version = self._client.models.get(model).versions.get(version)
+            with self._lock:
+                self._versions[(model, version)] = model_version
+
+        prediction = self._client.predictions.create(version=model_version, input=inputs)
+        return str(prediction.id)
+
+    def wait(self, prediction_id: str) -> List[Any]:
+        prediction = self._client.predictions.get(prediction_id)
+        while prediction.status not in self.FINISHED_STATUSES:
+            time.sleep(self._poll_seconds)
+            prediction = self._client.predictions.get(prediction_id)
+        if prediction.status != "succeeded":
+            raise ModelError(prediction.error or f"Prediction {prediction_id} {prediction.status}")
+
+        output = prediction.output
+        return output if isinstance(output, list) else [output]
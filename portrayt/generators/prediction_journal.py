@@ -0,0 +1,198 @@
+import json
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, List, NamedTuple, Optional
+
+from portrayt.library import CatalogEntry
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    clear_previous INTEGER NOT NULL,
+    start_idx INTEGER NOT NULL,
+    staging_dir TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    entries TEXT
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    job_id TEXT NOT NULL REFERENCES jobs (job_id) ON DELETE CASCADE,
+    request_key TEXT NOT NULL,
+    prediction_id TEXT NOT NULL,
+    outputs TEXT,
+    PRIMARY KEY (job_id, request_key)
+);
+CREATE TABLE IF NOT EXISTS downloads (
+    job_id TEXT NOT NULL REFERENCES jobs (job_id) ON DELETE CASCADE,
+    filename TEXT NOT NULL,
+    PRIMARY KEY (job_id, filename)
+);
+"""
+
+
+class JournalJob(NamedTuple):
+    job_id: str
+    fingerprint: str
+    """The fingerprint of the generator running the job, which can be used to recreate it"""
+    clear_previous: bool
+    start_idx: int
+    staging_dir: Path
+    created_at: float
+    entries: Optional[List[CatalogEntry]]
+    """The catalog entries for the job's results, once they've been generated and are being
+    published"""
+
+
+class JournalPrediction(NamedTuple):
+    prediction_id: str
+    outputs: Optional[List[Any]]
+    """The outputs of the prediction, or None if it hadn't finished yet"""
+
+
+class PredictionJournal:
+    """A durable record of generations that are in progress, so they can be finished after the
+    process restarts instead of starting over.
+
+    Each job records the staging directory its results are written to, every prediction it has
+    submitted along with their outputs, and which files have been fully downloaded. A job is
+    removed from the journal once its results have been published, so any job that's still in
+    the journal on startup was interrupted.
+    """
+
+    FILENAME = "journal.sqlite3"
+
+    def __init__(self, data_dir: Path) -> None:
+        self._db_path = data_dir / self.FILENAME
+        data_dir.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    def start_job(
+        self, fingerprint: str, clear_previous: bool, start_idx: int, staging_dir: Path
+    ) -> JournalJob:
+        job = JournalJob(
+            job_id=uuid.uuid4().hex,
+            fingerprint=fingerprint,
+            clear_previous=clear_previous,
+            start_idx=start_idx,
+            staging_dir=staging_dir,
+            created_at=time.time(),
+            entries=None,
+        )
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                (
+                    job.job_id,
+                    fingerprint,
+                    clear_previous,
+                    start_idx,
+                    str(staging_dir),
+                    job.created_at,
+                ),
+            )
+        return job
+
+    def find_job(self, fingerprint: str, clear_previous: bool) -> Optional[JournalJob]:
+        """Find an interrupted job that was making the same request"""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE fingerprint = ? AND clear_previous = ?"
+                " ORDER BY created_at DESC",
+                (fingerprint, clear_previous),
+            ).fetchone()
+        return None if row is None else self._to_job(row)
+
+    def unfinished_jobs(self) -> List[JournalJob]:
+        """All jobs that haven't been finished or discarded, oldest first"""
+        with self._connect() as connection:
+            rows = connection.execute("SELECT * FROM jobs ORDER BY created_at").fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def finish_job(self, job_id: str) -> None:
+        """Remove a job, along with its predictions and downloads, from the journal"""
+        with self._connect() as connection:
+            connection.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def commit_job(self, job_id: str, entries: List[CatalogEntry]) -> None:
+        """Record that a job's results are complete, and are about to be published"""
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET entries = ? WHERE job_id = ?",
+                (json.dumps([list(entry) for entry in entries]), job_id),
+            )
+
+    def move_job(self, job_id: str, start_idx: int) -> None:
+        """Change where a job's images will be numbered from. Any downloads are forgotten, since
+        they were saved with the old numbering."""
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET start_idx = ? WHERE job_id = ?", (start_idx, job_id)
+            )
+            connection.execute("DELETE FROM downloads WHERE job_id = ?", (job_id,))
+
+    def record_prediction(self, job_id: str, request_key: str, prediction_id: str) -> None:
+        """Record that a prediction was submitted, before waiting for it to finish"""
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, NULL)",
+                (job_id, request_key, prediction_id),
+            )
+
+    def record_outputs(self, job_id: str, request_key: str, outputs: List[Any]) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE predictions SET outputs = ? WHERE job_id = ? AND request_key = ?",
+                (json.dumps(outputs), job_id, request_key),
+            )
+
+    def get_prediction(self, job_id: str, request_key: str) -> Optional[JournalPrediction]:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT prediction_id, outputs FROM predictions"
+                " WHERE job_id = ? AND request_key = ?",
+                (job_id, request_key),
+            ).fetchone()
+        if row is None:
+            return None
+        prediction_id, outputs = row
+        return JournalPrediction(prediction_id, None if outputs is None else json.loads(outputs))
+
+    def record_download(self, job_id: str, filename: str) -> None:
+        """Record that a file in the job's staging directory has been completely downloaded"""
+        with self._connect() as connection:
+            connection.execute("INSERT OR IGNORE INTO downloads VALUES (?, ?)", (job_id, filename))
+
+    def is_downloaded(self, job_id: str, filename: str) -> bool:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT 1 FROM downloads WHERE job_id = ? AND filename = ?", (job_id, filename)
+            ).fetchone()
+        return row is not None
+
+    @staticmethod
+    def _to_job(row: Any) -> JournalJob:
+        job_id, fingerprint, clear_previous, start_idx, staging_dir, created_at, entries = row
+        return JournalJob(
+            job_id=job_id,
+            fingerprint=fingerprint,
+            clear_previous=bool(clear_previous),
+            start_idx=start_idx,
+            staging_dir=Path(staging_dir),
+            created_at=created_at,
+            entries=None if entries is None else [CatalogEntry(*e) for e in json.loads(entries)],
+        )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection, so the journal can be used from any thread"""
+        connection = sqlite3.connect(self._db_path, timeout=30)
+        try:
+            connection.execute("PRAGMA foreign_keys = ON")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
@@ -0,0 +1,232 @@
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from threading import Condition, Lock
+from typing import Deque, Dict, Iterator, Optional
+
+
+class TokenBucket:
+    """Limits how often something happens, while still allowing short bursts.
+
+    Tokens are reserved in the order they're asked for, so callers are served first come, first
+    served even when the bucket is empty.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        """
+        :param rate: How many tokens are added per second
+        :param burst: How many tokens the bucket holds, which is how many can be taken at once
+        """
+        self.rate = rate
+        self.burst = burst
+
+        self._lock = Lock()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._acquired = 0
+        self._total_wait = 0.0
+
+    @property
+    def average_wait(self) -> float:
+        """The average number of seconds a caller has waited for a token"""
+        with self._lock:
+            return self._total_wait / self._acquired if self._acquired else 0.0
+
+    def acquire(self) -> float:
+        """Take a token, waiting until one is available
+
+        :return: How many seconds were spent waiting
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            ready_at = max(now, self._paused_until) + max(0.0, -self._tokens) / self.rate
+            delay = ready_at - now
+            self._acquired += 1
+            self._total_wait += delay
+
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for a while, such as when the server asks us to back off.
+        No tokens accumulate while paused, so there's no burst when the pause ends."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = min(self._tokens, 0.0)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - max(self._updated, self._paused_until)
+        if elapsed > 0:
+            self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate)
+        self._updated = max(self._updated, now)
+
+
+class _Ticket:
+    __slots__ = ("granted",)
+
+    def __init__(self) -> None:
+        self.granted = False
+
+
+class AdaptiveConcurrencyLimiter:
+    """Limits how many operations run at once, adapting the limit to how the server copes.
+
+    The limit follows AIMD: it grows by about one for each limit's worth of operations that
+    succeed, and halves when the server throttles us or an operation takes much longer than
+    usual, which means it's being queued. Slots are handed out to jobs in turn, so a job that
+    submits many operations at once can't starve the others.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 4,
+        min_limit: float = 1,
+        max_limit: float = 16,
+        latency_tolerance: float = 2,
+        min_congested_latency: float = 1,
+        decrease_ratio: float = 0.5,
+        cooldown_seconds: float = 1,
+    ) -> None:
+        """
+        :param initial_limit: How many operations may run at once to begin with
+        :param min_limit: The limit never drops below this
+        :param max_limit: The limit never grows above this
+        :param latency_tolerance: An operation that takes this many times longer than the
+            average counts as a sign of congestion
+        :param min_congested_latency: Operations quicker than this many seconds never count as
+            a sign of congestion, since small timings are mostly noise
+        :param decrease_ratio: What the limit is multiplied by on congestion
+        :param cooldown_seconds: The limit is decreased at most once per this many seconds, so a
+            burst of throttled responses to the same overload only counts once
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.min_congested_latency = min_congested_latency
+        self.decrease_ratio = decrease_ratio
+        self.cooldown_seconds = cooldown_seconds
+
+        self._condition = Condition()
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+        self._average_latency: Optional[float] = None
+        self._last_decrease = float("-inf")
+        self._acquired = 0
+        self._total_wait = 0.0
+        self._throttled = 0
+
+    @property
+    def limit(self) -> int:
+        with self._condition:
+            return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        with self._condition:
+            return self._in_flight
+
+    @property
+    def throttled(self) -> int:
+        """How many times the server has throttled us"""
+        with self._condition:
+            return self._throttled
+
+    @property
+    def average_wait(self) -> float:
+        """The average number of seconds an operation has waited for a slot"""
+        with self._condition:
+            return self._total_wait / self._acquired if self._acquired else 0.0
+
+    def waiting(self) -> Dict[str, int]:
+        """How many operations are waiting for a slot, by job"""
+        with self._condition:
+            return {job: len(queue) for job, queue in self._queues.items()}
+
+    def acquire(self, job: str = "") -> float:
+        """Wait for a slot. Every call must be paired with a call to 'release'.
+
+        :param job: Slots are shared fairly between jobs, in turn
+        :return: How many seconds were spent waiting
+        """
+        ticket = _Ticket()
+        start = time.monotonic()
+        with self._condition:
+            self._queues.setdefault(job, deque()).append(ticket)
+            self._dispatch()
+            self._condition.wait_for(lambda: ticket.granted)
+
+            waited = time.monotonic() - start
+            self._acquired += 1
+            self._total_wait += waited
+        return waited
+
+    def release(self, latency: Optional[float] = None) -> None:
+        """Give back a slot
+
+        :param latency: How long the operation took, or None if it failed, in which case it
+            doesn't affect the limit
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if latency is not None:
+                average = self._average_latency
+                if (
+                    average is not None
+                    and latency > average * self.latency_tolerance
+                    and latency >= self.min_congested_latency
+                ):
+                    self._decrease()
+                else:
+                    self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                self._average_latency = (
+                    latency if average is None else 0.8 * average + 0.2 * latency
+                )
+            self._dispatch()
+
+    def record_throttled(self) -> None:
+        """Record that the server has asked us to slow down"""
+        with self._condition:
+            self._throttled += 1
+            self._decrease()
+
+    @contextmanager
+    def slot(self, job: str = "") -> Iterator[None]:
+        """Hold a slot while running an operation, timing it to adapt the limit"""
+        self.acquire(job)
+        start = time.monotonic()
+        latency: Optional[float] = None
+        try:
+            yield
+            latency = time.monotonic() - start
+        finally:
+            self.release(latency)
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown_seconds:
+            return
+        self._last_decrease = now
+        self._limit = max(self.min_limit, self._limit * self.decrease_ratio)
+
+    def _dispatch(self) -> None:
+        """Hand out free slots, taking one waiting operation from each job in turn"""
+        granted = False
+        while self._queues and self._in_flight < int(self._limit):
+            job, queue = next(iter(self._queues.items()))
+            queue.popleft().granted = True
+            self._in_flight += 1
+            granted = True
+
+            # Send the job to the back of the line
+            del self._queues[job]
+            if queue:
+                self._queues[job] = queue
+        if granted:
+            self._condition.notify_all()
@@ -0,0 +1,116 @@
+import logging
+from json import JSONDecodeError
+from threading import Lock
+from typing import Any, Dict, NamedTuple, Optional
+
+import replicate
+import requests
+from replicate.exceptions import ReplicateError
+
+from .rate_limiting import AdaptiveConcurrencyLimiter, TokenBucket
+
+
+class ClientLimits(NamedTuple):
+    requests_per_second: float
+    concurrency_limit: int
+    """How many predictions may currently run at once"""
+    in_flight: int
+    waiting: Dict[str, int]
+    """How many predictions are waiting to be started, by job"""
+    throttled: int
+    """How many requests the API has rejected for exceeding its rate limit"""
+    average_request_wait: float
+    average_prediction_wait: float
+
+
+class ReplicateClient(replicate.Client):
+    """A Replicate API client that throttles itself, so that generators running in parallel
+    don't exceed the API's rate limits or flood a model's queue.
+
+    Every request waits for a token from a token bucket. Requests that are rejected with a 429
+    pause the bucket, for as long as the API asks when it says, and are then retried. Predictions
+    are run within slots from an adaptive concurrency limiter, which backs off when requests are
+    throttled or predictions start taking much longer than usual.
+    """
+
+    def __init__(
+        self,
+        api_token: Optional[str] = None,
+        requests_per_second: float = 5,
+        burst: int = 10,
+        concurrency: Optional[AdaptiveConcurrencyLimiter] = None,
+        max_throttled_retries: int = 5,
+        backoff_seconds: float = 1,
+    ) -> None:
+        """
+        :param api_token: The API token, defaulting to the REPLICATE_API_TOKEN env variable
+        :param requests_per_second: The sustained rate requests may be sent at
+        :param burst: How many requests may be sent at once, after a quiet period
+        :param concurrency: Limits how many predictions run at once
+        :param max_throttled_retries: How many times to retry a request that was throttled
+        :param backoff_seconds: How long to pause after being throttled, if the API doesn't say.
+            It doubles with each retry.
+        """
+        super().__init__(api_token=api_token)
+        self.request_bucket = TokenBucket(requests_per_second, burst)
+        self.concurrency = concurrency or AdaptiveConcurrencyLimiter()
+        self.max_throttled_retries = max_throttled_retries
+        self.backoff_seconds = backoff_seconds
+
+    @property
+    def limits(self) -> ClientLimits:
+        return ClientLimits(
+            requests_per_second=self.request_bucket.rate,
+            concurrency_limit=self.concurrency.limit,
+            in_flight=self.concurrency.in_flight,
+            waiting=self.concurrency.waiting(),
+            throttled=self.concurrency.throttled,
+            average_request_wait=self.request_bucket.average_wait,
+            average_prediction_wait=self.concurrency.average_wait,
+        )
+
+    def _request(self, method: str, path: str, **kwargs: Any) -> requests.Response:
+        if method in ["GET", "OPTIONS"]:
+            kwargs.setdefault("allow_redirects", True)
+        if method in ["HEAD"]:
+            kwargs.setdefault("allow_redirects", False)
+        kwargs.setdefault("headers", {})
+        kwargs["headers"].update(self._headers())
+
+        for attempt in range(self.max_throttled_retries + 1):
+            self.request_bucket.acquire()
+            response = self.session.request(method, self.base_url + path, **kwargs)
+            if response.status_code != 429 or attempt == self.max_throttled_retries:
+                break
+
+            delay = self._retry_delay(response, attempt)
+            logging.warning(f"Replicate throttled {method} {path}. Retrying in {delay}s")
+            self.concurrency.record_throttled()
+            self.request_bucket.pause(delay)
+
+        if 400 <= response.status_code < 600:
+            try:
+                raise ReplicateError(response.json()["detail"])
+            except (JSONDecodeError, KeyError, TypeError):
+                pass
+            raise ReplicateError(f"HTTP error: {response.status_code, response.reason}")
+        return response
+
+    def _retry_delay(self, response: requests.Response, attempt: int) -> float:
+        try:
+            return max(0.0, float(response.headers["Retry-After"]))
+        except (KeyError, ValueError):
+            return float(self.backoff_seconds * 2**attempt)
+
+
+_shared_client: Optional[ReplicateClient] = None
+_shared_client_lock = Lock()
+
+
+def shared_replicate_client() -> ReplicateClient:
+    """Return a client shared by all generators, so they're throttled together"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = ReplicateClient()
+        return _shared_client
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, NamedTuple, Optional
+from uuid import uuid4
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    entries: int
+    size_bytes: int
+
+
+class ResultCache:
+    """A content-addressed cache of prediction outputs, keyed by the model and the exact inputs
+    sent to it, so that repeating a request doesn't pay for the same prediction twice.
+
+    Entries are copied into images directories, rather than hard linked, so that deleting an
+    image frees its space, and files that are served never share their modification time with
+    the cache. The least recently used entries are evicted once the cache grows past its size
+    limit. When each entry was last used is kept in a marker file of its own.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int) -> None:
+        """
+        :param cache_dir: The directory to store results in
+        :param max_bytes: The most space cached results may use before old ones are evicted
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._used_dir = cache_dir / ".last-used"
+        """Holds an empty file for each entry that's been used, modified when it was last used"""
+        self._used_dir.mkdir(exist_ok=True)
+
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def key(model: str, inputs: Dict[str, Any]) -> str:
+        """Return the cache key for a prediction
+
+        :param model: The name, and version if known, of the model being run
+        :param inputs: Every input sent to the model
+        """
+        request = json.dumps({"model": model, "inputs": inputs}, sort_keys=True)
+        return hashlib.sha256(request.encode()).hexdigest()
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            entries = self._entries()
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                entries=len(entries),
+                size_bytes=sum(entry.stat().st_size for entry in entries),
+            )
+
+    def get(self, key: str) -> Optional[Path]:
+        """Look up a cached result, marking it as recently used
+
+        :return: The path of the cached file, or None if the result isn't cached
+        """
+        entry = self.cache_dir / key
+        with self._lock:
+            if not entry.is_file():
+                self._misses += 1
+                return None
+            (self._used_dir / key).touch()
+            self._hits += 1
+        logging.info(f"Reusing cached result {key}. {self.stats}")
+        return entry
+
+    def restore(self, key: str, target_path: Path) -> bool:
+        """Copy a cached result to a path, if it's cached
+
+        :return: True if the result was cached, and has been restored to target_path
+        """
+        entry = self.get(key)
+        if entry is None:
+            return False
+        shutil.copyfile(entry, target_path)
+        return True
+
+    def put(self, key: str, source_path: Path) -> None:
+        """Add a result to the cache, evicting old results if the cache is too large"""
+        if self.max_bytes <= 0:
+            return
+
+        # Copy to a temporary name first, so a partially copied entry is never visible
+        temp_path = self.cache_dir / f".{key}.{uuid4().hex[:8]}.tmp"
+        try:
+            shutil.copyfile(source_path, temp_path)
+            os.replace(temp_path, self.cache_dir / key)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        self._evict()
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        """Add a result that's held in memory to the cache"""
+        if self.max_bytes <= 0:
+            return
+
+        temp_path = self.cache_dir / f".{key}.{uuid4().hex[:8]}.tmp"
+        try:
+            temp_path.write_bytes(data)
+            os.replace(temp_path, self.cache_dir / key)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = sorted(
+                ((entry.stat(), entry) for entry in self._entries()),
+                key=lambda e: self._last_used(e[1], e[0].st_mtime),
+            )
+            total_bytes = sum(stat.st_size for stat, _ in entries)
+            for stat, entry in entries:
+                if total_bytes <= self.max_bytes:
+                    break
+                entry.unlink(missing_ok=True)
+                (self._used_dir / entry.name).unlink(missing_ok=True)
+                total_bytes -= stat.st_size
+
+    def _last_used(self, entry: Path, added_at: float) -> float:
+        """When an entry was last used, or added if it hasn't been used since"""
+        try:
+            return max(added_at, (self._used_dir / entry.name).stat().st_mtime)
+        except FileNotFoundError:
+            return added_at
+
+    def _entries(self) -> List[Path]:
+        """All cached results, excluding files that are still being written"""
+        return [path for path in self.cache_dir.iterdir() if not path.name.startswith(".")]
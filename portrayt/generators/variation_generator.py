@@ -1,29 +1,85 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-
-import replicate
-import requests
+from typing import Any, Dict, List
 
 from portrayt.configuration import PromptGenerateVariations
 
 from .base_generator import BaseGenerator
+from .result_cache import ResultCache
+
+MODEL_NAME = "stability-ai/stable-diffusion"
 
 
 class VariationGenerator(BaseGenerator[PromptGenerateVariations]):
     def _generate(self, save_dir: Path, start_idx: int) -> None:
-        model = replicate.models.get("stability-ai/stable-diffusion")
-        for variation_id in range(self._params.num_variations):
-            image_url = model.predict(
-                prompt=self._params.prompt,
-                guidance_scale=7.5,
-                num_inference_steps=50,
-                seed=self._seed + variation_id,
-                width=self._width,
-                height=self._height,
-            )[0]
-
-            logging.info(f"Generated image {image_url}")
-
-            image_data = requests.get(image_url).content
-            image_path = save_dir / f"{start_idx + variation_id}.png"
-            image_path.write_bytes(image_data)
+        # Resolve the model version once, instead of once per prediction
+        version = self._backend.latest_version(MODEL_NAME)
+
+        # Split the variations into as few predictions as allowed. Each prediction's seed is
+        # based on its first variation, so results are reproducible for a given seed.
+        num_variations = self._params.num_variations
+        batch_size = self._params.outputs_per_prediction
+        batches = [
+            list(range(first, min(first + batch_size, num_variations)))
+            for first in range(0, num_variations, batch_size)
+        ]
+
+        with ThreadPoolExecutor(max_workers=self._params.max_concurrent_predictions) as executor:
+            futures = {
+                executor.submit(
+                    self._generate_batch,
+                    version=version,
+                    image_paths=[save_dir / f"{start_idx + v}.png" for v in variation_ids],
+                    seed=self._seed + variation_ids[0],
+                ): len(variation_ids)
+                for variation_ids in batches
+            }
+            completed = 0
+            self._report_progress(completed, num_variations)
+            try:
+                for future in as_completed(futures):
+                    future.result()
+                    completed += futures[future]
+                    self._report_progress(completed, num_variations)
+            except BaseException:
+                # Don't start any more predictions if one failed or generation was aborted
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def _generate_batch(self, version: str, image_paths: List[Path], seed: int) -> None:
+        """Run a single prediction and download its outputs to image_paths, in order"""
+        inputs: Dict[str, Any] = {
+            "prompt": self._params.prompt,
+            "guidance_scale": 7.5,
+            "num_inference_steps": 50,
+            "seed": seed,
+            "width": self._width,
+            "height": self._height,
+        }
+        if len(image_paths) > 1:
+            inputs["num_outputs"] = len(image_paths)
+
+        cache_keys = [
+            ResultCache.key(
+                f"{MODEL_NAME}:{version}",
+                inputs if len(image_paths) == 1 else {**inputs, "output": i},
+            )
+            for i in range(len(image_paths))
+        ]
+        if self._result_cache is not None and all(
+            self._result_cache.restore(cache_key, image_path)
+            for cache_key, image_path in zip(cache_keys, image_paths)
+        ):
+            return
+
+        image_urls = self._predict(MODEL_NAME, version, inputs)
+        if len(image_urls) != len(image_paths):
+            raise RuntimeError(f"Expected {len(image_paths)} outputs, but got {image_urls}")
+        logging.info(f"Generated images {image_urls}")
+
+        for cache_key, image_url, image_path in zip(cache_keys, image_urls, image_paths):
+            self._download(image_url, image_path)
+            if self._result_cache is not None:
+                self._result_cache.put(cache_key, image_path)
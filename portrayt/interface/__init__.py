@@ -1 +1,9 @@
-from .main_ui import MainApp
+from typing import TYPE_CHECKING
+
+from portrayt.lazy_imports import lazy_attributes
+
+if TYPE_CHECKING:
+    from .main_ui import MainApp
+
+# The dashboard imports gradio, which isn't needed to serve its images
+__getattr__ = lazy_attributes(__name__, {"MainApp": ".main_ui"})
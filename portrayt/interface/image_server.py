@@ -0,0 +1,227 @@
+import html
+import math
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from portrayt.library import (
+    FRAME_SUFFIX,
+    PREVIEW,
+    THUMBNAIL,
+    THUMBNAIL_SIZES,
+    FrameSequence,
+    ImageCatalog,
+    find_frame,
+    get_thumbnail,
+)
+
+if TYPE_CHECKING:
+    from fastapi import APIRouter
+
+IMAGES_ROUTE = "/images"
+
+FULL_SIZE = "full"
+"""The variant of an image that's the image itself, instead of a thumbnail"""
+
+GALLERY_PAGE_SIZE = 24
+
+_MEDIA_TYPES = {b"\x89PNG": "image/png", b"RIFF": "image/webp"}
+"""The media type of each image format, by the first bytes of its files"""
+
+
+class Validators(NamedTuple):
+    """What a browser checks a cached copy of an image against, to see if it's still current"""
+
+    etag: str
+    last_modified: str
+    """When the image last changed, as an HTTP date"""
+    modified_at: int
+    """When the image last changed, in whole seconds since the epoch"""
+
+
+class ServedImage(NamedTuple):
+    path: Path
+    """The file the image is read from"""
+    validators: Validators
+    frame: Optional[Tuple[FrameSequence, int]] = None
+    """If the image is a frame, the sequence it's in and its position there"""
+
+    def read(self) -> bytes:
+        if self.frame is None:
+            return self.path.read_bytes()
+        sequence, frame_id = self.frame
+        return sequence.read(frame_id)
+
+
+class GalleryPage(NamedTuple):
+    html: str
+    page: int
+    """The page that was shown, counting from 0"""
+    num_pages: int
+
+
+def file_validators(path: Path, part: str = "") -> Validators:
+    """Validators for a file, which change whenever the file is replaced
+
+    :param path: The file
+    :param part: Which part of the file is served, if it isn't all of it
+    """
+    stat = path.stat()
+    return Validators(
+        etag=f'"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}{part}"',
+        last_modified=formatdate(stat.st_mtime, usegmt=True),
+        modified_at=int(stat.st_mtime),
+    )
+
+
+def is_not_modified(
+    validators: Validators, if_none_match: Optional[str], if_modified_since: Optional[str]
+) -> bool:
+    """Whether a browser's cached copy is still current, so a 304 can be sent instead of the image
+
+    :param validators: The image's current validators
+    :param if_none_match: The request's If-None-Match header
+    :param if_modified_since: The request's If-Modified-Since header
+    """
+    if if_none_match is not None:
+        # If-None-Match takes precedence, and weak tags match too
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        tags |= {tag[2:] for tag in tags if tag.startswith("W/")}
+        return "*" in tags or validators.etag in tags
+
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return validators.modified_at <= since
+    return False
+
+
+def media_type(data: bytes) -> str:
+    return _MEDIA_TYPES.get(data[:4], "application/octet-stream")
+
+
+def serve_image(images_dir: Path, idx: int, variant: str) -> Optional[ServedImage]:
+    """Find a catalogued image, or one of its thumbnails, to send to a browser
+
+    :param images_dir: The images directory the image is catalogued in
+    :param idx: The image's index
+    :param variant: FULL_SIZE, or the name of a thumbnail size
+    :return: The image, or None if there's no such image
+    """
+    sizes = {size.name: size for size in THUMBNAIL_SIZES}
+    entry = ImageCatalog(images_dir).get(idx)
+    if entry is None or (variant != FULL_SIZE and variant not in sizes):
+        return None
+    image_path = images_dir / entry.filename
+
+    try:
+        if variant != FULL_SIZE:
+            path = get_thumbnail(image_path, sizes[variant])
+            return ServedImage(path, file_validators(path))
+
+        if image_path.suffix == FRAME_SUFFIX:
+            found = find_frame(image_path)
+            if found is None:
+                return None
+            sequence, frame_id = found
+            return ServedImage(sequence.path, file_validators(sequence.path, f"-{frame_id}"), found)
+
+        return ServedImage(image_path, file_validators(image_path))
+    except FileNotFoundError:
+        return None
+
+
+def image_url(image_path: Path, variant: str) -> str:
+    """The URL an image is served at
+
+    :param image_path: The name the image is catalogued as
+    :param variant: FULL_SIZE, or the name of a thumbnail size
+    """
+    directory = quote(image_path.parent.name)
+    return f"{IMAGES_ROUTE}/{directory}/{int(image_path.stem)}/{variant}"
+
+
+def current_image_html(image_path: Optional[Path]) -> str:
+    """Show an image's preview, which links to the full size image. Browsers cache the preview,
+    and only download it again once it's changed."""
+    if image_path is None:
+        return "<p>There are no images yet</p>"
+
+    return (
+        f'<a href="{html.escape(image_url(image_path, FULL_SIZE))}" target="_blank">'
+        f'<img src="{html.escape(image_url(image_path, PREVIEW.name))}"'
+        f' style="max-width: 100%; max-height: {PREVIEW.max_edge}px" alt="The current image">'
+        "</a>"
+    )
+
+
+def gallery_page(images_dir: Path, page: int, page_size: int = GALLERY_PAGE_SIZE) -> GalleryPage:
+    """Show a page of the images in a directory, as thumbnails that link to each full size image
+
+    :param images_dir: The images directory
+    :param page: The page to show, counting from 0. It's clamped to the pages there are.
+    :param page_size: How many images are on each page
+    """
+    catalog = ImageCatalog(images_dir)
+    num_pages = max(1, math.ceil(catalog.count() / page_size))
+    page = min(max(page, 0), num_pages - 1)
+
+    tiles = [
+        f'<a href="{html.escape(image_url(path, FULL_SIZE))}" target="_blank">'
+        f'<img src="{html.escape(image_url(path, THUMBNAIL.name))}" loading="lazy"'
+        f' style="max-width: {THUMBNAIL.max_edge}px; max-height: {THUMBNAIL.max_edge}px"'
+        f' alt="Image {int(path.stem)}"></a>'
+        for path in catalog.paths(offset=page * page_size, limit=page_size)
+    ]
+    gallery_html = (
+        '<div style="display: flex; flex-wrap: wrap; gap: 8px; align-items: center">'
+        f'{"".join(tiles)}</div>'
+        if tiles
+        else "<p>There are no images yet</p>"
+    )
+    return GalleryPage(gallery_html, page, num_pages)
+
+
+def create_image_router(cache_root_path: Path, images_dir_names: Sequence[str]) -> "APIRouter":
+    """Serve catalogued images and their thumbnails at IMAGES_ROUTE. Responses can be cached by
+    browsers, which check they're still current with ETag and Last-Modified.
+
+    :param cache_root_path: The directory that images directories are in
+    :param images_dir_names: The images directories that may be served from
+    """
+    # FastAPI is slow to import, and is only needed once the dashboard is started
+    from fastapi import APIRouter, Header, HTTPException, Response
+
+    router = APIRouter()
+
+    @router.get(IMAGES_ROUTE + "/{directory}/{idx}/{variant}")
+    def get_image(
+        directory: str,
+        idx: int,
+        variant: str,
+        if_none_match: Optional[str] = Header(None),  # noqa: B008
+        if_modified_since: Optional[str] = Header(None),  # noqa: B008
+    ) -> Response:
+        served = None
+        if directory in images_dir_names:
+            served = serve_image(cache_root_path / directory, idx, variant)
+        if served is None:
+            raise HTTPException(status_code=404)
+
+        # Browsers may keep a copy, but must check it's current before using it, since indices
+        # are reused when images are regenerated
+        headers = {
+            "ETag": served.validators.etag,
+            "Last-Modified": served.validators.last_modified,
+            "Cache-Control": "no-cache",
+        }
+        if is_not_modified(served.validators, if_none_match, if_modified_since):
+            return Response(status_code=304, headers=headers)
+
+        data = served.read()
+        return Response(data, media_type=media_type(data), headers=headers)
+
+    return router
@@ -1,11 +1,18 @@
+import json
+import logging
 from pathlib import Path
 from textwrap import dedent
-from typing import Any, Dict, Optional, Tuple
+from threading import Thread
+from typing import Any, Dict, List, Optional, Tuple, Type
 
 import gradio as gr
+from pydantic import BaseModel
 
 from portrayt import configuration as schemas
 from portrayt import generators, renderers
+from portrayt.library import ImageCatalog, StorageManager, make_thumbnails
+
+from .image_server import create_image_router, current_image_html, gallery_page
 
 JSON = Dict[str, Any]
 
@@ -13,19 +20,30 @@ JSON = Dict[str, Any]
 class MainApp:
     def __init__(
         self,
+        configuration: schemas.Configuration,
         configuration_path: Path,
         cache_root_path: Path,
-        render_type: renderers.RendererType,
+        renderer: renderers.BaseRenderer[Any],
         port: int,
     ):
-        self._config = schemas.Configuration.parse_file(configuration_path)
+        """
+        :param configuration: The configuration, which is shared with the renderer, so that
+            changes to the renderer's parameters are seen by both
+        :param configuration_path: The file to save the configuration to
+        :param cache_root_path: Where generated images and caches are stored
+        :param renderer: A renderer that's showing images from the current generator. It's
+            created before the app, so that images are shown while the app is still loading.
+        :param port: The port to serve the UI on
+        """
+        self._config = configuration
         self._config_path = configuration_path
         self._cache_root_path = cache_root_path
         self._server_port = port
-        self._image: gr.Image
+        self._image: gr.HTML
         self._prompt: gr.JSON
+        self._jobs: gr.JSON
 
-        self._schema_mappings = {
+        self._schema_mappings: Dict[str, Tuple[BaseModel, Type[generators.BaseGenerator[Any]]]] = {
             schemas.PromptGenerateVariations.__name__: (
                 self._config.prompt_generate_variations,
                 generators.VariationGenerator,
@@ -35,10 +53,30 @@ class MainApp:
                 generators.InterpolationAnimationGenerator,
             ),
         }
-        # Create a renderer with the current configuration
-        self._renderer = renderers.RENDERER_TYPES[render_type](
-            self._get_current_generator().images_dir, params=self._config.renderer
+        self._result_cache = generators.ResultCache(
+            cache_root_path / ".result-cache",
+            max_bytes=self._config.result_cache_megabytes * 1024 * 1024,
         )
+        self._backend = generators.ReplicateBackend()
+        self._journal = generators.PredictionJournal(cache_root_path)
+
+        # The catalog was already checked against what's on disk when the renderer was created
+        self._renderer = renderer
+
+        # Keep generated images within their disk budget. This may transcode many images when
+        # the storage format changes, so it's done in the background.
+        self._storage = StorageManager(
+            [
+                generators.images_dir_for(cache_root_path, prompt_type)
+                for prompt_type in generators.GENERATOR_TYPES
+            ],
+            params=self._config.storage,
+        )
+        Thread(target=self._enforce_storage, daemon=True).start()
+
+        # Generation runs in the background, so the UI stays responsive while the API is called
+        self._generation_queue = generators.GenerationQueue(on_job_finished=self._on_job_finished)
+        self._resume_interrupted_jobs()
 
         # Create the settings server UX
         self._app = self._create_ui()
@@ -63,6 +101,12 @@ class MainApp:
                 with gr.TabItem("Prompt Interpolation"):
                     self._create_generate_interpolation_ui()
 
+            gr.Markdown("## 🖼️ Gallery")
+            self._create_gallery_ui()
+
+            gr.Markdown("## ⏳ Generation Jobs")
+            self._create_jobs_ui()
+
             gr.Markdown("## ⚙️ Advanced Settings")
             with gr.Box():
                 self._create_general_settings_ui()
@@ -75,23 +119,30 @@ class MainApp:
         def get_shuffle_text() -> str:
             return "🔀 Disable shuffle" if self._config.renderer.shuffle else "🔀 Enable shuffle"
 
-        def on_toggle_shuffle() -> Tuple[str, Optional[Path], Optional[JSON]]:
+        def on_toggle_shuffle() -> Tuple[str, str, Optional[JSON]]:
             self._renderer.toggle_shuffle()
             self.save_config()
-            return get_shuffle_text(), self._renderer.current_image, self._renderer.current_prompt
+            return get_shuffle_text(), self._current_image_html(), self._renderer.current_prompt
 
-        def on_next() -> Tuple[Optional[Path], Optional[JSON]]:
+        def on_next() -> Tuple[str, Optional[JSON]]:
             self._renderer.next()
-            return self._renderer.current_image, self._renderer.current_prompt
+            return self._current_image_html(), self._renderer.current_prompt
 
-        def on_refresh() -> Tuple[Optional[Path], Optional[JSON]]:
-            return self._renderer.current_image, self._renderer.current_prompt
+        def on_refresh() -> Tuple[str, Optional[JSON]]:
+            return self._current_image_html(), self._renderer.current_prompt
 
-        def on_delete() -> Tuple[Optional[Path], Optional[JSON]]:
+        def on_delete() -> Tuple[str, Optional[JSON]]:
             self._renderer.delete_current_image()
-            return self._renderer.current_image, self._renderer.current_prompt
+            return self._current_image_html(), self._renderer.current_prompt
+
+        def on_favourite() -> str:
+            image_path = self._renderer.current_image
+            if image_path is None:
+                return "There's no image to favourite"
+            ImageCatalog(image_path.parent).set_favourite(int(image_path.stem), True)
+            return "Added to favourites"
 
-        self._image = gr.Image(value=lambda: self._renderer.current_image)
+        self._image = gr.HTML(value=self._current_image_html)
         self._prompt = gr.JSON(value=lambda: self._renderer.current_prompt)
 
         with gr.Row():
@@ -99,6 +150,8 @@ class MainApp:
             delete_btn = gr.Button("🗑️️ Delete Image")
             next_btn = gr.Button("⏭️ Next Image")
             shuffle_btn = gr.Button(value=get_shuffle_text)
+            favourite_btn = gr.Button("⭐ Favourite")
+        favourite_result = gr.Label(label="")
 
         refresh_btn.click(fn=on_refresh, inputs=[], outputs=[self._image, self._prompt])
         delete_btn.click(fn=on_delete, inputs=[], outputs=[self._image, self._prompt])
@@ -106,6 +159,54 @@ class MainApp:
         shuffle_btn.click(
             fn=on_toggle_shuffle, inputs=[], outputs=[shuffle_btn, self._image, self._prompt]
         )
+        favourite_btn.click(fn=on_favourite, inputs=[], outputs=[favourite_result])
+
+    def _create_gallery_ui(self) -> None:
+        """Create a UI for browsing the current prompt type's images, a page of thumbnails at a
+        time"""
+
+        def show_page(page: float) -> Tuple[str, int, str]:
+            images_dir = generators.images_dir_for(
+                self._cache_root_path, self._config.current_prompt_type
+            )
+            shown = gallery_page(images_dir, int(page))
+            return shown.html, shown.page, f"Page {shown.page + 1} of {shown.num_pages}"
+
+        page = gr.State(0)
+        gallery = gr.HTML(value=lambda: show_page(0)[0])
+        with gr.Row():
+            previous_btn = gr.Button("◀️ Previous")
+            page_label = gr.Label(value=lambda: show_page(0)[2], label="")
+            next_btn = gr.Button("Next ▶️")
+        refresh_btn = gr.Button("🔄 Refresh Gallery")
+
+        outputs = [gallery, page, page_label]
+        previous_btn.click(fn=lambda p: show_page(p - 1), inputs=[page], outputs=outputs)
+        next_btn.click(fn=lambda p: show_page(p + 1), inputs=[page], outputs=outputs)
+        refresh_btn.click(fn=show_page, inputs=[page], outputs=outputs)
+
+    def _create_jobs_ui(self) -> None:
+        """Create a UI for viewing the progress of, and cancelling, generation jobs"""
+
+        def on_cancel(job_id: str) -> Tuple[str, List[JSON]]:
+            if self._generation_queue.cancel(job_id.strip()):
+                message = f"Cancelled job {job_id}"
+            else:
+                message = f"Job {job_id} was not found or has already finished"
+            return message, self._jobs_summary()
+
+        self._jobs = gr.JSON(value=self._jobs_summary, label="Jobs")
+        api_limits = gr.JSON(value=self._api_limits, label="API Limits")
+
+        with gr.Row():
+            refresh_btn = gr.Button("🔄 Refresh Jobs")
+            cancel_job_id = gr.Textbox(label="Job ID")
+            cancel_btn = gr.Button("🛑 Cancel Job")
+        result = gr.Label(label="")
+
+        refresh_btn.click(fn=self._jobs_summary, inputs=[], outputs=[self._jobs])
+        refresh_btn.click(fn=self._api_limits, inputs=[], outputs=[api_limits])
+        cancel_btn.click(fn=on_cancel, inputs=[cancel_job_id], outputs=[result, self._jobs])
 
     def _create_general_settings_ui(self) -> None:
         current_prompt_type = gr.Dropdown(
@@ -174,18 +275,30 @@ class MainApp:
             precision=0,
         )
         seamless_loop = gr.Checkbox(lambda: prompt_config.seamless_loop, label="Seamless Loop")
+        encode_workers = gr.Number(
+            lambda: prompt_config.encode_workers,
+            label="Encoding Processes (0 for one per CPU)",
+            precision=0,
+        )
 
         result = gr.Label(label="")
         save_button = gr.Button("🪄 Imagine")
         save_button.click(
             self._on_interpolation_settings_saved,
-            inputs=[prompt_start, prompt_end, prompt_strength, num_animation_frames, seamless_loop],
+            inputs=[
+                prompt_start,
+                prompt_end,
+                prompt_strength,
+                num_animation_frames,
+                seamless_loop,
+                encode_workers,
+            ],
             outputs=[result, self._image, self._prompt],
         )
 
     def _on_generate_variations_saved(
         self, prompt: str, num_variations: int
-    ) -> Tuple[str, Optional[Path], Optional[JSON]]:
+    ) -> Tuple[str, str, Optional[JSON]]:
         """Run when the user saves new configuration for PromptGenerateVariations"""
         self._config.current_prompt_type = schemas.PromptGenerateVariations.__name__
         self._config.prompt_generate_variations.prompt = prompt
@@ -201,7 +314,7 @@ class MainApp:
         portrait_height: int,
         portrait_width: int,
         seed: int,
-    ) -> Tuple[str, Optional[Path], Optional[JSON]]:
+    ) -> Tuple[str, str, Optional[JSON]]:
         self._config.current_prompt_type = current_prompt_type
         self._config.renderer.seconds_between_images = seconds_between_images
         self._config.clear_results_between_images = clear_results_between
@@ -218,43 +331,71 @@ class MainApp:
         prompt_strength: float,
         num_animation_frames: int,
         seamless_loop: bool,
-    ) -> Tuple[str, Optional[Path], Optional[JSON]]:
+        encode_workers: int,
+    ) -> Tuple[str, str, Optional[JSON]]:
         self._config.current_prompt_type = schemas.PromptInterpolationAnimation.__name__
         self._config.prompt_interpolation_animation.prompt_start = prompt_start
         self._config.prompt_interpolation_animation.prompt_end = prompt_end
         self._config.prompt_interpolation_animation.prompt_strength = prompt_strength
         self._config.prompt_interpolation_animation.num_animation_frames = num_animation_frames
         self._config.prompt_interpolation_animation.seamless_loop = seamless_loop
+        self._config.prompt_interpolation_animation.encode_workers = encode_workers
         return self.update_config()
 
-    def update_config(self, render: bool = True) -> Tuple[str, Optional[Path], Optional[JSON]]:
-        """Save the current data model and run any API tasks
-        :param render: If true, the generator will re-render images
+    def update_config(self, render: bool = True) -> Tuple[str, str, Optional[JSON]]:
+        """Save the current data model and queue any API tasks
+        :param render: If true, the generator will re-render images in the background
         :return: The success/fail message
         """
         self.save_config()
 
         generator = self._get_current_generator()
 
-        if render:
-            try:
-                generator.generate(clear_previous=self._config.clear_results_between_images)
-            except Exception as e:
-                return (
-                    f"Failed to generate images:\n {e}",
-                    self._renderer.current_image,
-                    self._renderer.current_prompt,
-                )
-
         # Update the renderer so it knows about the new generator
         self._renderer.update_image_dir(generator.images_dir)
 
+        message = "Settings saved successfully!"
+        if render:
+            job = self._generation_queue.submit(
+                generator, clear_previous=self._config.clear_results_between_images
+            )
+            message = f"Settings saved! Generating images in job {job.job_id}"
+
         return (
-            "Settings saved successfully!",
-            self._renderer.current_image,
+            message,
+            self._current_image_html(),
             self._renderer.current_prompt,
         )
 
+    def _on_job_finished(self, job: generators.GenerationJob) -> None:
+        """Show newly generated images, if they belong to the generator that's being displayed"""
+        if job.status is not generators.JobStatus.SUCCEEDED:
+            return
+        if job.generator.images_dir == self._get_current_generator().images_dir:
+            self._renderer.update_image_dir(job.generator.images_dir)
+        self._enforce_storage()
+
+    def _current_image_html(self) -> str:
+        """Show the current image's preview. The preview is cached by the browser, so showing
+        the same image again costs a request, but not a download."""
+        return current_image_html(self._renderer.current_image)
+
+    def _jobs_summary(self) -> List[JSON]:
+        """Return the status of recent generation jobs, newest first"""
+        return [job.to_json() for job in reversed(self._generation_queue.jobs)]
+
+    def _api_limits(self) -> JSON:
+        """Return how fast requests are being sent to Replicate, and how long they're waiting"""
+        return self._backend.limits._asdict()
+
+    def _enforce_storage(self) -> None:
+        """Delete or transcode images to keep them within their disk budget"""
+        current_image = self._renderer.current_image
+        try:
+            self._storage.enforce(keep=[] if current_image is None else [current_image])
+        except Exception:
+            logging.exception("Failed to enforce the storage budget")
+
     def save_config(self) -> None:
         """Serialize and save the configuration file"""
         self._config_path.write_text(self._config.json(indent=4))
@@ -263,17 +404,98 @@ class MainApp:
         """Instantiate the current generator based on configuration"""
         parameters, generator = self._schema_mappings[self._config.current_prompt_type]
 
-        return generator(  # type: ignore
+        return self._create_generator(
+            generator,
             params=parameters,
-            cache_dir=self._cache_root_path,
             height=self._config.portrait_height,
             width=self._config.portrait_width,
             seed=self._config.seed,
         )
 
-    def launch(self) -> None:
-        self._app.launch(server_port=self._server_port, server_name="0.0.0.0")
+    def _create_generator(
+        self,
+        generator_type: Type[generators.BaseGenerator[Any]],
+        params: BaseModel,
+        height: int,
+        width: int,
+        seed: int,
+    ) -> generators.BaseGenerator[Any]:
+        # Each generator gets its own copy of its parameters, so that editing the configuration
+        # doesn't change jobs that are already queued or running
+        return generator_type(
+            params=params.copy(deep=True),
+            cache_dir=self._cache_root_path,
+            height=height,
+            width=width,
+            seed=seed,
+            post_processors=[self._prerender, self._make_thumbnails],
+            result_cache=self._result_cache,
+            backend=self._backend,
+            journal=self._journal,
+        )
+
+    def _resume_interrupted_jobs(self) -> None:
+        """Queue any generations that were interrupted by a restart, so they're finished without
+        paying for their predictions again"""
+        for journal_job in self._journal.unfinished_jobs():
+            spec = json.loads(journal_job.fingerprint)
+            for parameters, generator_type in self._schema_mappings.values():
+                if generator_type.__name__ != spec["generator"]:
+                    continue
+
+                generator = self._create_generator(
+                    generator_type,
+                    params=parameters.parse_obj(spec["params"]),
+                    height=spec["height"],
+                    width=spec["width"],
+                    seed=spec["seed"],
+                )
+                if generator.fingerprint == journal_job.fingerprint:
+                    job = self._generation_queue.submit(generator, journal_job.clear_previous)
+                    logging.info(f"Resuming interrupted generation in job {job.job_id}")
+                    break
+            else:
+                # The job can't be recreated, for example if the data directory was moved
+                logging.warning(f"Discarding interrupted generation {journal_job.fingerprint}")
+                self._journal.finish_job(journal_job.job_id)
+
+    def _prerender(self, image_path: Path) -> None:
+        """Prepare newly generated images for display, so they render quickly later"""
+        try:
+            self._renderer.prerender(image_path)
+        except Exception:
+            # The renderer will pre-render the image when it's first shown, instead
+            logging.exception(f"Failed to pre-render {image_path}")
+
+    def _make_thumbnails(self, image_path: Path) -> None:
+        """Make the smaller copies of newly generated images that the dashboard shows"""
+        try:
+            make_thumbnails(image_path)
+        except Exception:
+            # They'll be made when they're first requested, instead
+            logging.exception(f"Failed to make thumbnails of {image_path}")
+
+    def launch(self, block: bool = True) -> None:
+        """Serve the UI, and the images it shows
+
+        :param block: If True, serve until interrupted
+        """
+        self._app.launch(
+            server_port=self._server_port, server_name="0.0.0.0", prevent_thread_lock=True
+        )
+
+        # Gradio creates its FastAPI app when it's launched, so the image route is added to it then
+        images_dir_names = [
+            generators.images_dir_for(self._cache_root_path, prompt_type).name
+            for prompt_type in generators.GENERATOR_TYPES
+        ]
+        self._app.server_app.include_router(
+            create_image_router(self._cache_root_path, images_dir_names)
+        )
+        if block:
+            self._app.block_thread()
 
     def close(self) -> None:
+        self._generation_queue.close()
         self._app.close()
         gr.close_all()
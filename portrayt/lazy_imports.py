@@ -0,0 +1,68 @@
+import importlib
+import sys
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, Mapping, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+def import_object(path: str) -> Any:
+    """Import an object from a path like 'package.module:attribute'"""
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+class LazyRegistry(Mapping[K, V]):
+    """A mapping whose values are only imported when they're first looked up, so the
+    dependencies of values that are never used are never imported either. For example, looking
+    up the OpenCV renderer shouldn't import inky, and vice versa.
+
+    Iterating over values() imports all of them.
+    """
+
+    def __init__(self, paths: Dict[K, str]) -> None:
+        """
+        :param paths: Each key, and the 'package.module:attribute' path of its value
+        """
+        self._paths = paths
+        self._loaded: Dict[K, V] = {}
+        self._lock = Lock()
+
+    def __getitem__(self, key: K) -> V:
+        with self._lock:
+            if key not in self._loaded:
+                self._loaded[key] = import_object(self._paths[key])
+            return self._loaded[key]
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def attribute_name(self, key: K) -> str:
+        """The name of a value, such as its class name, found without importing it"""
+        return self._paths[key].partition(":")[2]
+
+
+def lazy_attributes(package: str, modules: Dict[str, str]) -> Callable[[str], Any]:
+    """Create a module level __getattr__ for a package, which imports its public names from
+    their submodules the first time they're used, instead of when the package is imported.
+
+    :param package: The __name__ of the package
+    :param modules: Each public name, and the submodule it's imported from, like '.module'
+    :return: A function to be assigned to __getattr__ in the package
+    """
+
+    def __getattr__(name: str) -> Any:  # noqa: N807
+        if name not in modules:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+
+        value = getattr(importlib.import_module(modules[name], package), name)
+
+        # Later lookups find the attribute directly, without calling __getattr__
+        setattr(sys.modules[package], name, value)
+        return value
+
+    return __getattr__
@@ -0,0 +1,37 @@
+from typing import TYPE_CHECKING
+
+from portrayt.lazy_imports import lazy_attributes
+
+from .frame_sequence import (
+    FRAME_SUFFIX,
+    SEQUENCE_SUFFIX,
+    FrameSequence,
+    FrameSequenceWriter,
+    find_frame,
+    open_image,
+    sequences_in,
+    stored_path,
+)
+from .image_catalog import IMAGE_SUFFIXES, CatalogEntry, ConsistencyReport, ImageCatalog, ImageUsage
+from .shuffle_order import ShuffleOrder
+from .thumbnails import (
+    PREVIEW,
+    THUMBNAIL,
+    THUMBNAIL_SIZES,
+    ThumbnailSize,
+    get_thumbnail,
+    make_thumbnails,
+    thumbnail_path,
+)
+
+if TYPE_CHECKING:
+    from .storage_manager import StorageManager, StorageReport
+
+# The storage manager imports Pillow, which isn't needed to start showing images
+__getattr__ = lazy_attributes(
+    __name__,
+    {
+        "StorageManager": ".storage_manager",
+        "StorageReport": ".storage_manager",
+    },
+)
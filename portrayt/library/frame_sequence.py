@@ -0,0 +1,236 @@
+import logging
+import os
+import struct
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+from threading import Lock
+from types import TracebackType
+from typing import TYPE_CHECKING, BinaryIO, List, Optional, Tuple, Type
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+SEQUENCE_SUFFIX = ".frames"
+"""The suffix of frame sequence files, which are named after the index of their first frame"""
+
+FRAME_SUFFIX = ".frame"
+"""The suffix of the name each frame in a sequence is catalogued as. No file has this name, the
+frame is read from the sequence that holds its index."""
+
+_MAGIC = b"PTFS"
+_VERSION = 1
+_HEADER = struct.Struct("<4sB")
+_INDEX_ENTRY = struct.Struct("<QI")
+"""The offset and length of one encoded frame"""
+_FOOTER = struct.Struct("<QI4s")
+"""The offset of the index, the number of frames, and the magic number again, so a truncated file
+is detected"""
+
+_DIRECTORY_CACHE_SIZE = 8
+"""How many directories' sequences are remembered, which only needs to cover the images
+directories and a staging directory or two"""
+
+_directories: "OrderedDict[Path, Tuple[Tuple[int, int], List[FrameSequence]]]" = OrderedDict()
+_directories_lock = Lock()
+
+
+class FrameSequence:
+    """A sequence of frames stored in one file, such as the frames of an interpolation animation.
+
+    Each frame is an independently encoded image, and the file ends with an index of where each one
+    starts, so any frame can be read with a single seek without decoding the others. Frames are
+    numbered like catalogued images: the first is the index in the file's name.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """
+        :param path: The sequence file
+        :raises ValueError: If the file isn't a complete frame sequence
+        """
+        self.path = path
+        self.first_idx = int(path.stem)
+        with path.open("rb") as file:
+            self._index = _read_index(file)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, idx: int) -> bool:
+        return self.first_idx <= idx < self.first_idx + len(self._index)
+
+    def frame_paths(self) -> List[Path]:
+        """The name each frame is catalogued as, in order"""
+        return [
+            self.path.with_name(f"{self.first_idx + frame_id}{FRAME_SUFFIX}")
+            for frame_id in range(len(self._index))
+        ]
+
+    def frame_size(self, frame_id: int) -> int:
+        """The size of a frame in bytes, while it's encoded"""
+        return self._index[frame_id][1]
+
+    def read(self, frame_id: int) -> bytes:
+        """Read one encoded frame
+
+        :param frame_id: The frame's position in the sequence
+        """
+        offset, length = self._index[frame_id]
+        with self.path.open("rb") as file:
+            file.seek(offset)
+            data = file.read(length)
+        if len(data) != length:
+            raise ValueError(f"{self.path} was truncated while frame {frame_id} was read")
+        return data
+
+
+class FrameSequenceWriter:
+    """Writes a frame sequence. Frames are written to a temporary file, which is moved into place
+    once every frame has been written, so a partially written sequence is never read."""
+
+    def __init__(self, path: Path) -> None:
+        """
+        :param path: The sequence file, named after the index of its first frame
+        """
+        self.path = path
+        self._temp_path = path.with_name(f".{path.name}.tmp")
+        self._file = self._temp_path.open("wb")
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION))
+        self._index: List[Tuple[int, int]] = []
+
+    def __enter__(self) -> "FrameSequenceWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        _exc_value: Optional[BaseException],
+        _traceback: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            self._temp_path.unlink(missing_ok=True)
+
+    def append(self, data: bytes) -> None:
+        """Add an encoded frame to the end of the sequence
+
+        :param data: The frame, in any format Pillow can open
+        """
+        self._index.append((self._file.tell(), len(data)))
+        self._file.write(data)
+
+    def close(self) -> None:
+        """Write the index, and move the finished sequence into place"""
+        index_offset = self._file.tell()
+        for offset, length in self._index:
+            self._file.write(_INDEX_ENTRY.pack(offset, length))
+        self._file.write(_FOOTER.pack(index_offset, len(self._index), _MAGIC))
+        self._file.close()
+        os.replace(self._temp_path, self.path)
+
+
+def _read_index(file: BinaryIO) -> List[Tuple[int, int]]:
+    header = file.read(_HEADER.size)
+    if len(header) != _HEADER.size or _HEADER.unpack(header) != (_MAGIC, _VERSION):
+        raise ValueError("Not a frame sequence, or an unsupported version of one")
+
+    end = file.seek(0, os.SEEK_END)
+    if end < _HEADER.size + _FOOTER.size:
+        raise ValueError("The frame sequence is incomplete")
+    file.seek(end - _FOOTER.size)
+    index_offset, num_frames, magic = _FOOTER.unpack(file.read(_FOOTER.size))
+    if magic != _MAGIC or index_offset + num_frames * _INDEX_ENTRY.size != end - _FOOTER.size:
+        raise ValueError("The frame sequence is incomplete")
+
+    file.seek(index_offset)
+    index_data = file.read(num_frames * _INDEX_ENTRY.size)
+    return [(offset, length) for offset, length in _INDEX_ENTRY.iter_unpack(index_data)]
+
+
+def sequences_in(images_dir: Path, refresh: bool = False) -> List[FrameSequence]:
+    """The frame sequences in a directory, in order. The directory is only listed again once it
+    has changed, so finding frames doesn't scan it every time.
+
+    :param images_dir: The directory to look in
+    :param refresh: If True, list the directory even if it doesn't seem to have changed
+    """
+    try:
+        stat = images_dir.stat()
+    except FileNotFoundError:
+        return []
+
+    # The images directory is a symlink that's swapped for a new directory, so the inode matters
+    version = (stat.st_ino, stat.st_mtime_ns)
+    with _directories_lock:
+        cached = _directories.get(images_dir)
+        if cached is not None and cached[0] == version and not refresh:
+            _directories.move_to_end(images_dir)
+            return cached[1]
+
+    sequences = []
+    for path in images_dir.glob(f"*{SEQUENCE_SUFFIX}"):
+        if not path.stem.isdigit():
+            continue
+        try:
+            sequences.append(FrameSequence(path))
+        except (OSError, ValueError):
+            logging.exception(f"Skipping unreadable frame sequence {path}")
+    sequences.sort(key=lambda sequence: sequence.first_idx)
+
+    with _directories_lock:
+        _directories[images_dir] = (version, sequences)
+        _directories.move_to_end(images_dir)
+        while len(_directories) > _DIRECTORY_CACHE_SIZE:
+            _directories.popitem(last=False)
+    return sequences
+
+
+def find_frame(frame_path: Path) -> Optional[Tuple[FrameSequence, int]]:
+    """Find the sequence that holds a frame
+
+    :param frame_path: The name the frame is catalogued as
+    :return: The sequence, and the frame's position in it. None if no sequence holds the frame.
+    """
+    idx = int(frame_path.stem)
+    # Changes within the resolution of the directory's mtime aren't noticed, so look again
+    # before giving up
+    for refresh in (False, True):
+        for sequence in sequences_in(frame_path.parent, refresh):
+            if idx in sequence:
+                return sequence, idx - sequence.first_idx
+    return None
+
+
+def stored_path(image_path: Path) -> Optional[Path]:
+    """The file a catalogued image is stored in
+
+    :param image_path: The name the image is catalogued as
+    :return: The image itself, or the sequence that holds it if it's a frame. None if there's no
+        such file.
+    """
+    if image_path.suffix != FRAME_SUFFIX:
+        return image_path if image_path.is_file() else None
+    found = find_frame(image_path)
+    return None if found is None else found[0].path
+
+
+def open_image(image_path: Path) -> "Image.Image":
+    """Open a catalogued image, whether it's a file of its own or a frame in a sequence. Like
+    Image.open, the pixels aren't decoded until they're used.
+
+    :param image_path: The name the image is catalogued as
+    :raises FileNotFoundError: If the image doesn't exist
+    """
+    # Pillow is slow to import, and isn't needed to look up frames
+    from PIL import Image
+
+    if image_path.suffix != FRAME_SUFFIX:
+        return Image.open(image_path)
+
+    found = find_frame(image_path)
+    if found is None:
+        raise FileNotFoundError(f"No frame sequence holds {image_path}")
+    sequence, frame_id = found
+    return Image.open(BytesIO(sequence.read(frame_id)))
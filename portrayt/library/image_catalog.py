@@ -0,0 +1,458 @@
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from uuid import uuid4
+
+from .frame_sequence import FRAME_SUFFIX, sequences_in, stored_path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    idx INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL,
+    generator TEXT,
+    params TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO metadata (key, value) VALUES ('revision', {initial_revision});
+"""
+
+_MIGRATIONS: List[Sequence[str]] = [
+    # 1: How often each image has been shown, and whether it was marked as a favourite
+    [
+        "ALTER TABLE images ADD COLUMN shown_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE images ADD COLUMN last_shown_at REAL",
+        "ALTER TABLE images ADD COLUMN favourite INTEGER NOT NULL DEFAULT 0",
+    ],
+    # 2: Parameters are stored once for each generation run, instead of once for each image
+    [
+        """
+        CREATE TABLE runs (
+            run_id TEXT PRIMARY KEY,
+            generator TEXT,
+            params TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """,
+        "ALTER TABLE images ADD COLUMN run_id TEXT REFERENCES runs (run_id)",
+        "CREATE INDEX images_run_id ON images (run_id)",
+        # Images with identical parameters were generated by the same request, so they share a run
+        """
+        INSERT INTO runs
+        SELECT lower(hex(randomblob(16))), generator, params, MIN(created_at)
+        FROM images WHERE params IS NOT NULL GROUP BY generator, params
+        """,
+        """
+        UPDATE images SET run_id = (
+            SELECT run_id FROM runs
+            WHERE runs.generator IS images.generator AND runs.params = images.params
+        ), params = NULL
+        WHERE params IS NOT NULL
+        """,
+    ],
+    # 3: Frames that were removed from the catalog, but are still held by their frame sequence
+    ["CREATE TABLE removed_frames (idx INTEGER PRIMARY KEY)"],
+]
+"""Changes to the schema, applied in order. The database's user_version is the number that have
+been applied."""
+
+IMAGE_SUFFIXES = (".png", ".webp")
+"""The formats images may be stored in as files of their own. Frames of an animation may instead
+be stored in a frame sequence, and catalogued with FRAME_SUFFIX."""
+
+
+_PARAMS_CACHE_SIZE = 32
+"""How many runs' parsed parameters are kept in memory. Run IDs are unique across catalogs, so
+the cache is shared by all of them."""
+
+_params_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_params_cache_lock = Lock()
+
+
+class CatalogEntry(NamedTuple):
+    idx: int
+    filename: str
+    generator: Optional[str]
+    params: Optional[str]
+    """The parameters used to generate the image, serialized as json"""
+    created_at: float
+
+
+_SELECT_ENTRIES = """
+SELECT images.idx, images.filename, images.generator, COALESCE(runs.params, images.params),
+    images.created_at
+FROM images LEFT JOIN runs USING (run_id)
+"""
+"""Selects catalog entries. Images from older versions may still have their own parameters."""
+
+
+class ImageUsage(NamedTuple):
+    idx: int
+    filename: str
+    created_at: float
+    shown_count: int
+    last_shown_at: Optional[float]
+    favourite: bool
+
+
+class ConsistencyReport(NamedTuple):
+    missing: List[int]
+    """Indices that were catalogued, but whose file doesn't exist on disk"""
+    untracked: List[int]
+    """Indices of images found on disk, but not in the catalog"""
+
+
+class ImageCatalog:
+    """An index of the images in an images directory, and the parameters used to generate them.
+
+    This is the source of truth for which images exist, what order they're in, and what prompt
+    generated them, so that callers don't need to scan the directory to find out.
+    """
+
+    FILENAME = "catalog.sqlite3"
+
+    def __init__(self, images_dir: Path) -> None:
+        self.images_dir = images_dir
+        self._db_path = images_dir / self.FILENAME
+
+        is_new = not self._db_path.is_file()
+        with self._connect(initialize=True):
+            pass
+        if is_new:
+            self.import_existing()
+
+    def add(self, entries: Sequence[CatalogEntry]) -> None:
+        """Add images to the catalog, replacing any existing entries with the same index. Images
+        with the same generator and parameters are recorded as one run, which stores the
+        parameters once."""
+        run_ids: Dict[Tuple[Optional[str], str], str] = {}
+        runs = []
+        for entry in entries:
+            if entry.params is not None and (entry.generator, entry.params) not in run_ids:
+                run_id = uuid4().hex
+                run_ids[(entry.generator, entry.params)] = run_id
+                runs.append((run_id, entry.generator, entry.params, entry.created_at))
+
+        with self._connect() as connection:
+            connection.executemany("INSERT INTO runs VALUES (?, ?, ?, ?)", runs)
+            connection.executemany(
+                "DELETE FROM removed_frames WHERE idx = ?", [(entry.idx,) for entry in entries]
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO images (idx, filename, generator, run_id, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        entry.idx,
+                        entry.filename,
+                        entry.generator,
+                        None if entry.params is None else run_ids[(entry.generator, entry.params)],
+                        entry.created_at,
+                    )
+                    for entry in entries
+                ],
+            )
+            self._delete_unused_runs(connection)
+            self._bump_revision(connection)
+
+    def remove(self, idx: int) -> None:
+        """Remove an image from the catalog. A frame can't be deleted from its sequence, so it's
+        remembered as removed, and isn't found on disk again."""
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO removed_frames"
+                " SELECT idx FROM images WHERE idx = ? AND filename LIKE ?",
+                (idx, f"%{FRAME_SUFFIX}"),
+            )
+            connection.execute("DELETE FROM images WHERE idx = ?", (idx,))
+            self._delete_unused_runs(connection)
+            self._bump_revision(connection)
+
+    def rename(self, idx: int, filename: str) -> None:
+        """Point an image's entry at a different file, such as after it was transcoded"""
+        with self._connect() as connection:
+            connection.execute("UPDATE images SET filename = ? WHERE idx = ?", (filename, idx))
+            self._bump_revision(connection)
+
+    def record_shown(self, idx: int) -> None:
+        """Count that an image was shown on the display"""
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE images SET shown_count = shown_count + 1, last_shown_at = ? WHERE idx = ?",
+                (time.time(), idx),
+            )
+
+    def set_favourite(self, idx: int, favourite: bool) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE images SET favourite = ? WHERE idx = ?", (int(favourite), idx)
+            )
+
+    def usage(self) -> List[ImageUsage]:
+        """How often each image has been shown, and whether it's a favourite, in order"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT {', '.join(ImageUsage._fields)} FROM images ORDER BY idx"
+            ).fetchall()
+        return [ImageUsage(*row)._replace(favourite=bool(row[-1])) for row in rows]
+
+    def clear(self) -> None:
+        with self._connect() as connection:
+            connection.execute("DELETE FROM images")
+            connection.execute("DELETE FROM runs")
+            connection.execute("DELETE FROM removed_frames")
+            self._bump_revision(connection)
+
+    @property
+    def revision(self) -> int:
+        """A number that changes every time images are added or removed"""
+        with self._connect() as connection:
+            row = connection.execute("SELECT value FROM metadata WHERE key = 'revision'").fetchone()
+        return int(row[0])
+
+    @property
+    def next_idx(self) -> int:
+        """The index the next added image should use. This is after every catalogued image, and
+        every frame still held by a frame sequence, even removed ones. Otherwise a new frame could
+        share its index with an old one, and be found in the old sequence instead of its own."""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT MAX(idx) FROM (SELECT idx FROM images UNION SELECT idx FROM removed_frames)"
+            ).fetchone()
+        next_idx = 0 if row[0] is None else int(row[0]) + 1
+        for sequence in sequences_in(self.images_dir):
+            next_idx = max(next_idx, sequence.first_idx + len(sequence))
+        return next_idx
+
+    def paths(self, offset: int = 0, limit: Optional[int] = None) -> List[Path]:
+        """Catalogued images, in order
+
+        :param offset: How many images to skip, such as the images on earlier pages
+        :param limit: The most images to return. If None, all of the rest are returned.
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT filename FROM images ORDER BY idx LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset),
+            ).fetchall()
+        return [self.images_dir / filename for filename, in rows]
+
+    def count(self) -> int:
+        """How many images are catalogued"""
+        with self._connect() as connection:
+            row = connection.execute("SELECT COUNT(*) FROM images").fetchone()
+        return int(row[0])
+
+    def indices(self) -> List[int]:
+        """The indices of all catalogued images, in order"""
+        with self._connect() as connection:
+            rows = connection.execute("SELECT idx FROM images ORDER BY idx").fetchall()
+        return [idx for idx, in rows]
+
+    def next_path(self, after_idx: Optional[int]) -> Optional[Path]:
+        """Return the image after the given index, wrapping around to the first image
+
+        :param after_idx: The index to start after. If None, the first image is returned.
+        :return: The path to the image, or None if the catalog is empty
+        """
+        paths = self.next_paths(after_idx, count=1)
+        return paths[0] if paths else None
+
+    def next_paths(self, after_idx: Optional[int], count: int) -> List[Path]:
+        """Return up to 'count' images after the given index, wrapping around to the start
+
+        :param after_idx: The index to start after. If None, start at the first image.
+        :param count: The most paths to return. No image is returned twice.
+        :return: The paths of the images, in order
+        """
+        after_idx = -1 if after_idx is None else after_idx
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT filename FROM images WHERE idx > ? ORDER BY idx LIMIT ?",
+                (after_idx, count),
+            ).fetchall()
+            rows += connection.execute(
+                "SELECT filename FROM images WHERE idx <= ? ORDER BY idx LIMIT ?",
+                (after_idx, count - len(rows)),
+            ).fetchall()
+        return [self.images_dir / filename for filename, in rows]
+
+    def get(self, idx: int) -> Optional[CatalogEntry]:
+        with self._connect() as connection:
+            row = connection.execute(f"{_SELECT_ENTRIES} WHERE images.idx = ?", (idx,)).fetchone()
+        return None if row is None else CatalogEntry(*row)
+
+    def params(self, idx: int) -> Optional[Dict[str, Any]]:
+        """Return the parameters used to generate an image, as a python dict. Parsed parameters
+        are cached for each run, so looking up another image from a recent run is cheap."""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT run_id, params FROM images WHERE idx = ?", (idx,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            run_id, own_params = row
+            if run_id is None:
+                return None if own_params is None else json.loads(own_params)
+
+            with _params_cache_lock:
+                params = _params_cache.get(run_id)
+                if params is not None:
+                    _params_cache.move_to_end(run_id)
+                    return dict(params)
+
+            (params_json,) = connection.execute(
+                "SELECT params FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+
+        params = json.loads(params_json)
+        with _params_cache_lock:
+            _params_cache[run_id] = params
+            while len(_params_cache) > _PARAMS_CACHE_SIZE:
+                _params_cache.popitem(last=False)
+        return dict(params)
+
+    def import_existing(self) -> int:
+        """Catalog images in the directory that were saved before the catalog existed, along with
+        the json parameter files that used to be saved next to each image. Those files are
+        deleted once their parameters are in the catalog.
+
+        :return: The number of images imported
+        """
+        catalogued = {path.name for path in self.paths()}
+        entries = []
+        for image_path in self._image_files():
+            if image_path.name in catalogued:
+                continue
+
+            params_path = image_path.with_suffix(".json")
+            params = params_path.read_text() if params_path.is_file() else None
+            file_path = stored_path(image_path)
+            entries.append(
+                CatalogEntry(
+                    idx=int(image_path.stem),
+                    filename=image_path.name,
+                    generator=self.images_dir.name,
+                    params=params,
+                    created_at=time.time() if file_path is None else file_path.stat().st_mtime,
+                )
+            )
+
+        if entries:
+            self.add(entries)
+            logging.info(f"Imported {len(entries)} existing images into {self._db_path}")
+            for entry in entries:
+                (self.images_dir / entry.filename).with_suffix(".json").unlink(missing_ok=True)
+        return len(entries)
+
+    def check_consistency(self, repair: bool = True) -> ConsistencyReport:
+        """Compare the catalog against the images on disk
+
+        :param repair: If True, remove entries for missing files and import untracked images
+        :return: A report of the differences that were found
+        """
+        on_disk = {path.name for path in self._image_files()}
+        with self._connect() as connection:
+            catalogued = dict(connection.execute("SELECT filename, idx FROM images").fetchall())
+
+        report = ConsistencyReport(
+            missing=sorted(idx for name, idx in catalogued.items() if name not in on_disk),
+            untracked=sorted(int(Path(name).stem) for name in on_disk - catalogued.keys()),
+        )
+        if repair and (report.missing or report.untracked):
+            logging.warning(f"Repairing catalog {self._db_path}: {report}")
+            for idx in report.missing:
+                self.remove(idx)
+            self.import_existing()
+        return report
+
+    def unused_sequences(self) -> List[Path]:
+        """Frame sequences that none of the catalogued images are frames of any more, so they
+        can be deleted"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT idx FROM images WHERE filename LIKE ?", (f"%{FRAME_SUFFIX}",)
+            ).fetchall()
+        frames = [idx for idx, in rows]
+        return [
+            sequence.path
+            for sequence in sequences_in(self.images_dir, refresh=True)
+            if not any(idx in sequence for idx in frames)
+        ]
+
+    def _image_files(self) -> List[Path]:
+        """Images in the directory that are named like catalogued images, including each frame in
+        a frame sequence that hasn't been removed"""
+        paths = [
+            path
+            for path in self.images_dir.iterdir()
+            if path.suffix in IMAGE_SUFFIXES and path.stem.isdigit()
+        ]
+        with self._connect() as connection:
+            removed = {idx for idx, in connection.execute("SELECT idx FROM removed_frames")}
+        for sequence in sequences_in(self.images_dir, refresh=True):
+            paths += [path for path in sequence.frame_paths() if int(path.stem) not in removed]
+        return paths
+
+    @contextmanager
+    def _connect(self, initialize: bool = False) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection, so the catalog can be used from any thread
+
+        :param initialize: If True, make sure the schema exists even if the database does
+        """
+        # The images directory may have been deleted and recreated by a generator
+        self.images_dir.mkdir(parents=True, exist_ok=True)
+        initialize = initialize or not self._db_path.is_file()
+
+        connection = sqlite3.connect(self._db_path, timeout=30)
+        try:
+            if initialize:
+                # Start revisions from the current time, so that a recreated catalog never has
+                # the same revision as the one it replaced
+                initial_revision = time.time_ns() // 1000
+                connection.executescript(_SCHEMA.format(initial_revision=initial_revision))
+                self._migrate(connection)
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _migrate(connection: sqlite3.Connection) -> None:
+        """Bring an existing database's schema up to date"""
+        if connection.execute("PRAGMA user_version").fetchone()[0] >= len(_MIGRATIONS):
+            return
+
+        # Lock the database first, so that only one connection applies each migration
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            for statements in _MIGRATIONS[version:]:
+                for statement in statements:
+                    connection.execute(statement)
+            connection.execute(f"PRAGMA user_version = {len(_MIGRATIONS)}")
+        except BaseException:
+            connection.rollback()
+            raise
+        connection.commit()
+
+    @staticmethod
+    def _delete_unused_runs(connection: sqlite3.Connection) -> None:
+        connection.execute(
+            "DELETE FROM runs WHERE run_id NOT IN"
+            " (SELECT run_id FROM images WHERE run_id IS NOT NULL)"
+        )
+
+    @staticmethod
+    def _bump_revision(connection: sqlite3.Connection) -> None:
+        connection.execute("UPDATE metadata SET value = value + 1 WHERE key = 'revision'")
@@ -0,0 +1,193 @@
+import json
+import logging
+import os
+import random
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+
+class ShuffleOrder:
+    """A persistent, shuffled playback order for a set of image indices.
+
+    Images are shown in cycles, and every image is shown once per cycle before any image is
+    repeated. Images added mid-cycle are placed at a random point in the rest of the cycle, and
+    removed images are skipped. Stepping forwards or backwards is O(1), and the order is saved to
+    disk after every change so that it survives restarts. Stepping only saves the cursor, in a
+    small file next to the order, so showing an image doesn't rewrite the whole order.
+    """
+
+    def __init__(self, path: Path, rng: Optional[random.Random] = None) -> None:
+        """
+        :param path: The json file to persist the order to
+        :param rng: The source of randomness used for shuffling
+        """
+        self._path = path
+        self._cursor_path = path.with_suffix(".cursor")
+        self._rng = rng or random.Random()
+
+        self._order: List[Optional[int]] = []
+        """This cycle's order. Removed images are left as None, until the next cycle."""
+        self._cursor = -1
+        """The position in the order of the image currently being shown"""
+        self._positions: Dict[int, int] = {}
+        """A mapping of image index to position in the order"""
+        self._generation = 0
+        """Increased each time the order is saved, so a saved cursor is only used with its order"""
+
+        self._load()
+
+    def __contains__(self, idx: int) -> bool:
+        return idx in self._positions
+
+    @property
+    def current(self) -> Optional[int]:
+        if 0 <= self._cursor < len(self._order):
+            return self._order[self._cursor]
+        return None
+
+    def next(self) -> Optional[int]:
+        """Advance to the next image, starting a new cycle once every image has been shown
+
+        :return: The image index to show, or None if there are no images
+        """
+        if not self._positions:
+            return None
+
+        last_shown = self.current
+        reshuffled = False
+        while True:
+            self._cursor += 1
+            if self._cursor >= len(self._order):
+                self._start_new_cycle(last_shown)
+                reshuffled = True
+            if self._order[self._cursor] is not None:
+                break
+
+        if reshuffled:
+            self._save()
+        else:
+            self._save_cursor()
+        return self._order[self._cursor]
+
+    def upcoming(self, count: int) -> List[int]:
+        """Peek at the images that will be shown next in this cycle, without advancing
+
+        :param count: The most indices to return
+        :return: Up to 'count' indices. Fewer are returned near the end of a cycle, since the
+            next cycle's order hasn't been decided yet.
+        """
+        upcoming: List[int] = []
+        for position in range(self._cursor + 1, len(self._order)):
+            if len(upcoming) >= count:
+                break
+            idx = self._order[position]
+            if idx is not None:
+                upcoming.append(idx)
+        return upcoming
+
+    def previous(self) -> Optional[int]:
+        """Step back to the previously shown image in this cycle
+
+        :return: The image index to show, or None if there's no earlier image this cycle
+        """
+        for position in range(self._cursor - 1, -1, -1):
+            if self._order[position] is not None:
+                self._cursor = position
+                self._save_cursor()
+                return self._order[position]
+        return None
+
+    def add(self, idx: int) -> None:
+        """Add an image to a random position in the part of this cycle that hasn't been shown"""
+        self._add(idx)
+        self._save()
+
+    def remove(self, idx: int) -> None:
+        self._remove(idx)
+        self._save()
+
+    def sync(self, indices: Iterable[int]) -> None:
+        """Add and remove images so that the order contains exactly the given indices"""
+        wanted = set(indices)
+        for idx in set(self._positions) - wanted:
+            self._remove(idx)
+        for idx in sorted(wanted - set(self._positions)):
+            self._add(idx)
+        self._save()
+
+    def _add(self, idx: int) -> None:
+        if idx in self._positions:
+            return
+
+        self._order.append(idx)
+        new_position = len(self._order) - 1
+        self._positions[idx] = new_position
+
+        # Swap the new image with a random upcoming one, so the remainder stays uniformly shuffled
+        swap_position = self._rng.randint(self._cursor + 1, new_position)
+        self._swap(new_position, swap_position)
+
+    def _remove(self, idx: int) -> None:
+        position = self._positions.pop(idx, None)
+        if position is not None:
+            self._order[position] = None
+
+    def _start_new_cycle(self, last_shown: Optional[int]) -> None:
+        order: List[Optional[int]] = list(self._positions)
+        self._rng.shuffle(order)
+
+        # Avoid showing the same image twice in a row across the cycle boundary
+        if len(order) > 1 and order[0] == last_shown:
+            order[0], order[-1] = order[-1], order[0]
+
+        self._order = order
+        self._positions = {idx: position for position, idx in enumerate(order) if idx is not None}
+        self._cursor = 0
+
+    def _swap(self, a: int, b: int) -> None:
+        self._order[a], self._order[b] = self._order[b], self._order[a]
+        for position in (a, b):
+            idx = self._order[position]
+            if idx is not None:
+                self._positions[idx] = position
+
+    def _load(self) -> None:
+        if not self._path.is_file():
+            return
+
+        try:
+            state = json.loads(self._path.read_text())
+            self._order = state["order"]
+            self._cursor = state["cursor"]
+            self._generation = state.get("generation", 0)
+        except (ValueError, KeyError):
+            logging.warning(f"Ignoring unreadable shuffle order {self._path}")
+            return
+        self._positions = {idx: pos for pos, idx in enumerate(self._order) if idx is not None}
+
+        # The cursor may have moved since the order was saved
+        try:
+            generation, cursor = map(int, self._cursor_path.read_text().split())
+        except (OSError, ValueError):
+            return
+        if generation == self._generation:
+            self._cursor = cursor
+
+    def _save(self) -> None:
+        """Save the whole order, along with the cursor"""
+        self._generation += 1
+        state = {"order": self._order, "cursor": self._cursor, "generation": self._generation}
+        _write_atomically(self._path, json.dumps(state))
+        # The order holds the cursor now, and a restarted order may reuse an old generation
+        self._cursor_path.unlink(missing_ok=True)
+
+    def _save_cursor(self) -> None:
+        """Save only the cursor, which is a few bytes however many images there are"""
+        _write_atomically(self._cursor_path, f"{self._generation} {self._cursor}")
+
+
+def _write_atomically(path: Path, text: str) -> None:
+    # Write to a temporary file first, so a crash never leaves a half written file
+    temp_path = path.with_name(f".{path.name}.tmp")
+    temp_path.write_text(text)
+    os.replace(temp_path, path)
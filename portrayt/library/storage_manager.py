@@ -0,0 +1,237 @@
+import logging
+import os
+from collections import Counter
+from pathlib import Path
+from threading import Lock
+from typing import Collection, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from PIL import Image
+
+from portrayt.configuration import EvictionPolicy, StorageFormat, StorageParams
+
+from .frame_sequence import FRAME_SUFFIX, SEQUENCE_SUFFIX, find_frame
+from .image_catalog import ImageCatalog, ImageUsage
+
+FORMAT_SUFFIXES = {StorageFormat.WEBP_LOSSLESS: ".webp"}
+"""The suffix of images in each format they can be transcoded to"""
+
+WEBP_EFFORT = 50
+"""How hard lossless WebP tries to compress, from 0 to 100. Past this, images barely get smaller
+but take much longer to encode. See benchmarks.bench_storage."""
+
+
+class StorageReport(NamedTuple):
+    images: int
+    size_bytes: int
+    """The space used by images and the files derived from them, after eviction"""
+    evicted: int
+    freed_bytes: int
+    transcoded: int
+    transcoded_saved_bytes: int
+
+
+class _StoredImage(NamedTuple):
+    catalog: ImageCatalog
+    usage: ImageUsage
+    files: List[Path]
+    """The image, and any files derived from it, such as pre-rendered frames"""
+    size_bytes: int
+    """The space its files use. A frame's share of its sequence isn't included."""
+    sequence: Optional[Path]
+    """The frame sequence that holds the image, if it's a frame"""
+
+
+class StorageManager:
+    """Keeps generated images within a disk budget, so a frame that runs for a long time doesn't
+    fill its SD card. Images are optionally transcoded to a more compact lossless format, then
+    the least valuable images are deleted until the rest fit the budget.
+
+    A frame sequence's space is only freed once all of its frames have been deleted, since
+    frames can't be deleted from the sequence one at a time.
+    """
+
+    def __init__(self, images_dirs: Sequence[Path], params: StorageParams) -> None:
+        """
+        :param images_dirs: The images directory of every generator, which share the budget
+        :param params: The budget, and how images are stored
+        """
+        self.images_dirs = images_dirs
+        self.params = params
+        self._lock = Lock()
+
+    def enforce(self, keep: Collection[Path] = ()) -> StorageReport:
+        """Transcode new images, then delete images until the rest are within budget
+
+        :param keep: Images that must not be changed or deleted, such as the one being displayed
+        :return: What was done, and how much space images use now
+        """
+        keep = {path.resolve() for path in keep}
+        with self._lock:
+            transcoded, saved_bytes = self._transcode_all(keep)
+            stored = self._stored_images()
+            sequence_bytes = self._sequence_sizes(stored)
+            size_bytes = sum(image.size_bytes for image in stored) + sum(sequence_bytes.values())
+
+            evicted, freed_bytes = 0, 0
+            max_bytes = self.params.max_megabytes * 1024 * 1024
+            if max_bytes > 0:
+                frames_left = Counter(image.sequence for image in stored if image.sequence)
+                for image in self._eviction_order(stored, keep):
+                    if size_bytes - freed_bytes <= max_bytes:
+                        break
+                    self._delete(image)
+                    evicted += 1
+                    freed_bytes += image.size_bytes
+
+                    if image.sequence is not None:
+                        frames_left[image.sequence] -= 1
+                        if frames_left[image.sequence] == 0:
+                            image.sequence.unlink(missing_ok=True)
+                            freed_bytes += sequence_bytes[image.sequence]
+                if evicted:
+                    self._delete_unused_sequences()
+
+        report = StorageReport(
+            images=len(stored) - evicted,
+            size_bytes=size_bytes - freed_bytes,
+            evicted=evicted,
+            freed_bytes=freed_bytes,
+            transcoded=transcoded,
+            transcoded_saved_bytes=saved_bytes,
+        )
+        if evicted or transcoded:
+            logging.info(f"Enforced the storage budget: {report}")
+        if max_bytes > 0 and report.size_bytes > max_bytes:
+            logging.warning(
+                f"Images use {report.size_bytes} bytes, which is over the budget of {max_bytes}"
+                f" bytes, but no more can be deleted with the {self.params.eviction_policy}"
+                " policy"
+            )
+        return report
+
+    def _stored_images(self) -> List[_StoredImage]:
+        """Every catalogued image, and the space it uses"""
+        stored = []
+        for images_dir in self.images_dirs:
+            if not images_dir.is_dir():
+                continue
+            catalog = ImageCatalog(images_dir)
+            for usage in catalog.usage():
+                # A sequence is named after its first frame, but holds other frames too
+                files = [
+                    path
+                    for path in images_dir.glob(f"{usage.idx}.*")
+                    if path.suffix != SEQUENCE_SUFFIX
+                ]
+                size_bytes = sum(path.stat().st_size for path in files)
+                sequence = None
+                if usage.filename.endswith(FRAME_SUFFIX):
+                    found = find_frame(images_dir / usage.filename)
+                    sequence = None if found is None else found[0].path
+                stored.append(_StoredImage(catalog, usage, files, size_bytes, sequence))
+        return stored
+
+    @staticmethod
+    def _sequence_sizes(stored: List[_StoredImage]) -> Dict[Path, int]:
+        """The space used by each frame sequence that holds catalogued frames"""
+        sizes = {}
+        for image in stored:
+            if image.sequence is not None and image.sequence not in sizes:
+                try:
+                    sizes[image.sequence] = image.sequence.stat().st_size
+                except FileNotFoundError:
+                    sizes[image.sequence] = 0
+        return sizes
+
+    def _eviction_order(
+        self, stored: List[_StoredImage], keep: Collection[Path]
+    ) -> List[_StoredImage]:
+        """The images that may be deleted, in the order they should be deleted"""
+        policy = self.params.eviction_policy
+        candidates = [
+            image
+            for image in stored
+            if (image.catalog.images_dir / image.usage.filename).resolve() not in keep
+            and not (policy is EvictionPolicy.NOT_FAVOURITE and image.usage.favourite)
+        ]
+
+        def sort_key(image: _StoredImage) -> Tuple[float, ...]:
+            usage = image.usage
+            if policy is EvictionPolicy.LEAST_SHOWN:
+                # New images are kept until they've had a chance to be shown
+                return (
+                    usage.favourite,
+                    usage.shown_count == 0,
+                    usage.shown_count,
+                    usage.created_at,
+                )
+            return (usage.favourite, usage.created_at)
+
+        return sorted(candidates, key=sort_key)
+
+    @staticmethod
+    def _delete(image: _StoredImage) -> None:
+        # Remove the image from the catalog first, so it's never shown after its file is gone
+        image.catalog.remove(image.usage.idx)
+        for path in image.files:
+            path.unlink(missing_ok=True)
+
+    def _delete_unused_sequences(self) -> None:
+        for images_dir in self.images_dirs:
+            if images_dir.is_dir():
+                for sequence_path in ImageCatalog(images_dir).unused_sequences():
+                    sequence_path.unlink(missing_ok=True)
+
+    def _transcode_all(self, keep: Collection[Path]) -> Tuple[int, int]:
+        """Transcode every image that isn't in the configured storage format yet
+
+        :return: The number of images that were transcoded, and the bytes that saved
+        """
+        storage_format = self.params.storage_format
+        if storage_format is StorageFormat.ORIGINAL:
+            return 0, 0
+
+        suffix = FORMAT_SUFFIXES[storage_format]
+        transcoded, saved_bytes = 0, 0
+        for images_dir in self.images_dirs:
+            if not images_dir.is_dir():
+                continue
+            catalog = ImageCatalog(images_dir)
+            for usage in catalog.usage():
+                image_path = images_dir / usage.filename
+                # Frames are kept in their sequence, which already stores them as lossless WebP
+                if image_path.suffix in (suffix, FRAME_SUFFIX) or image_path.resolve() in keep:
+                    continue
+
+                try:
+                    target_path = transcode(image_path, storage_format)
+                except (OSError, ValueError):
+                    logging.exception(f"Failed to transcode {image_path}")
+                    continue
+
+                saved_bytes += image_path.stat().st_size - target_path.stat().st_size
+                catalog.rename(usage.idx, target_path.name)
+                image_path.unlink()
+                transcoded += 1
+        return transcoded, saved_bytes
+
+
+def transcode(image_path: Path, storage_format: StorageFormat) -> Path:
+    """Save a lossless copy of an image in another format, next to the original
+
+    :param image_path: The image to transcode
+    :param storage_format: The format to transcode it to
+    :return: The path of the copy
+    """
+    target_path = image_path.with_suffix(FORMAT_SUFFIXES[storage_format])
+    temp_path = target_path.with_name(f".{target_path.name}.tmp")
+    try:
+        with Image.open(image_path) as image:
+            converted: Image.Image = image
+            if image.mode not in ("RGB", "RGBA"):
+                converted = image.convert("RGBA" if "transparency" in image.info else "RGB")
+            converted.save(temp_path, format="WEBP", lossless=True, quality=WEBP_EFFORT)
+        os.replace(temp_path, target_path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+    return target_path
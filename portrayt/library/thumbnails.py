@@ -0,0 +1,76 @@
+import os
+from pathlib import Path
+from typing import List, NamedTuple
+
+from .frame_sequence import open_image
+
+
+class ThumbnailSize(NamedTuple):
+    name: str
+    max_edge: int
+    """The longest the thumbnail's width or height may be, in pixels"""
+    quality: int
+    """The lossy WebP quality, from 0 to 100"""
+
+
+PREVIEW = ThumbnailSize("preview", 768, 80)
+"""Big enough to show the current image on the dashboard"""
+
+THUMBNAIL = ThumbnailSize("thumb", 192, 70)
+"""A gallery tile, which is a few kilobytes"""
+
+THUMBNAIL_SIZES = (PREVIEW, THUMBNAIL)
+"""Every size, largest first. Each size is made from the one before it."""
+
+
+def thumbnail_path(image_path: Path, size: ThumbnailSize) -> Path:
+    """Where an image's thumbnail is kept. It's named like the image's other derived files, so it's
+    deleted along with the image.
+
+    :param image_path: The name the image is catalogued as
+    :param size: The size of the thumbnail
+    """
+    return image_path.with_name(f"{int(image_path.stem)}.{size.name}-{size.max_edge}.webp")
+
+
+def make_thumbnails(image_path: Path) -> List[Path]:
+    """Make every size of thumbnail for an image. The image is only decoded once, and each size is
+    shrunk from the next larger one, which is much quicker than shrinking the image each time.
+
+    :param image_path: The name the image is catalogued as
+    :return: The thumbnails, largest first
+    """
+    paths = []
+    with open_image(image_path) as image:
+        image.draft("RGB", (PREVIEW.max_edge, PREVIEW.max_edge))
+        resized = image.convert("RGB")
+
+    for size in THUMBNAIL_SIZES:
+        # Image.thumbnail keeps the aspect ratio, and never makes an image larger
+        resized = resized.copy()
+        resized.thumbnail((size.max_edge, size.max_edge))
+
+        # Write to a temporary file first, so a partially written thumbnail is never served
+        path = thumbnail_path(image_path, size)
+        temp_path = path.with_name(f".{path.name}.tmp")
+        try:
+            resized.save(temp_path, format="WEBP", quality=size.quality)
+            os.replace(temp_path, path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        paths.append(path)
+    return paths
+
+
+def get_thumbnail(image_path: Path, size: ThumbnailSize) -> Path:
+    """An image's thumbnail, which is made first if it doesn't exist yet, such as for images that
+    were generated before thumbnails were
+
+    :param image_path: The name the image is catalogued as
+    :param size: The size of the thumbnail
+    :raises FileNotFoundError: If the image doesn't exist
+    """
+    path = thumbnail_path(image_path, size)
+    if not path.is_file():
+        make_thumbnails(image_path)
+    return path
@@ -1,6 +1,8 @@
 import logging
 from argparse import ArgumentParser
 from pathlib import Path
+from threading import Event
+from typing import Any
 
 from portrayt.configuration import (
     Configuration,
@@ -8,8 +10,9 @@ from portrayt.configuration import (
     PromptInterpolationAnimation,
     RendererParams,
 )
-from portrayt.interface import MainApp
-from portrayt.renderers import RendererType
+from portrayt.generators import images_dir_for
+from portrayt.library import ImageCatalog
+from portrayt.renderers import RENDERER_TYPES, BaseRenderer, RendererType
 
 
 def main() -> None:
@@ -29,6 +32,11 @@ def main() -> None:
         help=f"What type of renderer to use. Valid values are: {[v.value for v in RendererType]}",
     )
     parser.add_argument("-p", "--port", type=int, default=80)
+    parser.add_argument(
+        "--display-only",
+        action="store_true",
+        help="Only show images that were already generated, without starting the server",
+    )
     args = parser.parse_args()
 
     logging.getLogger().setLevel("INFO")
@@ -38,32 +46,27 @@ def main() -> None:
     data_dir.mkdir(parents=True, exist_ok=True)
     config_path = data_dir / "portrayt-config.json"
     if not config_path.is_file():
-        config = Configuration(
-            current_prompt_type=PromptGenerateVariations.__name__,
-            prompt_generate_variations=PromptGenerateVariations(
-                prompt="Robots rights protest, colorized vintage newspaper scan",
-                num_variations=3,
-            ),
-            prompt_interpolation_animation=PromptInterpolationAnimation(
-                prompt_start="the low skyline of medieval london, cgsociety, concept art",
-                prompt_end="the tall neon covered skyline of london in 2050, science fiction, space"
-                " ships, cgsociety, space ships, space art, matte painting, redshift, concept art",
-                prompt_strength=0.75,
-                seamless_loop=False,
-                num_animation_frames=15,
-            ),
-            renderer=RendererParams(seconds_between_images=180, shuffle=True),
-            clear_results_between_images=False,
-            portrait_width=768,
-            portrait_height=512,
-            seed=1337,
-        )
-        config_path.write_text(config.json(indent=2))
+        write_default_configuration(config_path)
+
+    # The renderer and the app share one configuration, so the renderer sees changes made in the
+    # app, and the app saves changes made by the renderer
+    config = Configuration.parse_file(config_path)
+
+    # Start showing cached images straight away, before the server has loaded
+    renderer = create_renderer(config, data_dir, args.renderer)
+    if args.display_only:
+        run_display_only(renderer)
+        return
+
+    # Gradio and the generators are slow to import, so they're only imported once images are
+    # already being shown
+    from portrayt.interface import MainApp
 
     app = MainApp(
+        configuration=config,
         configuration_path=config_path,
         cache_root_path=data_dir,
-        render_type=args.renderer,
+        renderer=renderer,
         port=args.port,
     )
 
@@ -71,8 +74,63 @@ def main() -> None:
         app.launch()
     except Exception:
         app.close()
+        renderer.close()
         raise
 
 
+def write_default_configuration(config_path: Path) -> None:
+    """Write a configuration with example prompts, for the first run"""
+    config = Configuration(
+        current_prompt_type=PromptGenerateVariations.__name__,
+        prompt_generate_variations=PromptGenerateVariations(
+            prompt="Robots rights protest, colorized vintage newspaper scan",
+            num_variations=3,
+        ),
+        prompt_interpolation_animation=PromptInterpolationAnimation(
+            prompt_start="the low skyline of medieval london, cgsociety, concept art",
+            prompt_end="the tall neon covered skyline of london in 2050, science fiction, space"
+            " ships, cgsociety, space ships, space art, matte painting, redshift, concept art",
+            prompt_strength=0.75,
+            seamless_loop=False,
+            num_animation_frames=15,
+        ),
+        renderer=RendererParams(seconds_between_images=180, shuffle=True),
+        clear_results_between_images=False,
+        portrait_width=768,
+        portrait_height=512,
+        seed=1337,
+    )
+    config_path.write_text(config.json(indent=2))
+
+
+def create_renderer(
+    config: Configuration, data_dir: Path, renderer_type: RendererType
+) -> BaseRenderer[Any]:
+    """Create a renderer that shows images from the current generator, without importing it
+
+    :param config: The configuration. The renderer uses its renderer parameters, not a copy.
+    :param data_dir: The directory that generators save images under
+    :param renderer_type: The type of renderer to create
+    :return: The renderer, which has started showing images
+    """
+    images_dir = images_dir_for(data_dir, config.current_prompt_type)
+    images_dir.mkdir(parents=True, exist_ok=True)
+
+    # Make sure the catalog matches what's on disk, in case files changed while stopped
+    ImageCatalog(images_dir).check_consistency()
+    return RENDERER_TYPES[renderer_type](images_dir, params=config.renderer)
+
+
+def run_display_only(renderer: BaseRenderer[Any]) -> None:
+    """Keep showing images until interrupted"""
+    logging.info("Running in display only mode, new images won't be generated")
+    try:
+        Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        renderer.close()
+
+
 if __name__ == "__main__":
     main()
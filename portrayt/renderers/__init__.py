@@ -1,20 +1,43 @@
 from enum import Enum
-from typing import Dict, Type
+from typing import TYPE_CHECKING, Any, Type
+
+from portrayt.lazy_imports import LazyRegistry, lazy_attributes
 
 from .base_renderer import BaseRenderer
-from .inky_renderer import Inky4Renderer, Inky5Renderer
-from .opencv_renderer import OpenCVRenderer
+
+if TYPE_CHECKING:
+    from .inky_renderer import Inky4Renderer, Inky5Renderer
+    from .null_panel import NullPanel, NullPanelRenderer
+    from .opencv_renderer import OpenCVRenderer
+
+# Each renderer depends on the libraries for its own display, which are slow to import on a
+# Raspberry Pi, so they're only imported once they're used
+__getattr__ = lazy_attributes(
+    __name__,
+    {
+        "Inky4Renderer": ".inky_renderer",
+        "Inky5Renderer": ".inky_renderer",
+        "NullPanel": ".null_panel",
+        "NullPanelRenderer": ".null_panel",
+        "OpenCVRenderer": ".opencv_renderer",
+    },
+)
 
 
 class RendererType(Enum):
     OPENCV = "opencv"
     INKY_4 = "inky_4_inch"
     INKY_5 = "inky_5_inch"
+    NULL_PANEL = "null_panel"
 
 
-RENDERER_TYPES: Dict[RendererType, Type[BaseRenderer]] = {
-    RendererType.OPENCV: OpenCVRenderer,
-    RendererType.INKY_5: Inky5Renderer,
-    RendererType.INKY_4: Inky4Renderer,
-}
-"""A dictionary of all available renderer types and their associated object"""
+RENDERER_TYPES: LazyRegistry[RendererType, Type[BaseRenderer[Any]]] = LazyRegistry(
+    {
+        RendererType.OPENCV: f"{__name__}.opencv_renderer:OpenCVRenderer",
+        RendererType.INKY_5: f"{__name__}.inky_renderer:Inky5Renderer",
+        RendererType.INKY_4: f"{__name__}.inky_renderer:Inky4Renderer",
+        RendererType.NULL_PANEL: f"{__name__}.null_panel:NullPanelRenderer",
+    }
+)
+"""A dictionary of all available renderer types and their associated object. Each renderer is
+imported the first time it's looked up."""
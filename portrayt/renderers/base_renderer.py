@@ -1,130 +1,350 @@
-import json
 import logging
-import random
 from abc import ABC, abstractmethod
+from concurrent.futures import Future
 from pathlib import Path
-from threading import Event, Thread
-from time import sleep
-from typing import Any, Dict, List, Optional
+from queue import Empty, Queue
+from threading import Condition, Event, Lock, Thread
+from typing import Any, Dict, Generic, List, Optional, Tuple
 
 from portrayt.configuration import RendererParams
+from portrayt.library import SEQUENCE_SUFFIX, ImageCatalog, ShuffleOrder
 
+from .prefetcher import FRAME, FramePrefetcher
+from .render_commands import CommandType, RenderCommand, RendererClosed
+
+
+class BaseRenderer(ABC, Generic[FRAME]):
+    SHUFFLE_ORDER_FILENAME = "shuffle-order.json"
+
+    PRERENDER_PREFIX = "prerender-"
+    """Pre-rendered files are saved next to their image, as '<idx>.prerender-<key>.npy'"""
 
-class BaseRenderer(ABC):
     def __init__(self, images_dir: Path, params: RendererParams) -> None:
         self._closing = Event()
-        self._parameters_changed = Event()
+        self._commands: "Queue[RenderCommand]" = Queue()
+        self._send_lock = Lock()
+        self._closed = False
+        """Set once 'close' is called, after which no more commands are accepted"""
 
         self._params = params
 
         # Rendering modes
         self._images_dir = images_dir
+        self._catalog = ImageCatalog(images_dir)
+        self._shuffle_order = ShuffleOrder(images_dir / self.SHUFFLE_ORDER_FILENAME)
+        self._catalog_revision: Optional[int] = None
+        """The catalog revision that the shuffle order and prefetcher were last synced with"""
+        self._current_lock = Lock()
+        """Held while the current image and prompt change, so they're always read as a pair"""
         self._current_image: Optional[Path] = None
+        self._current_prompt: Optional[Dict[str, Any]] = None
+        """The parameters the current image was generated with, looked up when it's chosen"""
+        self._invalidate_prerendered(images_dir)
+
+        # Upcoming images are prepared in the background while the current one is shown
+        self._prefetcher = FramePrefetcher(self._prepare, max_frames=params.prefetch_frames)
 
+        # Only the most recently requested image is rendered, so bursts of requests that arrive
+        # while the display is busy are coalesced into a single render
+        self._render_requested = Condition()
+        self._requested_render: Optional[Tuple[Path, List[Path]]] = None
+        """The image to render next, and the images expected to be shown after it"""
+
+        self._control_thread = Thread(target=self._control_loop, daemon=True)
         self._render_thread = Thread(target=self._render_loop, daemon=True)
+        self._control_thread.start()
         self._render_thread.start()
 
-    def _render_loop(self) -> None:
-        """A thread that is started on construction and runs 'render' on a timer"""
+    def _control_loop(self) -> None:
+        """A thread that is started on construction. It applies commands from other threads, and
+        moves on to the next image on a timer."""
+        self._advance_and_render([])
 
         while not self._closing.is_set():
-            next_image = self._next_image()
-            self._current_image = next_image
-            self._parameters_changed.clear()
+            try:
+                commands = [self._commands.get(timeout=self._params.seconds_between_images)]
+            except Empty:
+                self._advance_and_render([])
+                continue
+
+            # Apply every command that has queued up, then render only the final result
+            while True:
+                try:
+                    commands.append(self._commands.get_nowait())
+                except Empty:
+                    break
+            self._advance_and_render(commands)
 
-            # Render the next image, if there is one
-            if self._current_image is None:
-                logging.warning(f"No images found to render in: {self._images_dir}")
+    def _advance_and_render(self, commands: List[RenderCommand]) -> None:
+        """Apply commands, or move to the next image if there are none, then request a render
+        and acknowledge the commands"""
+        try:
+            if commands:
+                for command in commands:
+                    self._apply(command)
             else:
-                self._render(self._current_image)
+                self._advance()
+
+            if not self._closing.is_set():
+                self._request_render()
+        except Exception as e:
+            logging.exception(f"Failed to update the current image, while applying {commands}")
+            for command in commands:
+                command.future.set_exception(e)
+        else:
+            for command in commands:
+                command.future.set_result(None)
 
-            # Wait before updating the next image
-            self._parameters_changed.wait(timeout=self._params.seconds_between_images)
+    def _render_loop(self) -> None:
+        """A thread that is started on construction, and renders images as they're requested"""
+        while True:
+            with self._render_requested:
+                self._render_requested.wait_for(
+                    lambda: self._requested_render is not None or self._closing.is_set()
+                )
+                request = self._requested_render
+                self._requested_render = None
+            if request is None or self._closing.is_set():
+                return
+
+            image_path, upcoming = request
+            try:
+                frame = self._prefetcher.get(image_path)
 
-    def update_image_dir(self, images_dir: Path) -> None:
+                # Prepare the following images while this one is being shown
+                self._prefetcher.prefetch(upcoming)
+                self._render(frame)
+            except Exception:
+                logging.exception(f"Failed to render {image_path}")
+            else:
+                self._record_shown(image_path)
+
+    def _record_shown(self, image_path: Path) -> None:
+        """Count that an image was shown, so that the least shown images can be deleted first"""
+        catalog = self._catalog
+        if catalog.images_dir != image_path.parent:
+            # The images directory changed while the image was being rendered
+            return
+        try:
+            catalog.record_shown(int(image_path.stem))
+        except Exception:
+            logging.exception(f"Failed to record that {image_path} was shown")
+
+    def _advance(self) -> None:
+        """Move on to the next image"""
+        self._sync_with_catalog()
+        current_image = self._next_image()
+        current_prompt = (
+            None if current_image is None else self._catalog.params(int(current_image.stem))
+        )
+        self._set_current(current_image, current_prompt)
+
+    def _set_current(
+        self, current_image: Optional[Path], current_prompt: Optional[Dict[str, Any]]
+    ) -> None:
+        with self._current_lock:
+            self._current_image = current_image
+            self._current_prompt = current_prompt
+
+    def _request_render(self) -> None:
+        """Ask the render thread to show the current image"""
+        if self._current_image is None:
+            logging.warning(f"No images found to render in: {self._images_dir}")
+            return
+
+        upcoming = self._upcoming_images(self._params.prefetch_frames)
+        with self._render_requested:
+            self._requested_render = (self._current_image, upcoming)
+            self._render_requested.notify()
+
+    def _apply(self, command: RenderCommand) -> None:
+        """Apply a command on the control thread"""
+        if command.command_type is CommandType.CLOSE:
+            self._closing.set()
+            return
+
+        if command.command_type is CommandType.UPDATE_IMAGE_DIR and command.images_dir:
+            self._change_image_dir(command.images_dir)
+        elif command.command_type is CommandType.TOGGLE_SHUFFLE:
+            self._params.shuffle = not self._params.shuffle
+            self._prefetcher.clear()
+        elif command.command_type is CommandType.DELETE_CURRENT_IMAGE:
+            self._delete_current_image()
+
+        self._advance()
+
+    def _change_image_dir(self, images_dir: Path) -> None:
         if self._images_dir != images_dir:
             # Reset the position in the queue by setting current image to None
-            self._current_image = None
+            self._set_current(None, None)
+            self._invalidate_prerendered(images_dir)
+            self._catalog = ImageCatalog(images_dir)
+            self._shuffle_order = ShuffleOrder(images_dir / self.SHUFFLE_ORDER_FILENAME)
+            self._catalog_revision = None
 
         self._images_dir = images_dir
-        self._parameters_changed.set()
+        self._prefetcher.clear()
+
+    def _delete_current_image(self) -> None:
+        delete_image = self._current_image
+        if delete_image is None:
+            return
+
+        self._catalog.remove(int(delete_image.stem))
 
-        # Get the new 'current image'
-        self._wait_for_parameters_updated()
+        # Delete the image last, so it's never missing while its sidecar files still exist. A frame
+        # sequence is named like its first frame's sidecars, but it holds other frames too, so it's
+        # only deleted once none of its frames are catalogued.
+        for sidecar in delete_image.parent.glob(f"{int(delete_image.stem)}.*"):
+            if sidecar != delete_image and sidecar.suffix != SEQUENCE_SUFFIX:
+                sidecar.unlink(missing_ok=True)
+        delete_image.unlink(missing_ok=True)
+        for sequence_path in self._catalog.unused_sequences():
+            sequence_path.unlink(missing_ok=True)
+        self._prefetcher.clear()
+
+    def _send(
+        self, command: RenderCommand, block: bool, timeout: Optional[float]
+    ) -> "Future[None]":
+        """Send a command to the control thread
+
+        :param command: The command to send
+        :param block: If True, wait until the command has been applied
+        :param timeout: The most time to wait, if blocking. TimeoutError is raised if exceeded.
+        :return: A future that resolves once the command has been applied. If the renderer has
+            been closed, it holds a RendererClosed exception instead.
+        """
+        with self._send_lock:
+            if self._closed:
+                command.future.set_exception(RendererClosed(f"Can't apply {command}"))
+            else:
+                self._commands.put(command)
+        if block:
+            command.future.result(timeout=timeout)
+        return command.future
+
+    def update_image_dir(
+        self, images_dir: Path, block: bool = True, timeout: Optional[float] = None
+    ) -> "Future[None]":
+        command = RenderCommand(CommandType.UPDATE_IMAGE_DIR, images_dir=images_dir)
+        return self._send(command, block=block, timeout=timeout)
 
     @property
     def current_image(self) -> Optional[Path]:
         """Returns the current image being displayed"""
-        return self._current_image
+        with self._current_lock:
+            return self._current_image
 
     @property
     def current_prompt(self) -> Optional[Dict[str, Any]]:
         """Return the current prompt as python dict, representing the serialized json"""
-        current_image = self.current_image
-        if current_image is None:
-            return None
+        with self._current_lock:
+            return self._current_prompt
 
-        current_prompt = current_image.with_name(f"{int(current_image.stem)}.json")
-        if current_prompt.is_file():
-            return json.loads(current_prompt.read_text())  # type: ignore
-        else:
-            return None
-
-    def next(self) -> None:
-        self._parameters_changed.set()
-        self._wait_for_parameters_updated()
-
-    def delete_current_image(self) -> None:
-        delete_image = self.current_image
-        if delete_image:
-            delete_json = delete_image.with_name(f"{int(delete_image.stem)}.json")
-            delete_json.unlink(missing_ok=True)
-            delete_image.unlink(missing_ok=True)
-        self.next()
-
-    def toggle_shuffle(self) -> None:
-        self._params.shuffle = not self._params.shuffle
-        self._parameters_changed.set()
-        self._wait_for_parameters_updated()
-
-    def _wait_for_parameters_updated(self) -> None:
-        """Wait until the parameter change has been observed"""
-        while self._parameters_changed.is_set():
-            sleep(0.1)
+    def next(self, block: bool = True, timeout: Optional[float] = None) -> "Future[None]":
+        return self._send(RenderCommand(CommandType.NEXT), block=block, timeout=timeout)
 
-    @property
-    def _image_paths(self) -> List[Path]:
-        image_paths = list(self._images_dir.glob("*.png"))
-        image_paths.sort(key=lambda p: int(p.stem))
-        return image_paths
+    def delete_current_image(
+        self, block: bool = True, timeout: Optional[float] = None
+    ) -> "Future[None]":
+        command = RenderCommand(CommandType.DELETE_CURRENT_IMAGE)
+        return self._send(command, block=block, timeout=timeout)
+
+    def toggle_shuffle(self, block: bool = True, timeout: Optional[float] = None) -> "Future[None]":
+        command = RenderCommand(CommandType.TOGGLE_SHUFFLE)
+        return self._send(command, block=block, timeout=timeout)
+
+    def _sync_with_catalog(self) -> None:
+        """Update the shuffle order and drop prefetched frames, if images were added or removed"""
+        revision = self._catalog.revision
+        if revision != self._catalog_revision:
+            # Images may have been replaced, so prefetched frames can't be trusted
+            self._prefetcher.clear()
+            self._shuffle_order.sync(self._catalog.indices())
+            self._catalog_revision = revision
 
     def _next_image(self) -> Optional[Path]:
-        paths = self._image_paths
-        if self._params.shuffle:
-            # Always shuffle in a consistent order so that the images that appear are
-            # new, instead of shuffling each time another image is called which could
-            # cause multiple renders in a row (or nearby) to show the same image
-            seeded_random = random.Random(x="mmm sunflower seeds")
-            seeded_random.shuffle(paths)
+        if not self._params.shuffle:
+            current_idx = None if self._current_image is None else int(self._current_image.stem)
+            return self._catalog.next_path(after_idx=current_idx)
 
-        try:
-            next_idx = paths.index(self._current_image) + 1  # type: ignore
-        except ValueError:
-            next_idx = 0
+        for _ in range(2):
+            next_idx = self._shuffle_order.next()
+            if next_idx is None:
+                return None
+            entry = self._catalog.get(next_idx)
+            if entry is not None:
+                return self._images_dir / entry.filename
 
-        try:
-            if next_idx == len(paths):
-                return paths[0]
-            else:
-                return paths[next_idx]
-        except IndexError:
-            return None
+            # The image was removed without the revision changing, so force a resync
+            self._catalog_revision = None
+            self._sync_with_catalog()
+        return None
+
+    def _upcoming_images(self, count: int) -> List[Path]:
+        """Peek at the images that will be shown after the current one, without advancing"""
+        if count == 0:
+            return []
+
+        if not self._params.shuffle:
+            current_idx = None if self._current_image is None else int(self._current_image.stem)
+            return self._catalog.next_paths(after_idx=current_idx, count=count)
+
+        entries = [self._catalog.get(idx) for idx in self._shuffle_order.upcoming(count)]
+        return [self._images_dir / entry.filename for entry in entries if entry is not None]
+
+    @property
+    def prerender_key(self) -> Optional[str]:
+        """A key identifying the output of 'prerender' for this renderer's current settings, or
+        None if this renderer doesn't pre-render images"""
+        return None
+
+    def prerender(self, image_path: Path) -> None:
+        """Save a display-ready version of an image next to it, so that rendering it later is
+        fast. This is run on each image as it is generated.
+
+        :param image_path: The image to pre-render
+        """
+
+    def _prerendered_path(self, image_path: Path) -> Path:
+        """The path a pre-rendered image should be saved to"""
+        return image_path.with_name(
+            f"{int(image_path.stem)}.{self.PRERENDER_PREFIX}{self.prerender_key}.npy"
+        )
+
+    def _invalidate_prerendered(self, images_dir: Path) -> None:
+        """Delete pre-rendered files made for a different renderer, or different settings"""
+        valid_suffix = f".{self.PRERENDER_PREFIX}{self.prerender_key}.npy"
+        for prerendered in images_dir.glob(f"*.{self.PRERENDER_PREFIX}*.npy"):
+            if self.prerender_key is None or not prerendered.name.endswith(valid_suffix):
+                prerendered.unlink(missing_ok=True)
+
+    @abstractmethod
+    def _prepare(self, image_path: Path) -> FRAME:
+        """Load and process an image so it's ready to be shown. This may be run ahead of time,
+        on a background thread."""
 
     @abstractmethod
-    def _render(self, image_path: Path) -> None:
-        """Render the current image"""
+    def _render(self, frame: FRAME) -> None:
+        """Show a frame that was returned by '_prepare'"""
 
     def close(self) -> None:
-        self._closing.set()
-        self._parameters_changed.set()
+        with self._send_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._commands.put(RenderCommand(CommandType.CLOSE))
+        self._control_thread.join()
+
+        # Commands can't be queued any more, but some may have been left behind by the control loop
+        while True:
+            try:
+                command = self._commands.get_nowait()
+            except Empty:
+                break
+            command.future.set_exception(RendererClosed(f"Can't apply {command}"))
+
+        with self._render_requested:
+            self._render_requested.notify()
         self._render_thread.join()
+        self._prefetcher.close()
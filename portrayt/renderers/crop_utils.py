@@ -1,33 +1,76 @@
 import math
-from typing import Tuple
+from typing import Optional, Tuple
 
 from PIL import Image
 
+DEFAULT_REDUCING_GAP = 3.0
+"""Large images are first shrunk by an integer factor, to no less than this many times the
+output size, before the final LANCZOS resample. At this gap the output is within a few levels
+per channel of a full LANCZOS resample, and usually identical."""
 
-def resize_crop(image: Image, size: Tuple[int, int]) -> Image:
-    """Crop the image with a centered rectangle of the specified size"""
-    img_format = image.format
-    image = image.copy()
-    old_size = image.size
-    left = (old_size[0] - size[0]) / 2
-    top = (old_size[1] - size[1]) / 2
-    right = old_size[0] - left
-    bottom = old_size[1] - top
-    rect = [int(math.ceil(x)) for x in (left, top, right, bottom)]
-    left, top, right, bottom = rect
-    crop = image.crop((left, top, right, bottom))
-    crop.format = img_format
+
+def resize_crop(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """Crop the image with a centered rectangle of the specified size.
+
+    The image itself is returned if it's already the right size, so the result must not be
+    modified in place.
+    """
+    if image.size == tuple(size):
+        return image
+
+    crop = image.crop(_centered_box(image.size, size))
+    crop.format = image.format
     return crop
 
 
-def resize_cover(image: Image, size: Tuple[int, int]) -> Image:
-    """Resize image by resizing and keeping aspect ratio, then center cropping."""
-    img_format = image.format
-    img = image.copy()
-    img_size = img.size
-    ratio = max(size[0] / img_size[0], size[1] / img_size[1])
-    new_size = [int(math.ceil(img_size[0] * ratio)), int(math.ceil(img_size[1] * ratio))]
-    img = img.resize((new_size[0], new_size[1]), Image.LANCZOS)
-    img = resize_crop(img, size)
-    img.format = img_format
-    return img
+def resize_cover(
+    image: Image.Image,
+    size: Tuple[int, int],
+    reducing_gap: Optional[float] = DEFAULT_REDUCING_GAP,
+) -> Image.Image:
+    """Resize image by resizing and keeping aspect ratio, then center cropping.
+
+    Only the part of the image that survives the crop is resampled, in a single step without
+    intermediate copies. The image itself is returned if it's already the right size, so the
+    result must not be modified in place.
+
+    :param image: The image to resize
+    :param size: The size of the result
+    :param reducing_gap: See DEFAULT_REDUCING_GAP. None always does a full LANCZOS resample.
+    """
+    size = (int(size[0]), int(size[1]))
+    if image.size == size:
+        return image
+
+    # The size the whole image would be resized to before cropping
+    width, height = image.size
+    ratio = max(size[0] / width, size[1] / height)
+    cover_size = (math.ceil(width * ratio), math.ceil(height * ratio))
+
+    # Map the crop back onto the original image, so only that region is resampled
+    scale_x, scale_y = cover_size[0] / width, cover_size[1] / height
+    left, top, right, bottom = _centered_box(cover_size, size)
+    box = (left / scale_x, top / scale_y, right / scale_x, bottom / scale_y)
+
+    resized = image.resize(size, Image.LANCZOS, box=box, reducing_gap=reducing_gap)
+    resized.format = image.format
+    return resized
+
+
+def draft_for_cover(
+    image: Image.Image, size: Tuple[int, int], reducing_gap: float = DEFAULT_REDUCING_GAP
+) -> None:
+    """Let an image that hasn't been loaded yet decode at a reduced scale, if its format
+    supports it, such as JPEG. It stays at least reducing_gap times larger than size, so that
+    resize_cover can still do a high quality resample afterwards.
+    """
+    image.draft(image.mode, (int(size[0] * reducing_gap), int(size[1] * reducing_gap)))
+
+
+def _centered_box(image_size: Tuple[int, int], size: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    """The (left, top, right, bottom) of a rectangle of the specified size, centered in an image"""
+    left = (image_size[0] - size[0]) / 2
+    top = (image_size[1] - size[1]) / 2
+    right = image_size[0] - left
+    bottom = image_size[1] - top
+    return (math.ceil(left), math.ceil(top), math.ceil(right), math.ceil(bottom))
@@ -1,29 +1,113 @@
 import logging
+import os
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Any, Tuple
+from typing import List, Tuple
 
+import numpy as np
+import numpy.typing as npt
+from inky.inky_uc8159 import DESATURATED_PALETTE, SATURATED_PALETTE
 from inky.inky_uc8159 import Inky as Inky7Color
 from PIL import Image
 
+from portrayt.configuration import RendererParams
+from portrayt.library import open_image
 from portrayt.renderers import BaseRenderer
 
-from .crop_utils import resize_cover
+from .crop_utils import draft_for_cover, resize_cover
+from .quantization import RGB, PaletteQuantizer
+from .refresh_filter import RefreshFilter, RefreshStats
 
 
-class _InkyRenderer(BaseRenderer, ABC):
-    def __init__(self, *args: Any, **kwargs: Any):
-        super().__init__(*args, **kwargs)
-        self.display = Inky7Color(resolution=self.resolution)
+class _InkyRenderer(BaseRenderer[Image.Image], ABC):
+    def __init__(self, images_dir: Path, params: RendererParams):
+        # The display must exist before the render thread is started by the base class
+        self.display = self._create_display()
+        self._quantizer = PaletteQuantizer(
+            self._blend_palette(params.saturation), dither_mode=params.dither_mode
+        )
+        self._refresh_filter = RefreshFilter(params.refresh_threshold)
+        super().__init__(images_dir, params)
 
         logging.info(f"Initialized Inky with resolution {self.display.resolution}")
 
-    def _render(self, image_path: Path) -> None:
-        image = Image.open(image_path)
-        resized = resize_cover(image, self.display.resolution)
+    @property
+    def prerender_key(self) -> str:
+        width, height = self.resolution
+        saturation = self._params.saturation
+        return f"uc8159-{width}x{height}-s{saturation:.2f}-{self._params.dither_mode.value}"
+
+    def prerender(self, image_path: Path) -> None:
+        """Resize and quantize the image to the panel's palette, and save the resulting
+        framebuffer as a memory-mappable numpy file"""
+        with open_image(image_path) as image:
+            framebuffer = self._quantize(image)
+
+        # Write to a temporary file first, so a partially written file is never read
+        prerendered_path = self._prerendered_path(image_path)
+        temp_path = prerendered_path.with_name(f".{prerendered_path.name}.tmp")
+        with temp_path.open("wb") as temp_file:
+            np.save(temp_file, framebuffer)
+        os.replace(temp_path, prerendered_path)
+
+    def _prepare(self, image_path: Path) -> Image.Image:
+        prerendered_path = self._prerendered_path(image_path)
+        if not prerendered_path.is_file():
+            # This image was generated before pre-rendering, or with different settings
+            self.prerender(image_path)
+
+        framebuffer = np.load(prerendered_path, mmap_mode="r")
+        width, height = self.resolution
+        return Image.frombytes("P", (int(width), int(height)), framebuffer.tobytes())
+
+    @property
+    def refresh_stats(self) -> RefreshStats:
+        return self._refresh_filter.stats
+
+    def _render(self, frame: Image.Image) -> None:
+        # A refresh takes tens of seconds and flashes the panel, so skip it if nothing changed
+        framebuffer = np.asarray(frame, dtype=np.uint8)
+        self._refresh_filter.threshold = self._params.refresh_threshold
+        if not self._refresh_filter.should_refresh(framebuffer):
+            logging.info(f"Skipped refreshing the display: {self.refresh_stats}")
+            return
+
+        # Since the frame is already quantized, the display will use its palette indices as-is
+        try:
+            self.display.set_image(frame, saturation=self._params.saturation)
+            self.display.show()
+        except Exception:
+            # The display may have been partially updated, so don't trust what's on it
+            self._refresh_filter.reset()
+            raise
+        self._refresh_filter.record_refresh(framebuffer)
+
+    def _create_display(self) -> Inky7Color:
+        return Inky7Color(resolution=self.resolution)
+
+    def _quantize(self, image: Image.Image) -> "npt.NDArray[np.uint8]":
+        """Resize and quantize an image to the panel's palette, returning an array of palette
+        indices"""
+        width, height = self.display.resolution
+        size = (int(width), int(height))
+
+        # Let JPEGs much larger than the panel decode at a reduced scale, which is far quicker
+        draft_for_cover(image, size)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return self._quantizer.quantize(resize_cover(image, size))
 
-        self.display.set_image(resized, saturation=0.6)
-        self.display.show()
+    @staticmethod
+    def _blend_palette(saturation: float) -> List[RGB]:
+        """The RGB palette of the panel, blended by the given saturation. This matches the
+        palette the inky library uses when quantizing images itself."""
+        palette: List[RGB] = []
+        for saturated, desaturated in zip(SATURATED_PALETTE[:7], DESATURATED_PALETTE[:7]):
+            r, g, b = (
+                int(s * saturation + d * (1.0 - saturation)) for s, d in zip(saturated, desaturated)
+            )
+            palette.append((r, g, b))
+        return palette + [(255, 255, 255)]
 
     @property
     @abstractmethod
@@ -0,0 +1,106 @@
+import logging
+import time
+from pathlib import Path
+from threading import Lock
+from typing import List, NamedTuple, Sequence, Tuple
+
+from inky.inky_uc8159 import Inky as Inky7Color
+
+from portrayt.configuration import RendererParams
+
+from .inky_renderer import _InkyRenderer
+
+SPI_SPEED_HZ = 3_000_000
+"""The SPI clock speed the inky library configures for UC8159 panels"""
+
+REFRESH_SECONDS = 30.0
+"""Roughly how long a UC8159 panel takes to redraw, after its framebuffer has been sent"""
+
+
+class PanelRefresh(NamedTuple):
+    started_at: float
+    """When the refresh started, from time.monotonic"""
+    transfer_bytes: int
+    transfer_seconds: float
+    """How long sending the framebuffer over SPI would have taken"""
+    refresh_seconds: float
+    """How long the panel would have taken to redraw"""
+
+    @property
+    def total_seconds(self) -> float:
+        return self.transfer_seconds + self.refresh_seconds
+
+
+class NullPanel(Inky7Color):
+    """A UC8159 display driver that runs everything the inky library does to show an image, such
+    as flipping and packing the framebuffer, but stops short of the SPI transfer. Each refresh is
+    recorded, along with how long the real panel would have taken."""
+
+    def __init__(
+        self,
+        resolution: Tuple[int, int],
+        refresh_seconds: float = REFRESH_SECONDS,
+        time_scale: float = 0,
+    ) -> None:
+        """
+        :param resolution: The resolution of the panel being simulated
+        :param refresh_seconds: How long the simulated panel takes to redraw
+        :param time_scale: How much of the simulated time to actually wait for. With 0, refreshes
+            return immediately. With 1, they take as long as they would on a real panel.
+        """
+        super().__init__(resolution=resolution)
+        self.refresh_seconds = refresh_seconds
+        self.time_scale = time_scale
+        self._lock = Lock()
+        self._refreshes: List[PanelRefresh] = []
+
+    @property
+    def refreshes(self) -> List[PanelRefresh]:
+        with self._lock:
+            return list(self._refreshes)
+
+    def setup(self) -> None:
+        """There's no hardware to set up"""
+
+    def _update(self, buf: Sequence[int]) -> None:
+        refresh = PanelRefresh(
+            started_at=time.monotonic(),
+            transfer_bytes=len(buf),
+            transfer_seconds=len(buf) * 8 / SPI_SPEED_HZ,
+            refresh_seconds=self.refresh_seconds,
+        )
+        with self._lock:
+            self._refreshes.append(refresh)
+        if self.time_scale > 0:
+            time.sleep(refresh.total_seconds * self.time_scale)
+
+
+class NullPanelRenderer(_InkyRenderer):
+    """Renders exactly like an Inky renderer, but to a NullPanel, so that rendering can be run
+    and profiled without the hardware"""
+
+    resolution = (600, 448)
+
+    def __init__(
+        self,
+        images_dir: Path,
+        params: RendererParams,
+        resolution: Tuple[int, int] = (600, 448),
+        time_scale: float = 0,
+    ) -> None:
+        """
+        :param resolution: The resolution of the panel to simulate
+        :param time_scale: How much of a real refresh's duration to wait for, between 0 and 1
+        """
+        self.resolution = resolution
+        self._time_scale = time_scale
+        super().__init__(images_dir, params)
+        logging.info("Rendering to a simulated panel, since no display is attached")
+
+    @property
+    def panel(self) -> NullPanel:
+        return self._panel
+
+    def _create_display(self) -> NullPanel:
+        self._panel = NullPanel(self.resolution, time_scale=self._time_scale)
+        return self._panel
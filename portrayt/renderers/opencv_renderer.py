@@ -1,5 +1,9 @@
 from pathlib import Path
+from typing import Any
 
+import numpy as np
+
+from portrayt.library import FRAME_SUFFIX, open_image
 from portrayt.renderers import BaseRenderer
 
 try:
@@ -8,14 +12,19 @@ except ImportError:
     pass
 
 
-class OpenCVRenderer(BaseRenderer):
-    def _render(self, image_path: Path) -> None:
-        image_bgr = cv2.imread(str(image_path))
+class OpenCVRenderer(BaseRenderer[Any]):
+    def _prepare(self, image_path: Path) -> Any:
+        if image_path.suffix == FRAME_SUFFIX:
+            # Frames in a sequence don't have a file of their own for OpenCV to read
+            with open_image(image_path) as image:
+                return cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+        return cv2.imread(str(image_path))
 
+    def _render(self, frame: Any) -> None:
         # For some godawful reason, if this isn't called each render then gnome freezes up...
         # Since this renderer is entirely for testing purposes, it'll do.
         cv2.destroyAllWindows()
 
         # Render the image
-        cv2.imshow("Portrayt", image_bgr)
+        cv2.imshow("Portrayt", frame)
         cv2.waitKey(500)
@@ -0,0 +1,64 @@
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, Generic, Sequence, TypeVar
+
+FRAME = TypeVar("FRAME")
+
+
+class FramePrefetcher(Generic[FRAME]):
+    """Prepares upcoming frames on a background thread, so that they're ready to be shown as
+    soon as they're needed."""
+
+    def __init__(self, prepare: Callable[[Path], FRAME], max_frames: int) -> None:
+        """
+        :param prepare: The function that turns an image path into a frame
+        :param max_frames: The most frames to hold in memory at once
+        """
+        self._prepare = prepare
+        self._max_frames = max_frames
+
+        self._lock = Lock()
+        self._frames: Dict[Path, "Future[FRAME]"] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+
+    def prefetch(self, image_paths: Sequence[Path]) -> None:
+        """Start preparing the given images, in order, and drop any other prepared frames
+
+        :param image_paths: The images that will be shown next. Only the first 'max_frames' are
+            prepared.
+        """
+        wanted = list(dict.fromkeys(image_paths))[: self._max_frames]
+        with self._lock:
+            for image_path in list(self._frames):
+                if image_path not in wanted:
+                    self._frames.pop(image_path).cancel()
+
+            for image_path in wanted:
+                if image_path not in self._frames:
+                    self._frames[image_path] = self._executor.submit(self._prepare, image_path)
+
+    def get(self, image_path: Path) -> FRAME:
+        """Return the frame for an image, waiting for it if it's still being prepared, or
+        preparing it now if it was never prefetched"""
+        with self._lock:
+            future = self._frames.pop(image_path, None)
+
+        if future is not None and not future.cancelled():
+            try:
+                return future.result()
+            except Exception:
+                logging.exception(f"Failed to prefetch {image_path}, retrying")
+        return self._prepare(image_path)
+
+    def clear(self) -> None:
+        """Drop all prepared frames, for when the upcoming images have changed"""
+        with self._lock:
+            for future in self._frames.values():
+                future.cancel()
+            self._frames.clear()
+
+    def close(self) -> None:
+        self.clear()
+        self._executor.shutdown(wait=True)
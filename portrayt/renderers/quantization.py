@@ -0,0 +1,104 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+from PIL import Image
+
+from portrayt.configuration import DitherMode
+
+RGB = Tuple[int, int, int]
+
+_BAYER_8X8 = np.array(
+    [
+        [0, 32, 8, 40, 2, 34, 10, 42],
+        [48, 16, 56, 24, 50, 18, 58, 26],
+        [12, 44, 4, 36, 14, 46, 6, 38],
+        [60, 28, 52, 20, 62, 30, 54, 22],
+        [3, 35, 11, 43, 1, 33, 9, 41],
+        [51, 19, 59, 27, 49, 17, 57, 25],
+        [15, 47, 7, 39, 13, 45, 5, 37],
+        [63, 31, 55, 23, 61, 29, 53, 21],
+    ],
+    dtype=np.float32,
+)
+"""The 8x8 Bayer threshold matrix, with values from 0 to 63"""
+
+
+class PaletteQuantizer:
+    """Converts RGB images to arrays of palette indices, for displays with a small, fixed palette.
+
+    Nearest-colour lookups go through a precomputed 3D lookup table, so mapping an image is a
+    single vectorized indexing operation instead of a distance calculation per pixel.
+    """
+
+    LUT_BITS = 6
+    """How many of the most significant bits of each channel index into the lookup table"""
+
+    ORDERED_DITHER_SPREAD = 64
+    """How far, in 0-255 channel units, the ordered dither may move a pixel's colour"""
+
+    def __init__(self, palette: Sequence[RGB], dither_mode: DitherMode) -> None:
+        """
+        :param palette: The RGB colours of the display. Indices into this are the output.
+        :param dither_mode: How to dither images while quantizing them
+        """
+        self.palette = np.array(palette, dtype=np.uint8)
+        self.dither_mode = dither_mode
+        self._lut = self._build_lut(self.palette)
+
+    def quantize(self, image: Image.Image) -> "npt.NDArray[np.uint8]":
+        """Quantize an image to the palette
+
+        :param image: The image to quantize. It will be converted to RGB if necessary.
+        :return: A (height, width) array of palette indices
+        """
+        image = image.convert("RGB") if image.mode != "RGB" else image
+
+        if self.dither_mode is DitherMode.ERROR_DIFFUSION:
+            # Error diffusion is sequential by nature, so use Pillow's implementation in C
+            quantized = image.quantize(palette=self.palette_image, dither=Image.FLOYDSTEINBERG)
+            return np.asarray(quantized, dtype=np.uint8)
+
+        pixels = np.asarray(image)
+        if self.dither_mode is DitherMode.ORDERED:
+            pixels = self._apply_ordered_dither(pixels)
+        return self._lookup(pixels)
+
+    @property
+    def palette_image(self) -> Image.Image:
+        """A 'P' mode image holding the palette, for use with Pillow's quantization"""
+        palette_image = Image.new("P", (1, 1))
+        flat_palette = self.palette.flatten().tolist()
+        palette_image.putpalette(flat_palette + [0, 0, 0] * (256 - len(self.palette)))
+        return palette_image
+
+    def _lookup(self, pixels: "npt.NDArray[np.uint8]") -> "npt.NDArray[np.uint8]":
+        shift = 8 - self.LUT_BITS
+        indices: "npt.NDArray[np.uint8]" = self._lut[
+            pixels[..., 0] >> shift, pixels[..., 1] >> shift, pixels[..., 2] >> shift
+        ]
+        return indices
+
+    def _apply_ordered_dither(self, pixels: "npt.NDArray[np.uint8]") -> "npt.NDArray[np.uint8]":
+        height, width = pixels.shape[:2]
+        thresholds = (_BAYER_8X8 + 0.5) / 64 - 0.5
+        offsets = np.tile(thresholds, (height // 8 + 1, width // 8 + 1))[:height, :width]
+
+        dithered = pixels + (offsets * self.ORDERED_DITHER_SPREAD)[..., np.newaxis]
+        return np.clip(dithered, 0, 255).astype(np.uint8)
+
+    @classmethod
+    def _build_lut(cls, palette: "npt.NDArray[np.uint8]") -> "npt.NDArray[np.uint8]":
+        """Build a table mapping each quantized RGB colour to its nearest palette index"""
+        levels = 1 << cls.LUT_BITS
+        step = 256 // levels
+
+        # The colour at the center of each cell of the table
+        centers = np.arange(levels, dtype=np.float32) * step + (step - 1) / 2
+        grid = np.stack(np.meshgrid(centers, centers, centers, indexing="ij"), axis=-1)
+
+        distances = np.zeros((levels, levels, levels, len(palette)), dtype=np.float32)
+        for palette_idx, colour in enumerate(palette.astype(np.float32)):
+            distances[..., palette_idx] = np.sum((grid - colour) ** 2, axis=-1)
+        lut: "npt.NDArray[np.uint8]" = np.argmin(distances, axis=-1).astype(np.uint8)
+        return lut
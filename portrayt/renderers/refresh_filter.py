@@ -0,0 +1,79 @@
+import hashlib
+from typing import NamedTuple, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+
+class RefreshStats(NamedTuple):
+    refreshed: int
+    """How many frames were pushed to the display"""
+    skipped_identical: int
+    """How many frames were skipped because they matched what was already on the display"""
+    skipped_similar: int
+    """How many frames were skipped because too few pixels differed from the display"""
+
+
+class RefreshFilter:
+    """Decides whether a framebuffer is different enough from what's on the display to be worth
+    a refresh, for displays where refreshing is slow or disruptive.
+
+    Frames are compared against the last frame that was actually pushed, not the last one that
+    was skipped, so small changes accumulate until they're large enough to be shown.
+    """
+
+    def __init__(self, threshold: float) -> None:
+        """
+        :param threshold: The fraction of pixels that must differ from the display for a frame to
+            be shown. At 0, only frames identical to the display are skipped.
+        """
+        self.threshold = threshold
+
+        self._digest: Optional[bytes] = None
+        """A digest of the framebuffer on the display, for cheaply detecting identical frames"""
+        self._framebuffer: Optional["npt.NDArray[np.uint8]"] = None
+        """The framebuffer on the display, only kept if it's needed for a pixel comparison"""
+
+        self._refreshed = 0
+        self._skipped_identical = 0
+        self._skipped_similar = 0
+
+    @property
+    def stats(self) -> RefreshStats:
+        return RefreshStats(self._refreshed, self._skipped_identical, self._skipped_similar)
+
+    def should_refresh(self, framebuffer: "npt.NDArray[np.uint8]") -> bool:
+        """Check if a framebuffer should be pushed to the display. Skipped frames are counted.
+
+        :param framebuffer: The frame that is about to be shown
+        :return: True if the display should be refreshed, in which case 'record_refresh' should
+            be called once it has been.
+        """
+        if self._digest is None:
+            return True
+
+        if self._compute_digest(framebuffer) == self._digest:
+            self._skipped_identical += 1
+            return False
+
+        if self.threshold > 0 and self._framebuffer is not None:
+            changed = np.count_nonzero(framebuffer != self._framebuffer)
+            if changed / framebuffer.size <= self.threshold:
+                self._skipped_similar += 1
+                return False
+        return True
+
+    def record_refresh(self, framebuffer: "npt.NDArray[np.uint8]") -> None:
+        """Record that a framebuffer is now on the display"""
+        self._digest = self._compute_digest(framebuffer)
+        self._framebuffer = np.array(framebuffer, copy=True) if self.threshold > 0 else None
+        self._refreshed += 1
+
+    def reset(self) -> None:
+        """Forget what's on the display, so the next frame is always shown"""
+        self._digest = None
+        self._framebuffer = None
+
+    @staticmethod
+    def _compute_digest(framebuffer: "npt.NDArray[np.uint8]") -> bytes:
+        return hashlib.blake2b(framebuffer.tobytes(), digest_size=16).digest()
@@ -0,0 +1,34 @@
+from concurrent.futures import Future
+from enum import Enum
+from pathlib import Path
+from typing import Optional
+
+
+class CommandType(Enum):
+    NEXT = "next"
+    TOGGLE_SHUFFLE = "toggle_shuffle"
+    DELETE_CURRENT_IMAGE = "delete_current_image"
+    UPDATE_IMAGE_DIR = "update_image_dir"
+    CLOSE = "close"
+
+
+class RendererClosed(Exception):
+    """Raised for commands that are sent to a renderer after it has been closed"""
+
+
+class RenderCommand:
+    """A request for the renderer's control thread to change what is being displayed. The
+    future is resolved once the command has been applied and the new current image is known,
+    which may be before the display has finished showing it."""
+
+    def __init__(self, command_type: CommandType, images_dir: Optional[Path] = None) -> None:
+        """
+        :param command_type: What the command should do
+        :param images_dir: The new images directory, for UPDATE_IMAGE_DIR commands
+        """
+        self.command_type = command_type
+        self.images_dir = images_dir
+        self.future: "Future[None]" = Future()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.command_type}, images_dir={self.images_dir})"
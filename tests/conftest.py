@@ -0,0 +1,11 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Generator
+
+import pytest
+
+
+@pytest.fixture
+def temp_dir() -> Generator[Path, None, None]:
+    with TemporaryDirectory() as temp_dir:
+        yield Path(temp_dir)
@@ -0,0 +1,350 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from time import monotonic, sleep
+from types import TracebackType
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+import numpy as np
+from PIL import Image
+
+from portrayt.generators import PredictionBackend, ReplicateClient
+
+
+def fake_image_outputs(inputs: Dict[str, Any]) -> List[Any]:
+    """Make up a url for each image a stable diffusion prediction would return"""
+    return [f"https://fake/{inputs['seed']}/{i}.png" for i in range(inputs.get("num_outputs", 1))]
+
+
+class FakePredictionBackend(PredictionBackend):
+    """Runs predictions in memory, while tracking how many run at once"""
+
+    def __init__(
+        self,
+        outputs: Callable[[Dict[str, Any]], List[Any]] = fake_image_outputs,
+        delay: float = 0,
+    ) -> None:
+        """
+        :param outputs: Returns the outputs for a prediction's inputs
+        :param delay: How long each prediction takes, in seconds
+        """
+        self._outputs = outputs
+        self._delay = delay
+        self._lock = threading.Lock()
+
+        self.created: Dict[str, Dict[str, Any]] = {}
+        """The inputs of each prediction that was created, by prediction ID"""
+        self.running = 0
+        self.max_running = 0
+
+    @property
+    def seeds(self) -> List[int]:
+        return sorted(inputs["seed"] for inputs in self.created.values())
+
+    def latest_version(self, model: str) -> str:
+        return "fake-version"
+
+    def create(self, model: str, version: str, inputs: Dict[str, Any]) -> str:
+        with self._lock:
+            prediction_id = f"prediction-{len(self.created)}"
+            self.created[prediction_id] = inputs
+        return prediction_id
+
+    def wait(self, prediction_id: str) -> List[Any]:
+        with self._lock:
+            inputs: Optional[Dict[str, Any]] = self.created.get(prediction_id)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        sleep(self._delay)
+        with self._lock:
+            self.running -= 1
+
+        if inputs is None:
+            raise KeyError(f"Unknown prediction {prediction_id}")
+        return self._outputs(inputs)
+
+
+class FakeReplicateServer(ThreadingHTTPServer):
+    """Serves the parts of the Replicate API that the backend uses, along with the images that
+    predictions output, so generators can run end to end without the real API.
+
+    It can be told to throttle requests, fail predictions, and slow everything down. Predictions
+    finish after they've been polled a few times, and once 'prediction_seconds' have passed.
+    Use it as a context manager to serve requests in a background thread.
+    """
+
+    def __init__(
+        self,
+        outputs: Optional[Callable[[Dict[str, Any]], List[Any]]] = None,
+        polls_until_done: int = 2,
+        prediction_seconds: float = 0,
+        response_latency: float = 0,
+        output_size: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        """
+        :param outputs: Returns the outputs for a prediction's inputs. By default, predictions
+            output urls of images served by this server, like the real models do.
+        :param polls_until_done: How many times a prediction is polled before it finishes
+        :param prediction_seconds: How long a prediction takes to finish, at least
+        :param response_latency: How long to wait before every response, in seconds
+        :param output_size: The width and height of output images, instead of the requested size
+        """
+        super().__init__(("127.0.0.1", 0), FakeReplicateHandler)
+        self.outputs = outputs
+        self.polls_until_done = polls_until_done
+        self.prediction_seconds = prediction_seconds
+        self.response_latency = response_latency
+        self.output_size = output_size
+        self.lock = threading.Lock()
+
+        self.throttle_responses = 0
+        """How many of the next API requests should be rejected with a 429"""
+        self.retry_after: Optional[str] = "0"
+        self.fail_predictions = 0
+        """How many of the next predictions should fail"""
+        self.file_error_responses: List[int] = []
+        """Status codes to respond to file requests with, before responding normally"""
+
+        self.requests: List[Tuple[str, str]] = []
+        """The method and path of every API request, including throttled ones"""
+        self.predictions: Dict[str, Dict[str, Any]] = {}
+        self.polls: Dict[str, int] = {}
+        self.running = 0
+        self.max_running = 0
+        self.bytes_sent = 0
+        """How many bytes of response bodies have been sent"""
+
+        self._created_at: Dict[str, float] = {}
+        self._files: Dict[Tuple[int, int, int, int], bytes] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def client(self, **kwargs: Any) -> ReplicateClient:
+        """Create a client that sends requests to this server
+
+        :param kwargs: Passed on to the client
+        """
+        client = ReplicateClient(api_token="fake-token", **kwargs)
+        client.base_url = self.url
+        return client
+
+    def __enter__(self) -> "FakeReplicateServer":
+        self._thread = threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        _exc_value: Optional[BaseException],
+        _traceback: Optional[TracebackType],
+    ) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def hosted_outputs(self, prediction_id: str, model: str, inputs: Dict[str, Any]) -> List[str]:
+        """The urls of the images a prediction outputs, which are served by this server"""
+        if "animation" in model:
+            return [f"{self.url}/files/{prediction_id}.gif"]
+        return [
+            f"{self.url}/files/{prediction_id}-{i}.png" for i in range(inputs.get("num_outputs", 1))
+        ]
+
+    def render_file(self, filename: str) -> Optional[bytes]:
+        """Render an output image. Identical images are only rendered once, so a benchmark's
+        timing isn't dominated by the fake server."""
+        match = re.fullmatch(r"(prediction-\d+)(?:-(\d+))?\.(png|gif)", filename)
+        if match is None or match.group(1) not in self.predictions:
+            return None
+
+        inputs = self.predictions[match.group(1)]["input"]
+        width, height = self.output_size or (inputs["width"], inputs["height"])
+        seed = inputs["seed"] * 10 + int(match.group(2) or 0)
+        num_frames = inputs["num_animation_frames"] if match.group(3) == "gif" else 0
+        key = (width, height, seed, num_frames)
+
+        with self.lock:
+            data = self._files.get(key)
+        if data is None:
+            if num_frames:
+                data = make_fake_animation(width, height, num_frames, seed)
+            else:
+                data = make_fake_image(width, height, seed)
+            with self.lock:
+                self._files[key] = data
+        return data
+
+
+class FakeReplicateHandler(BaseHTTPRequestHandler):
+    server: FakeReplicateServer
+
+    def do_GET(self) -> None:  # noqa: N802
+        sleep(self.server.response_latency)
+        if self.path.startswith("/files/"):
+            self._serve_file(self.path[len("/files/") :])
+            return
+        if self._throttled():
+            return
+
+        match = re.fullmatch(r"/v1/models/([^/]+/[^/]+)/versions", self.path)
+        if match is not None:
+            self._respond(200, {"results": [_fake_version(match.group(1))]})
+            return
+        match = re.fullmatch(r"/v1/predictions/([^/]+)", self.path)
+        if match is None or match.group(1) not in self.server.predictions:
+            self._respond(404, {"detail": "Not found"})
+            return
+
+        prediction_id = match.group(1)
+        with self.server.lock:
+            prediction = self.server.predictions[prediction_id]
+            self.server.polls[prediction_id] += 1
+            if (
+                prediction["status"] == "processing"
+                and self.server.polls[prediction_id] >= self.server.polls_until_done
+                and monotonic() - self.server._created_at[prediction_id]
+                >= self.server.prediction_seconds
+            ):
+                self._finish(prediction)
+            response = dict(prediction)
+        self._respond(200, response)
+
+    def do_POST(self) -> None:  # noqa: N802
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        sleep(self.server.response_latency)
+        if self._throttled():
+            return
+        if self.path != "/v1/predictions":
+            self._respond(404, {"detail": "Not found"})
+            return
+
+        with self.server.lock:
+            prediction_id = f"prediction-{len(self.server.predictions)}"
+            prediction = {
+                "id": prediction_id,
+                "status": "processing",
+                "input": body["input"],
+                "output": None,
+                "error": None,
+                "logs": None,
+                "version": body["version"],
+                "failed": self.server.fail_predictions > 0,
+            }
+            self.server.fail_predictions = max(0, self.server.fail_predictions - 1)
+            self.server.predictions[prediction_id] = prediction
+            self.server.polls[prediction_id] = 0
+            self.server._created_at[prediction_id] = monotonic()
+            self.server.running += 1
+            self.server.max_running = max(self.server.max_running, self.server.running)
+        self._respond(201, prediction)
+
+    def _finish(self, prediction: Dict[str, Any]) -> None:
+        self.server.running -= 1
+        if prediction["failed"]:
+            prediction["status"] = "failed"
+            prediction["error"] = "The fake server was told to fail this prediction"
+            return
+
+        prediction["status"] = "succeeded"
+        if self.server.outputs is not None:
+            prediction["output"] = self.server.outputs(prediction["input"])
+        else:
+            model = prediction["version"].split(":")[0]
+            prediction["output"] = self.server.hosted_outputs(
+                prediction["id"], model, prediction["input"]
+            )
+
+    def _serve_file(self, filename: str) -> None:
+        with self.server.lock:
+            status = (
+                self.server.file_error_responses.pop(0) if self.server.file_error_responses else 0
+            )
+        if status:
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        data = self.server.render_file(filename)
+        if data is None:
+            self._respond(404, {"detail": "Not found"})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/gif" if filename.endswith(".gif") else "image/png")
+        self._send_body(data)
+
+    def _throttled(self) -> bool:
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path))
+            if not self.server.throttle_responses:
+                return False
+            self.server.throttle_responses -= 1
+
+        self.send_response(429)
+        if self.server.retry_after is not None:
+            self.send_header("Retry-After", self.server.retry_after)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        return True
+
+    def _respond(self, status: int, body: Any) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self._send_body(json.dumps(body).encode())
+
+    def _send_body(self, data: bytes) -> None:
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        with self.server.lock:
+            self.server.bytes_sent += len(data)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+def _fake_version(model: str) -> Dict[str, Any]:
+    return {
+        "id": f"{model}:fake-version",
+        "created_at": "2022-10-01T00:00:00Z",
+        "cog_version": "0.4.0",
+        "openapi_schema": {},
+    }
+
+
+def make_fake_image(width: int, height: int, seed: int) -> bytes:
+    """A PNG with smooth gradients and some noise, which compresses about as well as a photo"""
+    return _encode(_fake_pixels(width, height, np.random.default_rng(seed)), "PNG")
+
+
+def make_fake_animation(width: int, height: int, num_frames: int, seed: int) -> bytes:
+    """A GIF of frames that change a little at a time, like an interpolation animation"""
+    rng = np.random.default_rng(seed)
+    frames = [
+        Image.fromarray(_fake_pixels(width, height, rng)).quantize() for _ in range(num_frames)
+    ]
+    buffer = BytesIO()
+    frames[0].save(buffer, format="GIF", save_all=True, append_images=frames[1:], duration=1000)
+    return buffer.getvalue()
+
+
+def _fake_pixels(width: int, height: int, rng: np.random.Generator) -> np.ndarray:
+    x = np.linspace(0, 200, width, dtype=np.float32)
+    y = np.linspace(0, 200, height, dtype=np.float32)[:, np.newaxis]
+    offset = rng.uniform(0, 55, size=3).astype(np.float32)
+    gradient = np.stack([x + y * 0, y + x * 0, (x + y) / 2], axis=-1) + offset
+    noise = rng.integers(0, 16, size=(height, width, 3), dtype=np.uint8)
+    return (gradient.astype(np.uint8) + noise).astype(np.uint8)
+
+
+def _encode(pixels: np.ndarray, format: str) -> bytes:
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, format=format)
+    return buffer.getvalue()
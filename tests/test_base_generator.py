@@ -1,11 +1,11 @@
 from pathlib import Path
-from tempfile import TemporaryDirectory
-from typing import Generator
+from typing import List
 
 import pytest
 from pydantic import BaseModel
 
-from portrayt.generators import BaseGenerator
+from portrayt.generators import BaseGenerator, base_generator
+from portrayt.library import ImageCatalog
 
 
 class ExampleParams(BaseModel):
@@ -23,12 +23,6 @@ class ExampleGenerator(BaseGenerator[ExampleParams]):
             image_path.write_text("Fake data")
 
 
-@pytest.fixture
-def temp_dir() -> Generator[Path, None, None]:
-    with TemporaryDirectory() as temp_dir:
-        yield Path(temp_dir)
-
-
 def test_generate(temp_dir: Path) -> None:
     generator = ExampleGenerator(
         params=ExampleParams(), height=1, width=2, seed=3, cache_dir=Path(temp_dir)
@@ -47,3 +41,90 @@ def test_generate(temp_dir: Path) -> None:
     generator.generate(clear_previous=True)
     assert len(list(expected_image_dir.glob("*.png"))) == ExampleGenerator.N_PER_GENERATION
     assert generator.next_idx == ExampleGenerator.N_PER_GENERATION
+
+
+def test_post_processors(temp_dir: Path) -> None:
+    processed: List[str] = []
+    generator = ExampleGenerator(
+        params=ExampleParams(),
+        height=1,
+        width=2,
+        seed=3,
+        cache_dir=Path(temp_dir),
+        post_processors=[lambda path: processed.append(path.name)],
+    )
+
+    generator.generate(clear_previous=False)
+    generator.generate(clear_previous=False)
+    assert sorted(processed) == [f"{i}.png" for i in range(ExampleGenerator.N_PER_GENERATION * 2)]
+
+
+def test_staged_results_are_published_atomically(temp_dir: Path) -> None:
+    generator = ExampleGenerator(
+        params=ExampleParams(), height=1, width=2, seed=3, cache_dir=Path(temp_dir)
+    )
+
+    # Directories from older versions are real directories, and are replaced by a symlink
+    generator.generate(clear_previous=False)
+    assert not generator.images_dir.is_symlink()
+    generator.generate(clear_previous=True)
+    assert generator.images_dir.is_symlink()
+    first_version = generator.images_dir.resolve()
+
+    # Clearing swaps the symlink to a new directory, and deletes the old one
+    generator.generate(clear_previous=True)
+    assert generator.images_dir.resolve() != first_version
+    assert not first_version.exists()
+    assert generator.catalog.indices() == list(range(ExampleGenerator.N_PER_GENERATION))
+
+    # Nothing but the images directory and its current version should be left behind
+    assert sorted(p.name for p in temp_dir.iterdir()) == sorted(
+        [generator.images_dir.name, generator.images_dir.resolve().name]
+    )
+
+
+def test_images_dir_opened_while_it_is_replaced(
+    temp_dir: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    generator = ExampleGenerator(
+        params=ExampleParams(), height=1, width=2, seed=3, cache_dir=Path(temp_dir)
+    )
+    generator.generate(clear_previous=False)
+    assert not generator.images_dir.is_symlink()
+
+    # Open the catalog in the moment between the old directory being moved away and the symlink
+    # replacing it, which recreates the directory
+    replace = base_generator.os.replace
+    opened: List[ImageCatalog] = []
+
+    def replace_after_opening(source: Path, target: Path) -> None:
+        if target == generator.images_dir and not opened:
+            opened.append(ImageCatalog(generator.images_dir))
+        replace(source, target)
+
+    monkeypatch.setattr(base_generator.os, "replace", replace_after_opening)
+    generator.generate(clear_previous=True)
+
+    assert opened
+    assert generator.images_dir.is_symlink()
+    assert opened[0].indices() == list(range(ExampleGenerator.N_PER_GENERATION))
+    assert sorted(p.name for p in temp_dir.iterdir()) == sorted(
+        [generator.images_dir.name, generator.images_dir.resolve().name]
+    )
+
+
+def test_failed_generation_leaves_images_untouched(temp_dir: Path) -> None:
+    generator = ExampleGenerator(
+        params=ExampleParams(), height=1, width=2, seed=3, cache_dir=Path(temp_dir)
+    )
+    generator.generate(clear_previous=False)
+
+    def fail(path: Path) -> None:
+        raise RuntimeError("Post processing failed")
+
+    generator._post_processors = [fail]
+    with pytest.raises(RuntimeError):
+        generator.generate(clear_previous=True)
+
+    assert generator.catalog.indices() == list(range(ExampleGenerator.N_PER_GENERATION))
+    assert sorted(p.name for p in temp_dir.iterdir()) == [generator.images_dir.name]
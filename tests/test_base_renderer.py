@@ -0,0 +1,210 @@
+import json
+import time
+from concurrent.futures import TimeoutError
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from typing import Iterator, List
+
+import pytest
+
+from portrayt.configuration import RendererParams
+from portrayt.library import CatalogEntry, FrameSequenceWriter, ImageCatalog
+from portrayt.renderers.base_renderer import BaseRenderer
+from portrayt.renderers.render_commands import RendererClosed
+
+
+@pytest.fixture()
+def images_dir() -> Iterator[Path]:
+    with TemporaryDirectory() as temp_dir:
+        images_dir = Path(temp_dir)
+        for idx in range(5):
+            (images_dir / f"{idx}.png").write_bytes(b"")
+        yield images_dir
+
+
+class FakeRenderer(BaseRenderer[str]):
+    def __init__(self, images_dir: Path, params: RendererParams) -> None:
+        self.shown: List[str] = []
+        self.rendering = Event()
+        self.release = Event()
+        self.release.set()
+        super().__init__(images_dir, params)
+
+    def _prepare(self, image_path: Path) -> str:
+        return image_path.name
+
+    def _render(self, frame: str) -> None:
+        self.rendering.set()
+        self.release.wait(timeout=5)
+        self.shown.append(frame)
+
+
+def _params() -> RendererParams:
+    return RendererParams(seconds_between_images=1000, shuffle=False, prefetch_frames=1)
+
+
+def _wait_for_renders(renderer: FakeRenderer, count: int) -> None:
+    deadline = time.monotonic() + 5
+    while len(renderer.shown) < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_commands_are_acknowledged(images_dir: Path) -> None:
+    renderer = FakeRenderer(images_dir, _params())
+    try:
+        _wait_for_renders(renderer, 1)
+        assert renderer.current_image == images_dir / "0.png"
+
+        # Blocking commands return once the new current image is known
+        renderer.next()
+        assert renderer.current_image == images_dir / "1.png"
+
+        renderer.delete_current_image()
+        assert not (images_dir / "1.png").exists()
+        assert renderer.current_image == images_dir / "2.png"
+
+        renderer.toggle_shuffle()
+        assert renderer._params.shuffle
+    finally:
+        renderer.close()
+
+
+def test_non_blocking_commands_return_futures(images_dir: Path) -> None:
+    renderer = FakeRenderer(images_dir, _params())
+    try:
+        _wait_for_renders(renderer, 1)
+
+        # Acknowledgements don't wait for the display to finish showing the image
+        renderer.release.clear()
+        renderer.next(timeout=5)
+        future = renderer.next(block=False)
+        future.result(timeout=5)
+        assert renderer.current_image == images_dir / "2.png"
+    finally:
+        renderer.release.set()
+        renderer.close()
+
+
+def test_blocking_commands_time_out(images_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    renderer = FakeRenderer(images_dir, _params())
+    try:
+        _wait_for_renders(renderer, 1)
+
+        # Hold up the control thread, so the command can't be applied in time
+        unblock = Event()
+        advance = renderer._advance
+        monkeypatch.setattr(renderer, "_advance", lambda: unblock.wait(timeout=5) and advance())
+        with pytest.raises(TimeoutError):
+            renderer.next(timeout=0.1)
+        unblock.set()
+    finally:
+        renderer.close()
+
+
+def test_commands_are_resolved_when_closing(
+    images_dir: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    renderer = FakeRenderer(images_dir, _params())
+    _wait_for_renders(renderer, 1)
+
+    # Hold up the control thread, so commands are still queued when the renderer is closed
+    unblock = Event()
+    advance = renderer._advance
+    monkeypatch.setattr(renderer, "_advance", lambda: unblock.wait(timeout=5) and advance())
+    applying = renderer.next(block=False)
+    queued = renderer.next(block=False)
+    closer = Thread(target=renderer.close)
+    closer.start()
+    unblock.set()
+    closer.join(timeout=5)
+    assert not closer.is_alive()
+    assert applying.result(timeout=0) is None
+    assert queued.result(timeout=0) is None
+
+    # Commands sent after closing fail straight away, rather than waiting forever
+    with pytest.raises(RendererClosed):
+        renderer.next(timeout=1)
+    assert isinstance(renderer.toggle_shuffle(block=False).exception(timeout=0), RendererClosed)
+    renderer.close()
+
+
+def test_bursts_of_commands_are_coalesced(images_dir: Path) -> None:
+    renderer = FakeRenderer(images_dir, _params())
+    try:
+        _wait_for_renders(renderer, 1)
+
+        # While the display is busy, only the latest requested image should be rendered next
+        renderer.release.clear()
+        renderer.rendering.clear()
+        renderer.next()
+        assert renderer.rendering.wait(timeout=5)
+        futures = [renderer.next(block=False) for _ in range(3)]
+        for future in futures:
+            future.result(timeout=5)
+        renderer.release.set()
+
+        _wait_for_renders(renderer, 3)
+        assert renderer.shown == ["0.png", "1.png", "4.png"]
+    finally:
+        renderer.close()
+
+
+def test_shown_images_are_counted(images_dir: Path) -> None:
+    renderer = FakeRenderer(images_dir, _params())
+    try:
+        _wait_for_renders(renderer, 1)
+        renderer.next()
+        _wait_for_renders(renderer, 2)
+    finally:
+        renderer.close()
+
+    usage = ImageCatalog(images_dir).usage()
+    assert [entry.shown_count for entry in usage] == [1, 1, 0, 0, 0]
+
+
+def test_current_prompt(images_dir: Path) -> None:
+    catalog = ImageCatalog(images_dir)
+    catalog.add(
+        [
+            CatalogEntry(idx, f"{idx}.png", None, json.dumps({"prompt": f"prompt {idx}"}), 0)
+            for idx in range(2)
+        ]
+    )
+
+    renderer = FakeRenderer(images_dir, _params())
+    try:
+        _wait_for_renders(renderer, 1)
+        assert renderer.current_prompt == {"prompt": "prompt 0"}
+        renderer.next()
+        assert renderer.current_prompt == {"prompt": "prompt 1"}
+        renderer.next()
+        assert renderer.current_prompt is None
+    finally:
+        renderer.close()
+
+
+def test_deleting_frames(images_dir: Path) -> None:
+    for path in images_dir.iterdir():
+        path.unlink()
+    with FrameSequenceWriter(images_dir / "0.frames") as writer:
+        writer.append(b"")
+        writer.append(b"")
+    (images_dir / "0.prerender-key.npy").write_bytes(b"")
+
+    renderer = FakeRenderer(images_dir, _params())
+    try:
+        _wait_for_renders(renderer, 1)
+        assert renderer.current_image == images_dir / "0.frame"
+
+        # The sequence is kept until its last frame is deleted
+        renderer.delete_current_image()
+        assert not (images_dir / "0.prerender-key.npy").exists()
+        assert (images_dir / "0.frames").is_file()
+        assert renderer.current_image == images_dir / "1.frame"
+
+        renderer.delete_current_image()
+        assert not (images_dir / "0.frames").exists()
+    finally:
+        renderer.close()
@@ -0,0 +1,79 @@
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from portrayt.renderers.crop_utils import resize_cover, resize_crop
+
+GOLDEN_DIR = Path(__file__).parent / "golden"
+"""Results of the original implementation, which resampled the whole image with LANCZOS and
+then cropped it"""
+
+CASES: Dict[str, Tuple[Tuple[int, int], Tuple[int, int]]] = {
+    "downscale": ((160, 120), (60, 45)),
+    "wide": ((192, 108), (60, 45)),
+    "tall": ((90, 160), (64, 40)),
+    "upscale": ((30, 20), (60, 45)),
+    "same_aspect": ((120, 90), (60, 45)),
+    "odd_sizes": ((121, 91), (60, 45)),
+    "exact": ((60, 45), (60, 45)),
+    "reduced": ((480, 360), (60, 45)),
+}
+"""Pairs of (source size, output size) for each golden image"""
+
+REDUCED_CASES = {"reduced"}
+"""Cases where the source is large enough to be shrunk before the final resample"""
+
+
+def make_source(size: Tuple[int, int]) -> Image.Image:
+    """A deterministic image with gradients and noise"""
+    width, height = size
+    x = np.linspace(0, 200, width)[np.newaxis, :]
+    y = np.linspace(0, 200, height)[:, np.newaxis]
+    gradient = np.stack(np.broadcast_arrays(x, y, (x + y) / 2), axis=-1)
+    noise = np.random.default_rng(1337).integers(0, 56, size=(height, width, 3))
+    return Image.fromarray((gradient + noise).astype(np.uint8))
+
+
+def load_golden(name: str) -> "np.ndarray":
+    with Image.open(GOLDEN_DIR / f"{name}.png") as golden:
+        return np.asarray(golden.convert("RGB")).astype(np.int16)
+
+
+@pytest.mark.parametrize("case", CASES.keys())
+def test_resize_cover_matches_golden(case: str) -> None:
+    source_size, size = CASES[case]
+    resized = resize_cover(make_source(source_size), size)
+    assert resized.size == size
+
+    difference = np.abs(np.asarray(resized).astype(np.int16) - load_golden(f"resize_cover_{case}"))
+    if case in REDUCED_CASES:
+        # Shrinking by an integer factor first is an approximation, but a close one
+        assert difference.max() <= 8
+        assert difference.mean() <= 1
+    else:
+        # Resampling only the cropped region can only differ from the original by rounding
+        assert difference.max() <= 1
+
+
+@pytest.mark.parametrize("case", CASES.keys())
+def test_full_resample_matches_golden(case: str) -> None:
+    source_size, size = CASES[case]
+    resized = resize_cover(make_source(source_size), size, reducing_gap=None)
+    difference = np.abs(np.asarray(resized).astype(np.int16) - load_golden(f"resize_cover_{case}"))
+    assert difference.max() <= 1
+
+
+@pytest.mark.parametrize("case", CASES.keys())
+def test_resize_crop_matches_golden(case: str) -> None:
+    source_size, size = CASES[case]
+    cropped = resize_crop(make_source(source_size), size)
+    assert np.array_equal(np.asarray(cropped), load_golden(f"resize_crop_{case}"))
+
+
+def test_exact_size_is_not_copied() -> None:
+    image = make_source((60, 45))
+    assert resize_cover(image, (60, 45)) is image
+    assert resize_crop(image, (60, 45)) is image
@@ -0,0 +1,138 @@
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Thread
+from typing import Generator, List, Optional
+
+import pytest
+
+from portrayt.generators import Downloader, DownloadError
+
+CONTENT = bytes(range(256)) * 400
+
+
+class FakeFileServer(ThreadingHTTPServer):
+    """Serves CONTENT at any path, and can be told to misbehave"""
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), FakeFileHandler)
+        self.truncate_responses = 0
+        """How many of the next responses should be cut off part way through"""
+        self.error_responses: List[int] = []
+        """Status codes to respond with, before responding normally"""
+        self.support_ranges = True
+        self.range_headers: List[Optional[str]] = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}/image.png"
+
+
+class FakeFileHandler(BaseHTTPRequestHandler):
+    server: FakeFileServer
+
+    def do_GET(self) -> None:  # noqa: N802
+        range_header = self.headers.get("Range")
+        self.server.range_headers.append(range_header)
+
+        if self.server.error_responses:
+            self.send_response(self.server.error_responses.pop(0))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start = 0
+        match = re.fullmatch(r"bytes=(\d+)-", range_header or "")
+        if match and self.server.support_ranges:
+            start = int(match.group(1))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}")
+        else:
+            self.send_response(200)
+        body = CONTENT[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        if self.server.truncate_responses:
+            self.server.truncate_responses -= 1
+            self.wfile.write(body[: len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server() -> Generator[FakeFileServer, None, None]:
+    server = FakeFileServer()
+    thread = Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def downloader() -> Generator[Downloader, None, None]:
+    downloader = Downloader(timeout=5, max_attempts=3, backoff_seconds=0)
+    yield downloader
+    downloader.close()
+
+
+def test_download(server: FakeFileServer, downloader: Downloader, temp_dir: Path) -> None:
+    path = temp_dir / "image.png"
+    downloader.download(server.url, path)
+    assert path.read_bytes() == CONTENT
+    assert list(temp_dir.iterdir()) == [path]
+
+
+@pytest.mark.parametrize("support_ranges", [True, False])
+def test_resume_interrupted_download(
+    server: FakeFileServer, downloader: Downloader, temp_dir: Path, support_ranges: bool
+) -> None:
+    server.truncate_responses = 1
+    server.support_ranges = support_ranges
+
+    path = temp_dir / "image.png"
+    downloader.download(server.url, path)
+    assert path.read_bytes() == CONTENT
+
+    # The retry should only ask for the part of the file that's missing
+    assert server.range_headers == [None, f"bytes={len(CONTENT) // 2}-"]
+
+
+def test_retry_server_errors(
+    server: FakeFileServer, downloader: Downloader, temp_dir: Path
+) -> None:
+    server.error_responses = [503, 500]
+    path = temp_dir / "image.png"
+    downloader.download(server.url, path)
+    assert path.read_bytes() == CONTENT
+    assert len(server.range_headers) == 3
+
+
+def test_give_up(server: FakeFileServer, downloader: Downloader, temp_dir: Path) -> None:
+    server.truncate_responses = 3
+    path = temp_dir / "image.png"
+    with pytest.raises(DownloadError):
+        downloader.download(server.url, path)
+
+    # Nothing should be left behind after a failed download
+    assert list(temp_dir.iterdir()) == []
+
+
+def test_client_errors_are_not_retried(
+    server: FakeFileServer, downloader: Downloader, temp_dir: Path
+) -> None:
+    server.error_responses = [404]
+    with pytest.raises(DownloadError):
+        downloader.download(server.url, temp_dir / "image.png")
+    assert len(server.range_headers) == 1
+
+
+def test_fetch_into_memory(server: FakeFileServer, downloader: Downloader) -> None:
+    server.truncate_responses = 1
+    assert downloader.fetch(server.url) == CONTENT
+    assert server.range_headers == [None, f"bytes={len(CONTENT) // 2}-"]
@@ -0,0 +1,79 @@
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+from portrayt.configuration import InterpolationMethod
+from portrayt.generators.frame_interpolation import (
+    cross_fade,
+    estimate_motion,
+    interpolate,
+    motion_compensated_blend,
+    segment_positions,
+)
+
+
+def textured_frame(height: int = 96, width: int = 128) -> "npt.NDArray[np.uint8]":
+    """A frame with detail everywhere, so every block's motion can be found"""
+    rng = np.random.default_rng(1337)
+    small = rng.integers(0, 256, size=(height // 4, width // 4, 3)).astype(np.uint8)
+    return np.repeat(np.repeat(small, 4, axis=0), 4, axis=1)
+
+
+def test_segment_positions() -> None:
+    assert segment_positions(3, 5) == [[0.0, 0.5], [0.0, 0.5], [0.0]]
+    assert segment_positions(3, 0) == [[0.0], [0.0], [0.0]]
+
+    # Frames are spaced evenly, even if that means not keeping the frames in between
+    segments = segment_positions(15, 20)
+    assert sum(len(alphas) for alphas in segments) == 20
+    assert segments[0][0] == 0 and segments[-1] == [0.0]
+
+
+def test_cross_fade() -> None:
+    start = np.zeros((2, 2, 3), dtype=np.uint8)
+    end = np.full((2, 2, 3), 200, dtype=np.uint8)
+    assert np.array_equal(cross_fade(start, end, 0), start)
+    assert np.array_equal(cross_fade(start, end, 1), end)
+    assert np.all(cross_fade(start, end, 0.5) == 100)
+    assert np.all(cross_fade(end, end, 0.3) == 200)
+
+
+def test_motion_is_found() -> None:
+    start = textured_frame()
+    end = np.roll(start, shift=(4, -6), axis=(0, 1))
+
+    # Each block in the end frame came from 4 pixels up and 6 pixels right in the start frame
+    motion = estimate_motion(start, end)
+    interior = motion[1:-1, 1:-1].reshape(-1, 2)
+    assert np.all(interior == (-4, 6))
+
+    # Still frames don't move
+    assert not np.any(estimate_motion(start, start))
+
+
+def test_motion_compensated_blend_follows_motion() -> None:
+    start = textured_frame()
+    end = np.roll(start, shift=(4, -6), axis=(0, 1))
+    halfway = np.roll(start, shift=(2, -3), axis=(0, 1))
+
+    motion = estimate_motion(start, end)
+    blended = motion_compensated_blend(start, end, 0.5, motion)
+    faded = cross_fade(start, end, 0.5)
+
+    def error(frame: "npt.NDArray[np.uint8]") -> float:
+        inside = (slice(16, -16), slice(16, -16))
+        return float(np.abs(frame[inside].astype(int) - halfway[inside]).mean())
+
+    assert error(blended) < 1
+    assert error(faded) > 10 * error(blended)
+
+
+@pytest.mark.parametrize("method", list(InterpolationMethod))
+def test_interpolate(method: InterpolationMethod) -> None:
+    start = textured_frame(height=40, width=56)
+    end = 255 - start
+    frames = interpolate(start, end, [0, 0.25, 0.5], method)
+    assert len(frames) == 3
+    assert frames[0] is start
+    for frame in frames:
+        assert frame.shape == start.shape and frame.dtype == np.uint8
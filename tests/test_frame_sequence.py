@@ -0,0 +1,153 @@
+import os
+from io import BytesIO
+from pathlib import Path
+from typing import List
+from unittest import mock
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from portrayt.library import (
+    CatalogEntry,
+    FrameSequence,
+    FrameSequenceWriter,
+    ImageCatalog,
+    find_frame,
+    open_image,
+    sequences_in,
+    stored_path,
+)
+
+
+def make_frames(num_frames: int) -> List["np.ndarray"]:
+    rng = np.random.default_rng(1337)
+    return [rng.integers(0, 256, size=(12, 16, 3), dtype=np.uint8) for _ in range(num_frames)]
+
+
+def write_sequence(path: Path, frames: List["np.ndarray"]) -> None:
+    with FrameSequenceWriter(path) as writer:
+        for pixels in frames:
+            buffer = BytesIO()
+            Image.fromarray(pixels).save(buffer, format="WEBP", lossless=True)
+            writer.append(buffer.getvalue())
+
+
+def test_frames_are_read_back(temp_dir: Path) -> None:
+    frames = make_frames(5)
+    write_sequence(temp_dir / "10.frames", frames)
+
+    sequence = FrameSequence(temp_dir / "10.frames")
+    assert len(sequence) == 5
+    assert 10 in sequence and 14 in sequence
+    assert 9 not in sequence and 15 not in sequence
+    assert [path.name for path in sequence.frame_paths()] == [f"{i}.frame" for i in range(10, 15)]
+
+    # Frames can be opened in any order, by the name they're catalogued as
+    for idx in [13, 10, 14]:
+        with open_image(temp_dir / f"{idx}.frame") as image:
+            assert np.array_equal(np.asarray(image), frames[idx - 10])
+
+    assert stored_path(temp_dir / "12.frame") == temp_dir / "10.frames"
+    assert stored_path(temp_dir / "15.frame") is None
+    with pytest.raises(FileNotFoundError):
+        open_image(temp_dir / "15.frame")
+
+
+def test_frames_are_read_without_decoding_others(temp_dir: Path) -> None:
+    frames = make_frames(8)
+    write_sequence(temp_dir / "0.frames", frames)
+    sequence = FrameSequence(temp_dir / "0.frames")
+
+    # Only the requested frame is read from the file
+    with mock.patch.object(Path, "open", autospec=True, side_effect=Path.open) as path_open:
+        data = sequence.read(5)
+    assert path_open.call_count == 1
+    assert len(data) == sequence.frame_size(5)
+
+
+def test_incomplete_sequences_are_ignored(temp_dir: Path) -> None:
+    write_sequence(temp_dir / "0.frames", make_frames(3))
+    data = (temp_dir / "0.frames").read_bytes()
+    (temp_dir / "3.frames").write_bytes(data[:-4])
+    (temp_dir / "6.frames").write_bytes(b"")
+
+    with pytest.raises(ValueError):
+        FrameSequence(temp_dir / "3.frames")
+    assert [sequence.first_idx for sequence in sequences_in(temp_dir)] == [0]
+
+
+def test_failed_writes_leave_nothing_behind(temp_dir: Path) -> None:
+    with pytest.raises(RuntimeError):
+        with FrameSequenceWriter(temp_dir / "0.frames") as writer:
+            writer.append(b"frame")
+            raise RuntimeError()
+    assert list(temp_dir.iterdir()) == []
+
+
+def test_new_sequences_are_found(temp_dir: Path) -> None:
+    write_sequence(temp_dir / "0.frames", make_frames(2))
+    assert len(sequences_in(temp_dir)) == 1
+
+    # Even if the directory's modification time didn't change
+    stat = temp_dir.stat()
+    write_sequence(temp_dir / "2.frames", make_frames(2))
+    os.utime(temp_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    found = find_frame(temp_dir / "3.frame")
+    assert found is not None
+    assert found[0].first_idx == 2 and found[1] == 1
+
+
+def test_frames_are_catalogued(temp_dir: Path) -> None:
+    Image.new("RGB", (16, 12)).save(temp_dir / "0.png")
+    write_sequence(temp_dir / "1.frames", make_frames(3))
+    write_sequence(temp_dir / "4.frames", make_frames(2))
+
+    catalog = ImageCatalog(temp_dir)
+    assert [path.name for path in catalog.paths()] == [
+        "0.png",
+        "1.frame",
+        "2.frame",
+        "3.frame",
+        "4.frame",
+        "5.frame",
+    ]
+    assert catalog.check_consistency().missing == []
+
+    # A sequence can be deleted once none of its frames are catalogued
+    for idx in [1, 2, 4]:
+        catalog.remove(idx)
+    assert catalog.unused_sequences() == []
+    catalog.remove(3)
+    assert catalog.unused_sequences() == [temp_dir / "1.frames"]
+
+    # Removed frames aren't catalogued again, while their sequence still holds them
+    assert catalog.check_consistency().untracked == []
+    assert [path.name for path in catalog.paths()] == ["0.png", "5.frame"]
+
+    # Unless a new image is given their index
+    catalog.add([CatalogEntry(4, "4.frame", None, None, 0)])
+    assert catalog.check_consistency() == ([], [])
+
+    (temp_dir / "4.frames").unlink()
+    assert catalog.check_consistency().missing == [4, 5]
+
+
+def test_new_frames_follow_removed_frames(temp_dir: Path) -> None:
+    old_frames, new_frames = make_frames(7)[:5], make_frames(7)[5:]
+    write_sequence(temp_dir / "0.frames", old_frames)
+    catalog = ImageCatalog(temp_dir)
+
+    # Removing the last frames of a sequence doesn't free their indices, since the sequence still
+    # holds them
+    catalog.remove(4)
+    catalog.remove(3)
+    assert catalog.next_idx == 5
+
+    # So new frames get indices of their own, and are read from their own sequence
+    write_sequence(temp_dir / f"{catalog.next_idx}.frames", new_frames)
+    catalog.import_existing()
+    assert [path.name for path in catalog.paths()] == [f"{idx}.frame" for idx in [0, 1, 2, 5, 6]]
+    for idx, pixels in zip([5, 6], new_frames):
+        with open_image(temp_dir / f"{idx}.frame") as image:
+            assert np.array_equal(np.asarray(image), pixels)
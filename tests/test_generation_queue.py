@@ -0,0 +1,89 @@
+from pathlib import Path
+from threading import Event
+from typing import List
+
+import pytest
+from pydantic import BaseModel
+
+from portrayt.generators import BaseGenerator, GenerationJob, GenerationQueue, JobStatus
+
+
+class ExampleParams(BaseModel):
+    prompt: str = "cool"
+
+
+class BlockingGenerator(BaseGenerator[ExampleParams]):
+    N_PER_GENERATION = 3
+    release = Event()
+
+    def _generate(self, save_dir: Path, start_idx: int) -> None:
+        for frame_id in range(self.N_PER_GENERATION):
+            self.release.wait(timeout=5)
+            image_path = save_dir / f"{start_idx + frame_id}.png"
+            image_path.write_text("Fake data")
+            self._report_progress(frame_id + 1, self.N_PER_GENERATION)
+
+
+@pytest.fixture(autouse=True)
+def block_generators() -> None:
+    BlockingGenerator.release.clear()
+
+
+def make_generator(cache_dir: Path, prompt: str = "cool") -> BlockingGenerator:
+    return BlockingGenerator(
+        params=ExampleParams(prompt=prompt), height=1, width=2, seed=3, cache_dir=cache_dir
+    )
+
+
+def test_jobs_run_in_background(temp_dir: Path) -> None:
+    finished: List[GenerationJob] = []
+    queue = GenerationQueue(num_workers=2, on_job_finished=finished.append)
+
+    job = queue.submit(make_generator(temp_dir), clear_previous=False)
+    assert not job.wait(timeout=0.1)
+    assert job.to_json()["status"] == JobStatus.RUNNING.value
+
+    BlockingGenerator.release.set()
+    assert job.wait(timeout=5)
+    assert job.status is JobStatus.SUCCEEDED
+    assert job.to_json()["progress"] == "3/3"
+    assert finished == [job]
+    assert queue.get(job.job_id) is job
+    queue.close()
+
+
+def test_duplicate_jobs_are_coalesced(temp_dir: Path) -> None:
+    queue = GenerationQueue(num_workers=2)
+
+    job_1 = queue.submit(make_generator(temp_dir), clear_previous=False)
+    job_2 = queue.submit(make_generator(temp_dir), clear_previous=False)
+    job_3 = queue.submit(make_generator(temp_dir, prompt="different"), clear_previous=False)
+    assert job_1 is job_2
+    assert job_1 is not job_3
+
+    BlockingGenerator.release.set()
+    assert job_1.wait(timeout=5) and job_3.wait(timeout=5)
+
+    # Jobs for the same images directory must not overlap
+    assert len(list(job_1.generator.images_dir.glob("*.png"))) == 6
+    queue.close()
+
+
+def test_cancel(temp_dir: Path) -> None:
+    queue = GenerationQueue(num_workers=1)
+
+    running = queue.submit(make_generator(temp_dir), clear_previous=False)
+    queued = queue.submit(make_generator(temp_dir, prompt="queued"), clear_previous=False)
+    assert queue.cancel(queued.job_id)
+    assert queue.cancel(running.job_id)
+    assert not queue.cancel("nonexistent")
+
+    BlockingGenerator.release.set()
+    assert running.wait(timeout=5) and queued.wait(timeout=5)
+    assert running.status is JobStatus.CANCELLED
+    assert queued.status is JobStatus.CANCELLED
+    assert not queue.cancel(running.job_id)
+
+    # Cancelled jobs never write to the images directory
+    assert len(list(running.generator.images_dir.glob("*.png"))) == 0
+    queue.close()
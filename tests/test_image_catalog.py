@@ -0,0 +1,157 @@
+import json
+import sqlite3
+from pathlib import Path
+
+from portrayt.library import CatalogEntry, ImageCatalog
+from portrayt.library.image_catalog import _SCHEMA
+
+
+def make_entry(idx: int) -> CatalogEntry:
+    return CatalogEntry(
+        idx=idx,
+        filename=f"{idx}.png",
+        generator="ExampleGenerator",
+        params=json.dumps({"prompt": f"prompt {idx}"}),
+        created_at=0,
+    )
+
+
+def test_ordering_and_lookup(temp_dir: Path) -> None:
+    catalog = ImageCatalog(temp_dir)
+    assert catalog.next_idx == 0
+    assert catalog.next_path(after_idx=None) is None
+
+    revision = catalog.revision
+    catalog.add([make_entry(idx) for idx in (10, 2, 3)])
+    assert catalog.revision != revision
+    assert catalog.paths() == [temp_dir / "2.png", temp_dir / "3.png", temp_dir / "10.png"]
+    assert catalog.next_idx == 11
+    assert catalog.count() == 3
+    assert catalog.paths(offset=1, limit=1) == [temp_dir / "3.png"]
+    assert catalog.paths(offset=1) == [temp_dir / "3.png", temp_dir / "10.png"]
+    assert catalog.params(3) == {"prompt": "prompt 3"}
+
+    # Iterating past the end wraps around to the start
+    assert catalog.next_path(after_idx=None) == temp_dir / "2.png"
+    assert catalog.next_path(after_idx=3) == temp_dir / "10.png"
+    assert catalog.next_path(after_idx=10) == temp_dir / "2.png"
+
+    catalog.remove(3)
+    assert catalog.get(3) is None
+    assert catalog.params(3) is None
+    assert catalog.next_path(after_idx=2) == temp_dir / "10.png"
+
+    # The catalog persists between instances
+    assert ImageCatalog(temp_dir).paths() == [temp_dir / "2.png", temp_dir / "10.png"]
+
+
+def test_imports_legacy_layout(temp_dir: Path) -> None:
+    for idx in range(3):
+        (temp_dir / f"{idx}.png").write_text("Fake data")
+        (temp_dir / f"{idx}.json").write_text(json.dumps({"prompt": f"legacy {idx}"}))
+    (temp_dir / "3.png").write_text("An image without a parameters file")
+
+    catalog = ImageCatalog(temp_dir)
+    assert len(catalog.paths()) == 4
+    assert catalog.params(1) == {"prompt": "legacy 1"}
+    assert catalog.params(3) is None
+    assert catalog.import_existing() == 0
+
+    # The parameters files aren't needed once they're in the catalog
+    assert not list(temp_dir.glob("*.json"))
+
+
+def test_consistency_check(temp_dir: Path) -> None:
+    catalog = ImageCatalog(temp_dir)
+    catalog.add([make_entry(idx) for idx in range(3)])
+    for idx in (0, 1, 5):
+        (temp_dir / f"{idx}.png").write_text("Fake data")
+
+    report = catalog.check_consistency(repair=False)
+    assert report.missing == [2]
+    assert report.untracked == [5]
+    assert len(catalog.paths()) == 3
+
+    catalog.check_consistency()
+    assert catalog.paths() == [temp_dir / f"{idx}.png" for idx in (0, 1, 5)]
+    assert catalog.check_consistency() == ([], [])
+
+
+def test_usage_tracking(temp_dir: Path) -> None:
+    catalog = ImageCatalog(temp_dir)
+    catalog.add([make_entry(idx) for idx in range(3)])
+    catalog.record_shown(1)
+    catalog.record_shown(1)
+    catalog.set_favourite(2, True)
+
+    usage = {entry.idx: entry for entry in catalog.usage()}
+    assert [usage[idx].shown_count for idx in range(3)] == [0, 2, 0]
+    assert usage[0].last_shown_at is None and usage[1].last_shown_at is not None
+    assert [usage[idx].favourite for idx in range(3)] == [False, False, True]
+
+    # Renaming an image keeps its usage, and counts as a change to the catalog
+    revision = catalog.revision
+    catalog.rename(1, "1.webp")
+    assert catalog.revision != revision
+    assert catalog.get(1) == make_entry(1)._replace(filename="1.webp")
+    assert catalog.usage()[1].shown_count == 2
+
+
+def count_runs(catalog_dir: Path) -> int:
+    connection = sqlite3.connect(catalog_dir / ImageCatalog.FILENAME)
+    try:
+        return int(connection.execute("SELECT COUNT(*) FROM runs").fetchone()[0])
+    finally:
+        connection.close()
+
+
+def test_migrates_existing_catalogs(temp_dir: Path) -> None:
+    # Create a catalog with the original schema, where each image has a copy of its parameters
+    entries = [make_entry(idx)._replace(params=make_entry(idx // 2).params) for idx in range(4)]
+    connection = sqlite3.connect(temp_dir / ImageCatalog.FILENAME)
+    connection.executescript(_SCHEMA.format(initial_revision=0))
+    connection.executemany("INSERT INTO images VALUES (?, ?, ?, ?, ?)", entries)
+    connection.commit()
+    connection.close()
+
+    catalog = ImageCatalog(temp_dir)
+    assert [catalog.get(idx) for idx in range(4)] == entries
+    assert catalog.params(3) == {"prompt": "prompt 1"}
+    assert count_runs(temp_dir) == 2
+
+    assert catalog.usage()[0].shown_count == 0
+    catalog.set_favourite(0, True)
+    assert ImageCatalog(temp_dir).usage()[0].favourite
+
+
+def test_parameters_are_stored_once_per_run(temp_dir: Path) -> None:
+    catalog = ImageCatalog(temp_dir)
+    params = json.dumps({"prompt": "an animation"})
+    catalog.add([make_entry(idx)._replace(params=params) for idx in range(60)])
+    catalog.add([make_entry(60), make_entry(61)._replace(params=None)])
+    assert count_runs(temp_dir) == 2
+
+    assert catalog.get(59) == make_entry(59)._replace(params=params)
+    assert catalog.params(61) is None
+
+    # Parsed parameters are cached, but callers get their own copy
+    first = catalog.params(0)
+    assert first == catalog.params(59) == {"prompt": "an animation"}
+    assert first is not catalog.params(0)
+
+    # Runs are deleted along with their last image
+    catalog.remove(60)
+    assert count_runs(temp_dir) == 1
+    for idx in range(60):
+        catalog.remove(idx)
+    assert count_runs(temp_dir) == 0
+
+
+def test_webp_images_are_catalogued(temp_dir: Path) -> None:
+    (temp_dir / "0.png").write_text("Fake data")
+    (temp_dir / "1.webp").write_text("Fake data")
+    (temp_dir / "notes.webp").write_text("Not a generated image")
+
+    catalog = ImageCatalog(temp_dir)
+    assert catalog.paths() == [temp_dir / "0.png", temp_dir / "1.webp"]
+    assert catalog.check_consistency() == ([], [])
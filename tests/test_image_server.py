@@ -0,0 +1,97 @@
+import json
+import os
+from pathlib import Path
+
+from portrayt.interface.image_server import (
+    FULL_SIZE,
+    current_image_html,
+    file_validators,
+    gallery_page,
+    is_not_modified,
+    media_type,
+    serve_image,
+)
+from portrayt.library import THUMBNAIL, CatalogEntry, ImageCatalog, thumbnail_path
+from tests.fakes import make_fake_image
+
+
+def add_images(images_dir: Path, num_images: int) -> None:
+    entries = []
+    for idx in range(num_images):
+        (images_dir / f"{idx}.png").write_bytes(make_fake_image(64, 48, seed=idx))
+        entries.append(
+            CatalogEntry(
+                idx=idx,
+                filename=f"{idx}.png",
+                generator="ExampleGenerator",
+                params=json.dumps({"prompt": f"prompt {idx}"}),
+                created_at=0,
+            )
+        )
+    ImageCatalog(images_dir).add(entries)
+
+
+def test_validators(temp_dir: Path) -> None:
+    path = temp_dir / "0.png"
+    path.write_bytes(make_fake_image(64, 48, seed=1))
+    os.utime(path, (1_600_000_000, 1_600_000_000))
+    validators = file_validators(path)
+    assert validators.last_modified == "Sun, 13 Sep 2020 12:26:40 GMT"
+
+    assert is_not_modified(validators, validators.etag, None)
+    assert is_not_modified(validators, f'"other", W/{validators.etag}', None)
+    assert is_not_modified(validators, "*", None)
+    assert not is_not_modified(validators, '"other"', None)
+    # If-None-Match takes precedence over If-Modified-Since
+    assert not is_not_modified(validators, '"other"', validators.last_modified)
+
+    assert is_not_modified(validators, None, validators.last_modified)
+    assert is_not_modified(validators, None, "Mon, 14 Sep 2020 00:00:00 GMT")
+    assert not is_not_modified(validators, None, "Sat, 12 Sep 2020 00:00:00 GMT")
+    assert not is_not_modified(validators, None, "Not a date")
+    assert not is_not_modified(validators, None, None)
+
+    # Each frame in a sequence has its own tag
+    assert file_validators(path, "-3").etag != validators.etag
+
+
+def test_serving_images(temp_dir: Path) -> None:
+    add_images(temp_dir, 2)
+
+    served = serve_image(temp_dir, 1, FULL_SIZE)
+    assert served is not None
+    assert served.path == temp_dir / "1.png"
+    assert served.read() == (temp_dir / "1.png").read_bytes()
+    assert media_type(served.read()) == "image/png"
+
+    # Thumbnails are made the first time they're asked for
+    assert not thumbnail_path(temp_dir / "1.png", THUMBNAIL).exists()
+    thumbnail = serve_image(temp_dir, 1, THUMBNAIL.name)
+    assert thumbnail is not None
+    assert thumbnail.path == thumbnail_path(temp_dir / "1.png", THUMBNAIL)
+    assert media_type(thumbnail.read()) == "image/webp"
+    assert thumbnail.validators != served.validators
+
+    assert serve_image(temp_dir, 2, FULL_SIZE) is None
+    assert serve_image(temp_dir, 1, "huge") is None
+    (temp_dir / "0.png").unlink()
+    assert serve_image(temp_dir, 0, FULL_SIZE) is None
+    assert serve_image(temp_dir, 0, THUMBNAIL.name) is None
+
+
+def test_gallery_pages(temp_dir: Path) -> None:
+    assert "no images" in gallery_page(temp_dir, 0).html
+    assert "no images" in current_image_html(None)
+
+    add_images(temp_dir, 5)
+    page = gallery_page(temp_dir, 1, page_size=2)
+    assert (page.page, page.num_pages) == (1, 3)
+    assert "/images/" + temp_dir.name + "/2/full" in page.html
+    assert "/3/thumb" in page.html
+    assert "/4/" not in page.html and "/1/" not in page.html
+
+    # Pages past either end show the nearest page
+    assert gallery_page(temp_dir, 7, page_size=2).page == 2
+    assert gallery_page(temp_dir, -1, page_size=2).page == 0
+
+    assert f"/images/{temp_dir.name}/4/preview" in current_image_html(temp_dir / "4.png")
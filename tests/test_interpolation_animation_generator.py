@@ -0,0 +1,218 @@
+from io import BytesIO
+from pathlib import Path
+from typing import List
+from unittest import mock
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from portrayt.configuration import InterpolationMethod, PromptInterpolationAnimation
+from portrayt.generators import (
+    Downloader,
+    InterpolationAnimationGenerator,
+    ReplicateBackend,
+    ResultCache,
+)
+from portrayt.library import open_image
+from tests.fakes import FakePredictionBackend, FakeReplicateServer
+
+
+def make_frames(num_frames: int) -> List[Image.Image]:
+    rng = np.random.default_rng(1337)
+    return [
+        Image.fromarray(rng.integers(0, 256, size=(16, 24, 3), dtype=np.uint8)).quantize()
+        for _ in range(num_frames)
+    ]
+
+
+def make_gif(frames: List[Image.Image]) -> bytes:
+    buffer = BytesIO()
+    frames[0].save(buffer, format="GIF", save_all=True, append_images=frames[1:], duration=100)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("encode_workers", [1, 3])
+def test_frames_are_saved_in_order(temp_dir: Path, encode_workers: int) -> None:
+    frames = make_frames(7)
+    backend = FakePredictionBackend(outputs=lambda inputs: ["https://fake/animation.gif"])
+    downloader = mock.Mock(spec=Downloader)
+    downloader.fetch.return_value = make_gif(frames)
+    progress: List[int] = []
+
+    generator = InterpolationAnimationGenerator(
+        params=PromptInterpolationAnimation(
+            prompt_start="a", prompt_end="b", prompt_strength=0.8, seamless_loop=False
+        ),
+        height=16,
+        width=24,
+        seed=100,
+        cache_dir=temp_dir,
+        downloader=downloader,
+        backend=backend,
+        encode_workers=encode_workers,
+    )
+    generator.generate(clear_previous=True, progress_callback=lambda c, _t: progress.append(c))
+
+    assert progress[-1] == len(frames)
+    for idx, frame in enumerate(frames):
+        with Image.open(generator.images_dir / f"{idx}.png") as saved:
+            assert np.array_equal(
+                np.asarray(saved.convert("RGB")), np.asarray(frame.convert("RGB"))
+            )
+
+
+def test_cached_animations_are_per_model_version(temp_dir: Path) -> None:
+    backend = FakePredictionBackend(outputs=lambda inputs: ["https://fake/animation.gif"])
+    downloader = mock.Mock(spec=Downloader)
+    downloader.fetch.return_value = make_gif(make_frames(3))
+    result_cache = ResultCache(temp_dir / ".result-cache", max_bytes=100_000)
+
+    def generate() -> None:
+        InterpolationAnimationGenerator(
+            params=PromptInterpolationAnimation(
+                prompt_start="a", prompt_end="b", prompt_strength=0.8, seamless_loop=False
+            ),
+            height=16,
+            width=24,
+            seed=100,
+            cache_dir=temp_dir,
+            downloader=downloader,
+            backend=backend,
+            result_cache=result_cache,
+        ).generate(clear_previous=True)
+
+    generate()
+    generate()
+    assert len(backend.created) == 1
+
+    # A new version of the model has to be run again
+    with mock.patch.object(backend, "latest_version", return_value="new-version"):
+        generate()
+    assert len(backend.created) == 2
+
+
+def test_generate_with_fake_replicate(temp_dir: Path) -> None:
+    with FakeReplicateServer() as server:
+        generator = InterpolationAnimationGenerator(
+            params=PromptInterpolationAnimation(
+                prompt_start="a",
+                prompt_end="b",
+                prompt_strength=0.8,
+                seamless_loop=False,
+                num_animation_frames=4,
+            ),
+            height=24,
+            width=32,
+            seed=100,
+            cache_dir=temp_dir,
+            backend=ReplicateBackend(server.client(), poll_seconds=0),
+            encode_workers=1,
+        )
+        generator.generate(clear_previous=True)
+
+    assert generator.catalog.paths() == [generator.images_dir / f"{idx}.png" for idx in range(4)]
+    with Image.open(generator.images_dir / "0.png") as image:
+        assert image.size == (32, 24)
+
+
+@pytest.mark.parametrize("encode_workers", [1, 3])
+def test_frames_are_saved_in_a_sequence(temp_dir: Path, encode_workers: int) -> None:
+    frames = make_frames(7)
+    backend = FakePredictionBackend(outputs=lambda inputs: ["https://fake/animation.gif"])
+    downloader = mock.Mock(spec=Downloader)
+    downloader.fetch.return_value = make_gif(frames)
+    post_processed: List[str] = []
+
+    generator = InterpolationAnimationGenerator(
+        params=PromptInterpolationAnimation(
+            prompt_start="a",
+            prompt_end="b",
+            prompt_strength=0.8,
+            seamless_loop=False,
+            frame_sequence=True,
+        ),
+        height=16,
+        width=24,
+        seed=100,
+        cache_dir=temp_dir,
+        post_processors=[lambda path: post_processed.append(path.name)],
+        downloader=downloader,
+        backend=backend,
+        encode_workers=encode_workers,
+    )
+    generator.generate(clear_previous=True)
+    generator.generate(clear_previous=False)
+
+    # Each generation is one file, and each frame is catalogued on its own
+    frame_names = [f"{idx}.frame" for idx in range(len(frames) * 2)]
+    assert sorted(p.name for p in generator.images_dir.glob("*.frames")) == ["0.frames", "7.frames"]
+    assert not list(generator.images_dir.glob("*.png"))
+    assert [path.name for path in generator.catalog.paths()] == frame_names
+    assert post_processed == frame_names
+
+    for idx, image_path in enumerate(generator.catalog.paths()):
+        with open_image(image_path) as saved:
+            expected = frames[idx % len(frames)].convert("RGB")
+            assert np.array_equal(np.asarray(saved.convert("RGB")), np.asarray(expected))
+
+
+@pytest.mark.parametrize("method", list(InterpolationMethod))
+@pytest.mark.parametrize("encode_workers", [1, 3])
+def test_frames_are_interpolated(
+    temp_dir: Path, method: InterpolationMethod, encode_workers: int
+) -> None:
+    frames = make_frames(4)
+    backend = FakePredictionBackend(outputs=lambda inputs: ["https://fake/animation.gif"])
+    downloader = mock.Mock(spec=Downloader)
+    downloader.fetch.return_value = make_gif(frames)
+    progress: List[int] = []
+
+    generator = InterpolationAnimationGenerator(
+        params=PromptInterpolationAnimation(
+            prompt_start="a",
+            prompt_end="b",
+            prompt_strength=0.8,
+            seamless_loop=False,
+            num_display_frames=10,
+            interpolation_method=method,
+        ),
+        height=16,
+        width=24,
+        seed=100,
+        cache_dir=temp_dir,
+        downloader=downloader,
+        backend=backend,
+        encode_workers=encode_workers,
+    )
+    generator.generate(clear_previous=True, progress_callback=lambda c, _t: progress.append(c))
+
+    # Two frames are added between each of the model's frames, which are kept as they are
+    assert progress[-1] == 10
+    assert len(generator.catalog.paths()) == 10
+    for idx, frame in zip([0, 3, 6, 9], frames):
+        with Image.open(generator.images_dir / f"{idx}.png") as saved:
+            assert np.array_equal(
+                np.asarray(saved.convert("RGB")), np.asarray(frame.convert("RGB"))
+            )
+
+
+def test_encode_workers_are_configured(temp_dir: Path) -> None:
+    def create(encode_workers: int) -> InterpolationAnimationGenerator:
+        params = PromptInterpolationAnimation(
+            prompt_start="a",
+            prompt_end="b",
+            prompt_strength=0.8,
+            seamless_loop=False,
+            encode_workers=encode_workers,
+        )
+        return InterpolationAnimationGenerator(
+            params=params, height=16, width=24, seed=100, cache_dir=temp_dir
+        )
+
+    assert create(2)._encode_workers == 2
+    assert create(0)._encode_workers >= 1
+
+    # The frames are the same however many processes make them, so an interrupted generation can
+    # be resumed with a different number
+    assert create(2).fingerprint == create(4).fingerprint
@@ -0,0 +1,112 @@
+import json
+import socket
+from pathlib import Path
+from typing import Generator
+
+import pytest
+import requests
+
+from portrayt import generators
+from portrayt.configuration import Configuration
+from portrayt.library import CatalogEntry, ImageCatalog
+from portrayt.main import write_default_configuration
+from portrayt.renderers.base_renderer import BaseRenderer
+from tests.fakes import FakeReplicateServer, make_fake_image
+
+pytest.importorskip("gradio")
+
+from portrayt.interface import MainApp  # noqa: E402
+
+
+class FakeRenderer(BaseRenderer[str]):
+    def _prepare(self, image_path: Path) -> str:
+        return image_path.name
+
+    def _render(self, frame: str) -> None:
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+@pytest.fixture
+def app(temp_dir: Path, monkeypatch: pytest.MonkeyPatch) -> Generator[MainApp, None, None]:
+    monkeypatch.setenv("GRADIO_ANALYTICS_ENABLED", "False")
+    config_path = temp_dir / "portrayt-config.json"
+    write_default_configuration(config_path)
+    config = Configuration.parse_file(config_path)
+    images_dir = generators.images_dir_for(temp_dir, config.current_prompt_type)
+    images_dir.mkdir()
+    renderer = FakeRenderer(images_dir, config.renderer)
+
+    # Predictions take long enough that the first job is still running when the next is submitted
+    with FakeReplicateServer(prediction_seconds=0.5) as server:
+        backend = generators.ReplicateBackend
+        monkeypatch.setattr(
+            generators, "ReplicateBackend", lambda: backend(server.client(), poll_seconds=0.05)
+        )
+        app = MainApp(
+            configuration=config,
+            configuration_path=config_path,
+            cache_root_path=temp_dir,
+            renderer=renderer,
+            port=free_port(),
+        )
+        try:
+            yield app
+        finally:
+            app.close()
+            renderer.close()
+
+
+def test_jobs_keep_their_own_params(app: MainApp) -> None:
+    app._on_generate_variations_saved("first prompt", 1)
+    app._on_generate_variations_saved("second prompt", 1)
+
+    jobs = app._generation_queue.jobs
+    assert len(jobs) == 2
+    prompts = [json.loads(job.generator.fingerprint)["params"]["prompt"] for job in jobs]
+    assert prompts == ["first prompt", "second prompt"]
+
+
+def test_renderer_shares_the_configuration(app: MainApp) -> None:
+    shuffle = app._config.renderer.shuffle
+    app._renderer.toggle_shuffle()
+    app.save_config()
+    saved = Configuration.parse_file(app._config_path)
+    assert saved.renderer.shuffle is not shuffle
+
+    app._on_general_settings_saved(app._config.current_prompt_type, 42, False, 512, 768, 1337)
+    assert app._renderer._params.seconds_between_images == 42
+
+
+def test_images_are_served(app: MainApp) -> None:
+    images_dir = generators.images_dir_for(app._cache_root_path, app._config.current_prompt_type)
+    (images_dir / "0.png").write_bytes(make_fake_image(64, 48, seed=1))
+    ImageCatalog(images_dir).add([CatalogEntry(0, "0.png", None, None, 0)])
+    app.launch(block=False)
+    url = f"http://127.0.0.1:{app._server_port}/images/{images_dir.name}/0"
+
+    response = requests.get(f"{url}/full", timeout=10)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.content == (images_dir / "0.png").read_bytes()
+
+    # Thumbnails are made when they're first requested, and can be revalidated
+    response = requests.get(f"{url}/thumb", timeout=10)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["cache-control"] == "no-cache"
+    etag = response.headers["etag"]
+    response = requests.get(f"{url}/thumb", headers={"If-None-Match": etag}, timeout=10)
+    assert response.status_code == 304
+
+    assert requests.get(f"{url}/huge", timeout=10).status_code == 404
+    missing_url = f"http://127.0.0.1:{app._server_port}/images/elsewhere/0/full"
+    assert requests.get(missing_url, timeout=10).status_code == 404
+
+    # The dashboard is still served
+    assert requests.get(f"http://127.0.0.1:{app._server_port}/", timeout=10).status_code == 200
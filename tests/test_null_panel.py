@@ -0,0 +1,48 @@
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Generator, Tuple
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from portrayt.configuration import RendererParams
+from portrayt.renderers import NullPanelRenderer
+from portrayt.renderers.null_panel import REFRESH_SECONDS, SPI_SPEED_HZ
+
+
+@pytest.fixture
+def images_dir() -> Generator[Path, None, None]:
+    with TemporaryDirectory() as temp_dir:
+        images_dir = Path(temp_dir)
+        rng = np.random.default_rng(1337)
+        pixels = rng.integers(0, 256, size=(300, 500, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(images_dir / "0.png")
+        yield images_dir
+
+
+@pytest.mark.parametrize("resolution", [(600, 448), (640, 400)])
+def test_render_to_null_panel(images_dir: Path, resolution: Tuple[int, int]) -> None:
+    renderer = NullPanelRenderer(
+        images_dir,
+        RendererParams(seconds_between_images=1000, shuffle=False),
+        resolution=resolution,
+    )
+    try:
+        deadline = time.monotonic() + 10
+        while not renderer.panel.refreshes:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        renderer.close()
+
+    # The panel's framebuffer holds the quantized image, packed two pixels per byte
+    width, height = resolution
+    framebuffer = np.load(renderer._prerendered_path(images_dir / "0.png"))
+    assert np.array_equal(renderer.panel.buf, framebuffer.reshape(height, width))
+
+    (refresh,) = renderer.panel.refreshes
+    assert refresh.transfer_bytes == width * height // 2
+    assert refresh.transfer_seconds == pytest.approx(width * height * 4 / SPI_SPEED_HZ)
+    assert refresh.total_seconds == pytest.approx(refresh.transfer_seconds + REFRESH_SECONDS)
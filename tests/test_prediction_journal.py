@@ -0,0 +1,79 @@
+import multiprocessing
+import os
+from pathlib import Path
+from typing import List
+from unittest import mock
+
+import pytest
+
+from portrayt.configuration import PromptGenerateVariations
+from portrayt.generators import Downloader, PredictionJournal, VariationGenerator
+from tests.fakes import FakePredictionBackend
+
+
+def make_generator(
+    cache_dir: Path, backend: FakePredictionBackend, downloader: Downloader
+) -> VariationGenerator:
+    return VariationGenerator(
+        params=PromptGenerateVariations(
+            prompt="cool", num_variations=3, max_concurrent_predictions=1
+        ),
+        height=1,
+        width=2,
+        seed=100,
+        cache_dir=cache_dir,
+        downloader=downloader,
+        backend=backend,
+        journal=PredictionJournal(cache_dir),
+    )
+
+
+def crash_while_downloading(cache_dir: Path) -> None:
+    """Run a generation that kills the process while downloading the second image"""
+
+    def download(url: str, path: Path) -> None:
+        if path.name == "1.png":
+            os._exit(1)
+        path.write_bytes(url.encode())
+
+    downloader = mock.Mock(spec=Downloader, download=download)
+    make_generator(cache_dir, FakePredictionBackend(), downloader).generate(clear_previous=True)
+
+
+def test_resume_after_crash(temp_dir: Path) -> None:
+    process = multiprocessing.get_context("fork").Process(
+        target=crash_while_downloading, args=(temp_dir,)
+    )
+    process.start()
+    process.join()
+    assert process.exitcode == 1
+    assert len(PredictionJournal(temp_dir).unfinished_jobs()) == 1
+
+    downloaded: List[str] = []
+
+    def download(url: str, path: Path) -> None:
+        downloaded.append(path.name)
+        path.write_bytes(url.encode())
+
+    backend = FakePredictionBackend()
+    generator = make_generator(temp_dir, backend, mock.Mock(spec=Downloader, download=download))
+    generator.generate(clear_previous=True)
+
+    # Only the prediction that never started should be run, and only missing files downloaded
+    assert backend.seeds == [102]
+    assert downloaded == ["1.png", "2.png"]
+    for idx in range(3):
+        image_path = generator.images_dir / f"{idx}.png"
+        assert image_path.read_bytes() == f"https://fake/{100 + idx}/0.png".encode()
+
+    assert PredictionJournal(temp_dir).unfinished_jobs() == []
+    assert not list(temp_dir.glob("*.staging-*"))
+
+
+def test_failed_generations_are_discarded(temp_dir: Path) -> None:
+    downloader = mock.Mock(spec=Downloader, download=mock.Mock(side_effect=RuntimeError))
+    generator = make_generator(temp_dir, FakePredictionBackend(), downloader)
+    with pytest.raises(RuntimeError):
+        generator.generate(clear_previous=True)
+
+    assert PredictionJournal(temp_dir).unfinished_jobs() == []
@@ -0,0 +1,55 @@
+from pathlib import Path
+from threading import Event
+from typing import List
+
+from portrayt.renderers.prefetcher import FramePrefetcher
+
+
+class FakePreparer:
+    def __init__(self) -> None:
+        self.prepared: List[Path] = []
+        self.release = Event()
+        self.release.set()
+
+    def __call__(self, image_path: Path) -> str:
+        self.release.wait(timeout=5)
+        self.prepared.append(image_path)
+        return f"frame of {image_path.name}"
+
+
+def test_prefetched_frames_are_reused() -> None:
+    preparer = FakePreparer()
+    prefetcher = FramePrefetcher(preparer, max_frames=2)
+
+    prefetcher.prefetch([Path("1.png"), Path("2.png"), Path("3.png")])
+    assert prefetcher.get(Path("1.png")) == "frame of 1.png"
+    assert prefetcher.get(Path("2.png")) == "frame of 2.png"
+
+    # Only 'max_frames' images are prepared ahead of time, the rest are prepared on demand
+    assert preparer.prepared == [Path("1.png"), Path("2.png")]
+    assert prefetcher.get(Path("3.png")) == "frame of 3.png"
+    assert preparer.prepared == [Path("1.png"), Path("2.png"), Path("3.png")]
+    prefetcher.close()
+
+
+def test_stale_frames_are_dropped() -> None:
+    preparer = FakePreparer()
+    prefetcher = FramePrefetcher(preparer, max_frames=1)
+
+    prefetcher.prefetch([Path("1.png")])
+    prefetcher.get(Path("1.png"))
+    prefetcher.prefetch([Path("1.png")])
+    prefetcher.clear()
+
+    # After clearing, the frame must be prepared again
+    prefetcher.get(Path("1.png"))
+    assert preparer.prepared.count(Path("1.png")) >= 2
+
+    # Frames that are no longer upcoming are cancelled before they're prepared
+    preparer.release.clear()
+    prefetcher.prefetch([Path("2.png")])
+    prefetcher.prefetch([Path("3.png")])
+    preparer.release.set()
+    assert prefetcher.get(Path("3.png")) == "frame of 3.png"
+    prefetcher.close()
+    assert Path("3.png") in preparer.prepared
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from portrayt.configuration import DitherMode
+from portrayt.renderers.quantization import PaletteQuantizer
+
+PALETTE = [(0, 0, 0), (255, 255, 255), (0, 255, 0), (0, 0, 255), (255, 0, 0), (255, 255, 0)]
+
+
+@pytest.fixture
+def image() -> Image.Image:
+    rng = np.random.default_rng(1337)
+    return Image.fromarray(rng.integers(0, 256, size=(48, 64, 3), dtype=np.uint8))
+
+
+def test_nearest_colour_lookup(image: Image.Image) -> None:
+    quantizer = PaletteQuantizer(PALETTE, dither_mode=DitherMode.NONE)
+    indices = quantizer.quantize(image)
+    assert indices.shape == (48, 64)
+
+    # The lookup table may only differ from a brute force search by less than one table cell
+    pixels = np.asarray(image, dtype=np.float32)
+    palette = np.array(PALETTE, dtype=np.float32)
+    distances = np.linalg.norm(pixels[..., np.newaxis, :] - palette, axis=-1)
+    chosen = np.take_along_axis(distances, indices[..., np.newaxis].astype(np.int64), axis=-1)
+    cell_diagonal = np.sqrt(3) * (256 >> PaletteQuantizer.LUT_BITS)
+    assert np.all(chosen[..., 0] - distances.min(axis=-1) <= cell_diagonal)
+
+
+def test_palette_colours_map_to_themselves() -> None:
+    quantizer = PaletteQuantizer(PALETTE, dither_mode=DitherMode.NONE)
+    image = Image.new("RGB", (len(PALETTE), 1))
+    image.putdata(PALETTE)
+    assert quantizer.quantize(image).tolist() == [list(range(len(PALETTE)))]
+
+
+def test_error_diffusion_matches_pillow(image: Image.Image) -> None:
+    quantizer = PaletteQuantizer(PALETTE, dither_mode=DitherMode.ERROR_DIFFUSION)
+    expected = image.quantize(palette=quantizer.palette_image, dither=Image.FLOYDSTEINBERG)
+    assert np.array_equal(quantizer.quantize(image), np.asarray(expected))
+
+
+def test_ordered_dither_preserves_average_colour() -> None:
+    grey = Image.new("RGB", (64, 64), (128, 128, 128))
+    undithered = PaletteQuantizer(PALETTE, dither_mode=DitherMode.NONE).quantize(grey)
+    dithered = PaletteQuantizer(PALETTE, dither_mode=DitherMode.ORDERED).quantize(grey)
+
+    # Without dithering, a flat grey collapses to a single colour. With it, a black and white
+    # pattern should be produced.
+    assert len(np.unique(undithered)) == 1
+    assert set(np.unique(dithered)) == {0, 1}
+    assert abs(np.mean(dithered == 1) - 0.5) < 0.1
@@ -0,0 +1,47 @@
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+from portrayt.renderers.refresh_filter import RefreshFilter, RefreshStats
+
+
+@pytest.fixture
+def framebuffer() -> "npt.NDArray[np.uint8]":
+    rng = np.random.default_rng(1337)
+    return rng.integers(0, 7, size=(40, 50), dtype=np.uint8)
+
+
+def test_identical_frames_are_skipped(framebuffer: "npt.NDArray[np.uint8]") -> None:
+    refresh_filter = RefreshFilter(threshold=0)
+    assert refresh_filter.should_refresh(framebuffer)
+    refresh_filter.record_refresh(framebuffer)
+
+    assert not refresh_filter.should_refresh(framebuffer.copy())
+
+    # Any change is enough to refresh with no threshold
+    changed = framebuffer.copy()
+    changed[0, 0] = (changed[0, 0] + 1) % 7
+    assert refresh_filter.should_refresh(changed)
+    assert refresh_filter.stats == RefreshStats(refreshed=1, skipped_identical=1, skipped_similar=0)
+
+
+def test_small_changes_accumulate(framebuffer: "npt.NDArray[np.uint8]") -> None:
+    refresh_filter = RefreshFilter(threshold=0.01)
+    refresh_filter.record_refresh(framebuffer)
+
+    # 1% of the pixels differ, which isn't more than the threshold
+    changed = framebuffer.copy()
+    changed[0, :20] = (changed[0, :20] + 1) % 7
+    assert not refresh_filter.should_refresh(changed)
+
+    # Frames are compared against the display, so further changes push it past the threshold
+    changed[1, :20] = (changed[1, :20] + 1) % 7
+    assert refresh_filter.should_refresh(changed)
+    assert refresh_filter.stats.skipped_similar == 1
+
+
+def test_reset(framebuffer: "npt.NDArray[np.uint8]") -> None:
+    refresh_filter = RefreshFilter(threshold=0)
+    refresh_filter.record_refresh(framebuffer)
+    refresh_filter.reset()
+    assert refresh_filter.should_refresh(framebuffer)
@@ -0,0 +1,173 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+from typing import Any, Generator, List
+
+import pytest
+from replicate.exceptions import ReplicateError
+
+from portrayt.generators import (
+    AdaptiveConcurrencyLimiter,
+    ReplicateBackend,
+    ReplicateClient,
+    TokenBucket,
+)
+from tests.fakes import FakeReplicateServer, fake_image_outputs
+
+
+@pytest.fixture
+def server() -> Generator[FakeReplicateServer, None, None]:
+    with FakeReplicateServer(outputs=fake_image_outputs) as server:
+        yield server
+
+
+def create_client(server: FakeReplicateServer, **kwargs: Any) -> ReplicateClient:
+    return server.client(backoff_seconds=0, **kwargs)
+
+
+def test_token_bucket_limits_rate() -> None:
+    bucket = TokenBucket(rate=50, burst=2)
+    start = time.monotonic()
+    waits = [bucket.acquire() for _ in range(7)]
+
+    # The burst is free, and every token after that takes 1/50th of a second
+    assert waits[:2] == [0, 0]
+    assert time.monotonic() - start == pytest.approx(0.1, abs=0.05)
+    assert bucket.average_wait > 0
+
+
+def test_token_bucket_pause() -> None:
+    bucket = TokenBucket(rate=1000, burst=10)
+    bucket.pause(0.1)
+    assert bucket.acquire() == pytest.approx(0.1, abs=0.02)
+
+
+def test_concurrency_limit_adapts() -> None:
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=6, cooldown_seconds=0)
+
+    # The limit grows by about one for each limit's worth of successes
+    for _ in range(4):
+        with limiter.slot():
+            pass
+    assert limiter.limit == 4
+    for _ in range(20):
+        with limiter.slot():
+            pass
+    assert limiter.limit == 6
+
+    limiter.record_throttled()
+    assert limiter.limit == 3
+    assert limiter.throttled == 1
+
+    # An operation that takes much longer than usual means the server is queueing them
+    limiter.acquire()
+    limiter.release(latency=60)
+    assert limiter.limit == 1
+
+    # Failures don't say anything about how busy the server is
+    limiter.acquire()
+    limiter.release(latency=None)
+    assert limiter.limit == 1
+
+
+def test_concurrency_limit_cooldown() -> None:
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, cooldown_seconds=60)
+    for _ in range(5):
+        limiter.record_throttled()
+    assert limiter.limit == 4
+    assert limiter.throttled == 5
+
+
+def test_slots_are_shared_fairly_between_jobs() -> None:
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1)
+    limiter.acquire()
+
+    granted: List[str] = []
+
+    def run(job: str) -> None:
+        limiter.acquire(job)
+        granted.append(job)
+        limiter.release()
+
+    threads = []
+    for i, job in enumerate(["greedy", "greedy", "greedy", "polite"]):
+        thread = Thread(target=run, args=(job,))
+        thread.start()
+        threads.append(thread)
+        while sum(limiter.waiting().values()) < i + 1:
+            time.sleep(0.001)
+    assert limiter.waiting() == {"greedy": 3, "polite": 1}
+
+    limiter.release()
+    for thread in threads:
+        thread.join()
+
+    # The polite job doesn't have to wait for all of the greedy job's operations
+    assert granted == ["greedy", "polite", "greedy", "greedy"]
+    assert limiter.in_flight == 0
+    assert limiter.waiting() == {}
+
+
+def test_run_prediction(server: FakeReplicateServer) -> None:
+    backend = ReplicateBackend(create_client(server), poll_seconds=0)
+    version = backend.latest_version("stability-ai/stable-diffusion")
+    with backend.reserve("job"):
+        prediction_id = backend.create(
+            "stability-ai/stable-diffusion", version, {"seed": 3, "num_outputs": 2}
+        )
+        assert backend.wait(prediction_id) == ["https://fake/3/0.png", "https://fake/3/1.png"]
+    assert backend.limits.throttled == 0
+    assert backend.limits.in_flight == 0
+
+
+def test_throttled_requests_are_retried(server: FakeReplicateServer) -> None:
+    client = create_client(server, concurrency=AdaptiveConcurrencyLimiter(initial_limit=8))
+    backend = ReplicateBackend(client, poll_seconds=0)
+    version = backend.latest_version("stability-ai/stable-diffusion")
+
+    server.throttle_responses = 3
+    server.retry_after = "0.05"
+    start = time.monotonic()
+    with backend.reserve("job"):
+        prediction_id = backend.create("stability-ai/stable-diffusion", version, {"seed": 1})
+        assert backend.wait(prediction_id) == ["https://fake/1/0.png"]
+
+    # Each throttled request pauses all requests for as long as the server asked
+    assert time.monotonic() - start >= 0.15
+    assert server.requests[1:5] == [("POST", "/v1/predictions")] * 4
+    limits = backend.limits
+    assert limits.throttled == 3
+    assert limits.concurrency_limit == 4
+    assert len(server.predictions) == 1
+
+
+def test_give_up_when_always_throttled(server: FakeReplicateServer) -> None:
+    backend = ReplicateBackend(create_client(server, max_throttled_retries=2), poll_seconds=0)
+    server.throttle_responses = 10
+    server.retry_after = None
+    with pytest.raises(ReplicateError):
+        backend.latest_version("stability-ai/stable-diffusion")
+    assert len(server.requests) == 3
+
+
+def test_concurrent_predictions_are_limited(server: FakeReplicateServer) -> None:
+    server.polls_until_done = 5
+    client = create_client(
+        server,
+        requests_per_second=1000,
+        concurrency=AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2),
+    )
+    backend = ReplicateBackend(client, poll_seconds=0.01)
+    version = backend.latest_version("stability-ai/stable-diffusion")
+
+    def predict(seed: int) -> List[str]:
+        with backend.reserve(f"job-{seed % 3}"):
+            prediction_id = backend.create("stability-ai/stable-diffusion", version, {"seed": seed})
+            return backend.wait(prediction_id)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(predict, range(12)))
+
+    assert results == [[f"https://fake/{seed}/0.png"] for seed in range(12)]
+    assert server.max_running == 2
+    assert backend.limits.average_prediction_wait > 0
@@ -0,0 +1,49 @@
+import os
+from pathlib import Path
+
+from portrayt.generators import ResultCache
+
+
+def test_key_depends_on_every_input() -> None:
+    key = ResultCache.key("model", {"prompt": "cat", "seed": 1})
+    assert key == ResultCache.key("model", {"seed": 1, "prompt": "cat"})
+    assert key != ResultCache.key("model", {"prompt": "cat", "seed": 2})
+    assert key != ResultCache.key("other-model", {"prompt": "cat", "seed": 1})
+
+
+def test_restore(temp_dir: Path) -> None:
+    cache = ResultCache(temp_dir / "cache", max_bytes=1000)
+    source = temp_dir / "source.png"
+    source.write_bytes(b"image")
+
+    assert not cache.restore("key", temp_dir / "missing.png")
+    cache.put("key", source)
+
+    # Deleting or replacing the original shouldn't affect the cached result
+    source.unlink()
+    assert cache.restore("key", temp_dir / "restored.png")
+    assert (temp_dir / "restored.png").read_bytes() == b"image"
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+
+    # Restored results are copies, so deleting them frees their space, and using the cached
+    # result doesn't change when the restored file was modified
+    restored_stat = (temp_dir / "restored.png").stat()
+    assert restored_stat.st_nlink == 1
+    os.utime(temp_dir / "restored.png", (1000, 1000))
+    assert cache.get("key") is not None
+    assert (temp_dir / "restored.png").stat().st_mtime == 1000
+
+
+def test_least_recently_used_results_are_evicted(temp_dir: Path) -> None:
+    cache = ResultCache(temp_dir / "cache", max_bytes=350)
+    for age, key in enumerate(["a", "b", "c"]):
+        cache.put_bytes(key, b"x" * 100)
+        os.utime(cache.cache_dir / key, (1000 + age, 1000 + age))
+
+    # Using 'a' makes it the most recently used, so 'b' is evicted instead
+    assert cache.get("a") is not None
+    cache.put_bytes("d", b"x" * 100)
+    assert sorted(p.name for p in cache.cache_dir.glob("[!.]*")) == ["a", "c", "d"]
+    assert [p.name for p in (cache.cache_dir / ".last-used").iterdir()] == ["a"]
+    assert cache.stats.size_bytes == 300
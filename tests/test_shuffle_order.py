@@ -0,0 +1,106 @@
+import random
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Generator, List
+
+import pytest
+
+from portrayt.library import ShuffleOrder
+
+
+@pytest.fixture
+def order_path() -> Generator[Path, None, None]:
+    with TemporaryDirectory() as temp_dir:
+        yield Path(temp_dir) / "order.json"
+
+
+def take(order: ShuffleOrder, n: int) -> List[int]:
+    """Advance through n images, returning their indices"""
+    shown = []
+    for _ in range(n):
+        idx = order.next()
+        assert idx is not None
+        shown.append(idx)
+    return shown
+
+
+def test_every_image_shown_once_per_cycle(order_path: Path) -> None:
+    order = ShuffleOrder(order_path, rng=random.Random(1))
+    assert order.next() is None
+
+    order.sync(range(10))
+    first_cycle = take(order, 10)
+    second_cycle = take(order, 10)
+    assert sorted(first_cycle) == sorted(second_cycle) == list(range(10))
+    assert first_cycle != second_cycle
+
+    # The same image is never shown twice in a row across a cycle boundary
+    assert first_cycle[-1] != second_cycle[0]
+
+
+def test_images_added_and_removed_mid_cycle(order_path: Path) -> None:
+    order = ShuffleOrder(order_path, rng=random.Random(2))
+    order.sync(range(10))
+
+    shown = take(order, 5)
+    order.add(100)
+    order.add(101)
+    unshown = [idx for idx in range(10) if idx not in shown]
+    order.remove(unshown[0])
+    order.remove(shown[0])
+
+    # The rest of the cycle is everything not yet shown, including the new images
+    rest_of_cycle = take(order, 6)
+    assert sorted(rest_of_cycle) == sorted(unshown[1:] + [100, 101])
+
+    # The next cycle contains everything that still exists
+    next_cycle = take(order, 10)
+    assert sorted(next_cycle) == sorted(set(range(10)) - {unshown[0], shown[0]} | {100, 101})
+
+
+def test_previous(order_path: Path) -> None:
+    order = ShuffleOrder(order_path, rng=random.Random(3))
+    order.sync(range(5))
+
+    shown = take(order, 3)
+    assert order.previous() == shown[1]
+    assert order.previous() == shown[0]
+    assert order.previous() is None
+    assert order.next() == shown[1]
+
+
+def test_persists_between_instances(order_path: Path) -> None:
+    order = ShuffleOrder(order_path, rng=random.Random(4))
+    order.sync(range(20))
+    shown = take(order, 7)
+
+    restored = ShuffleOrder(order_path, rng=random.Random(5))
+    assert restored.current == shown[-1]
+    assert sorted(shown + take(restored, 13)) == list(range(20))
+
+
+def test_stepping_only_saves_the_cursor(order_path: Path) -> None:
+    order = ShuffleOrder(order_path, rng=random.Random(6))
+    order.sync(range(5))
+    saved_order = order_path.read_text()
+
+    shown = take(order, 3)
+    assert order.previous() == shown[1]
+    assert order_path.read_text() == saved_order
+    assert ShuffleOrder(order_path).current == shown[1]
+
+    # Starting a new cycle saves the new order
+    take(order, 4)
+    assert order_path.read_text() != saved_order
+    assert ShuffleOrder(order_path).current == order.current
+
+    # A cursor that was saved for an earlier order is ignored
+    order_path.write_text(saved_order)
+    assert ShuffleOrder(order_path).current is None
+
+
+def test_ignores_corrupt_file(order_path: Path) -> None:
+    order_path.write_text("{not json")
+    order = ShuffleOrder(order_path)
+    order.sync(range(3))
+    assert sorted(take(order, 3)) == [0, 1, 2]
@@ -0,0 +1,135 @@
+import subprocess
+import sys
+from pathlib import Path
+from textwrap import dedent
+from typing import Dict, Set, Tuple
+
+import pytest
+
+from portrayt import generators
+from portrayt.configuration import (
+    Configuration,
+    PromptGenerateVariations,
+    PromptInterpolationAnimation,
+)
+from portrayt.main import write_default_configuration
+from tests.fakes import FakePredictionBackend
+
+HEAVY_MODULES = {"gradio", "replicate", "requests", "inky", "RPi", "cv2", "numpy", "PIL"}
+"""Libraries that are slow to import on a Raspberry Pi, and aren't needed to start up"""
+
+
+def profile_imports(code: str) -> Tuple[Set[str], Dict[str, int]]:
+    """Run code in a new interpreter with -X importtime
+
+    :param code: The code to run
+    :return: The names of all imported modules, and the microseconds spent importing each top
+        level package's own modules
+    """
+    # Modules imported with importlib aren't timed, so the imported modules are listed separately
+    code += "\nimport sys\nprint('\\n'.join(sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=True,
+    )
+    imported = set(result.stdout.splitlines())
+    top_level: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        package = name.strip().split(".")[0]
+        top_level[package] = top_level.get(package, 0) + int(self_us)
+    return imported, top_level
+
+
+def import_report(top_level: Dict[str, int]) -> str:
+    slowest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:10]
+    return "\n".join(f"{us / 1000:8.1f}ms  {package}" for package, us in slowest)
+
+
+def test_main_imports_no_heavy_modules() -> None:
+    imported, top_level = profile_imports("import portrayt.main")
+    report = import_report(top_level)
+    print(f"Slowest imports of portrayt.main:\n{report}")
+
+    heavy = {name for name in imported if name.split(".")[0] in HEAVY_MODULES}
+    assert not heavy, f"Startup imported {sorted(heavy)}. Slowest imports:\n{report}"
+
+
+def test_renderer_types_are_imported_when_used() -> None:
+    imported, _ = profile_imports(
+        "from portrayt.renderers import RENDERER_TYPES, RendererType\n"
+        "RENDERER_TYPES[RendererType.OPENCV]"
+    )
+    assert "portrayt.renderers.opencv_renderer" in imported
+    assert "portrayt.renderers.inky_renderer" not in imported
+    assert "inky" not in imported
+
+
+def test_inky_renderer_does_not_import_opencv() -> None:
+    pytest.importorskip("inky")
+    imported, _ = profile_imports(
+        "from portrayt.renderers import RENDERER_TYPES, RendererType\n"
+        "RENDERER_TYPES[RendererType.INKY_5]"
+    )
+    assert "portrayt.renderers.inky_renderer" in imported
+    assert "portrayt.renderers.opencv_renderer" not in imported
+
+
+@pytest.mark.parametrize("prompt_type", generators.GENERATOR_TYPES.keys())
+def test_images_dir_matches_generator(temp_dir: Path, prompt_type: str) -> None:
+    write_default_configuration(temp_dir / "config.json")
+    config = Configuration.parse_file(temp_dir / "config.json")
+    params = {
+        PromptGenerateVariations.__name__: config.prompt_generate_variations,
+        PromptInterpolationAnimation.__name__: config.prompt_interpolation_animation,
+    }
+    generator = generators.GENERATOR_TYPES[prompt_type](
+        params=params[prompt_type],
+        height=512,
+        width=512,
+        seed=1337,
+        cache_dir=temp_dir,
+        backend=FakePredictionBackend(),
+    )
+    assert generators.images_dir_for(temp_dir, prompt_type) == generator.images_dir
+
+
+def test_display_only_shows_cached_images(temp_dir: Path) -> None:
+    """The renderer starts showing cached images without the generators being imported"""
+    pytest.importorskip("inky")
+    code = dedent(
+        f"""
+        import sys, time
+        from pathlib import Path
+
+        from PIL import Image
+
+        from portrayt.configuration import Configuration
+        from portrayt.main import create_renderer, write_default_configuration
+        from portrayt.renderers import RendererType
+
+        data_dir = Path({str(temp_dir)!r})
+        write_default_configuration(data_dir / "config.json")
+        (data_dir / "VariationGenerator").mkdir()
+        Image.new("RGB", (768, 512), "red").save(data_dir / "VariationGenerator" / "0.png")
+
+        config = Configuration.parse_file(data_dir / "config.json")
+        renderer = create_renderer(config, data_dir, RendererType.NULL_PANEL)
+        try:
+            deadline = time.monotonic() + 30
+            while not renderer.panel.refreshes:
+                assert time.monotonic() < deadline, "Nothing was shown"
+                time.sleep(0.01)
+        finally:
+            renderer.close()
+
+        assert "portrayt.generators.base_generator" not in sys.modules
+        assert "replicate" not in sys.modules
+        """
+    )
+    subprocess.run([sys.executable, "-c", code], timeout=60, check=True)
@@ -0,0 +1,145 @@
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+from PIL import Image
+
+from portrayt.configuration import EvictionPolicy, StorageFormat, StorageParams
+from portrayt.library import CatalogEntry, FrameSequenceWriter, ImageCatalog, StorageManager
+
+IMAGE_BYTES = 1024 * 1024
+"""Each image is a megabyte, so budgets are a whole number of images"""
+
+
+def add_images(images_dir: Path, created_at: Sequence[float]) -> ImageCatalog:
+    """Catalog an image of IMAGE_BYTES for each creation time"""
+    images_dir.mkdir(parents=True, exist_ok=True)
+    catalog = ImageCatalog(images_dir)
+    for idx, created in enumerate(created_at):
+        (images_dir / f"{idx}.png").write_bytes(b"0" * IMAGE_BYTES)
+        catalog.add([CatalogEntry(idx, f"{idx}.png", images_dir.name, None, created)])
+    return catalog
+
+
+def test_no_limit(temp_dir: Path) -> None:
+    catalog = add_images(temp_dir / "Generator", created_at=range(4))
+    report = StorageManager([temp_dir / "Generator"], StorageParams()).enforce()
+    assert report.images == 4
+    assert report.size_bytes == 4 * IMAGE_BYTES
+    assert report.evicted == 0
+    assert catalog.indices() == [0, 1, 2, 3]
+
+
+def test_evict_oldest_across_directories(temp_dir: Path) -> None:
+    # Older images are deleted first, no matter which directory they're in
+    first = add_images(temp_dir / "First", created_at=[1, 3])
+    second = add_images(temp_dir / "Second", created_at=[0, 2, 4, 6])
+
+    # Pre-rendered frames count towards the budget, and are deleted with their image
+    (temp_dir / "Second" / "0.prerender-key.npy").write_bytes(b"0" * IMAGE_BYTES)
+
+    manager = StorageManager(
+        [temp_dir / "First", temp_dir / "Second", temp_dir / "Missing"],
+        StorageParams(max_megabytes=4, eviction_policy=EvictionPolicy.OLDEST),
+    )
+    report = manager.enforce()
+    assert report.evicted == 2
+    assert report.freed_bytes == 3 * IMAGE_BYTES
+    assert report.size_bytes == 4 * IMAGE_BYTES
+    assert first.indices() == [1]
+    assert second.indices() == [1, 2, 3]
+    assert not (temp_dir / "Second" / "0.prerender-key.npy").exists()
+    assert sorted(p.name for p in (temp_dir / "First").glob("*.png")) == ["1.png"]
+
+
+def test_evict_least_shown(temp_dir: Path) -> None:
+    catalog = add_images(temp_dir, created_at=range(5))
+    for idx, times_shown in enumerate([3, 1, 2, 0, 5]):
+        for _ in range(times_shown):
+            catalog.record_shown(idx)
+    catalog.set_favourite(1, True)
+
+    params = StorageParams(max_megabytes=4, eviction_policy=EvictionPolicy.LEAST_SHOWN)
+    StorageManager([temp_dir], params).enforce()
+    assert catalog.indices() == [0, 1, 3, 4]
+
+    # The favourite, and the image that hasn't been shown yet, are deleted last
+    params.max_megabytes = 2
+    StorageManager([temp_dir], params).enforce()
+    assert catalog.indices() == [1, 3]
+
+
+def test_favourites_are_never_evicted(temp_dir: Path) -> None:
+    catalog = add_images(temp_dir, created_at=range(4))
+    catalog.set_favourite(0, True)
+    catalog.set_favourite(1, True)
+
+    params = StorageParams(max_megabytes=1, eviction_policy=EvictionPolicy.NOT_FAVOURITE)
+    report = StorageManager([temp_dir], params).enforce(keep=[temp_dir / "3.png"])
+
+    # The budget can't be met without deleting favourites, or the image that's being shown
+    assert catalog.indices() == [0, 1, 3]
+    assert report.size_bytes == 3 * IMAGE_BYTES
+
+
+def test_transcode_to_webp(temp_dir: Path) -> None:
+    catalog = ImageCatalog(temp_dir)
+    rng = np.random.default_rng(1337)
+    originals = {}
+    for idx in range(3):
+        gradient = np.linspace(0, 255, 64 * 48 * 3).reshape((48, 64, 3))
+        pixels = (gradient + rng.integers(0, 8, size=gradient.shape)).clip(0, 255)
+        originals[idx] = pixels.astype(np.uint8)
+        Image.fromarray(originals[idx]).save(temp_dir / f"{idx}.png")
+        catalog.add([CatalogEntry(idx, f"{idx}.png", None, None, created_at=idx)])
+    catalog.record_shown(0)
+
+    params = StorageParams(storage_format=StorageFormat.WEBP_LOSSLESS)
+    report = StorageManager([temp_dir], params).enforce(keep=[temp_dir / "2.png"])
+    assert report.transcoded == 2
+    assert report.transcoded_saved_bytes > 0
+
+    # The images that aren't in use are replaced, without losing any detail
+    assert catalog.paths() == [temp_dir / "0.webp", temp_dir / "1.webp", temp_dir / "2.png"]
+    assert sorted(p.name for p in temp_dir.iterdir() if p.suffix in (".png", ".webp")) == [
+        "0.webp",
+        "1.webp",
+        "2.png",
+    ]
+    for idx, path in enumerate(catalog.paths()):
+        with Image.open(path) as image:
+            assert np.array_equal(np.asarray(image), originals[idx])
+    assert catalog.usage()[0].shown_count == 1
+
+    # Transcoded images aren't transcoded again
+    assert StorageManager([temp_dir], params).enforce().transcoded == 1
+
+
+def test_frame_sequences_are_deleted_with_their_last_frame(temp_dir: Path) -> None:
+    catalog = ImageCatalog(temp_dir)
+    with FrameSequenceWriter(temp_dir / "0.frames") as writer:
+        for _ in range(3):
+            writer.append(b"0" * IMAGE_BYTES)
+    catalog.add([CatalogEntry(idx, f"{idx}.frame", None, None, idx) for idx in range(3)])
+    (temp_dir / "3.png").write_bytes(b"0" * IMAGE_BYTES)
+    catalog.add([CatalogEntry(3, "3.png", None, None, created_at=3)])
+    sequence_bytes = (temp_dir / "0.frames").stat().st_size
+
+    # While one of its frames is kept, deleting the others doesn't free the sequence's space
+    params = StorageParams(max_megabytes=2, eviction_policy=EvictionPolicy.OLDEST)
+    report = StorageManager([temp_dir], params).enforce(keep=[temp_dir / "2.frame"])
+    assert catalog.indices() == [2]
+    assert (temp_dir / "0.frames").is_file()
+    assert report.size_bytes == sequence_bytes
+    assert report.freed_bytes == IMAGE_BYTES
+
+    # Deleted frames aren't found again
+    assert catalog.check_consistency().untracked == []
+    assert catalog.indices() == [2]
+
+    # The sequence is deleted once it has no frames left
+    report = StorageManager([temp_dir], params).enforce()
+    assert catalog.indices() == []
+    assert not (temp_dir / "0.frames").exists()
+    assert report.freed_bytes == sequence_bytes
+    assert report.size_bytes == 0
@@ -0,0 +1,59 @@
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from portrayt.library import (
+    PREVIEW,
+    THUMBNAIL,
+    FrameSequenceWriter,
+    ImageCatalog,
+    get_thumbnail,
+    make_thumbnails,
+    thumbnail_path,
+)
+from tests.fakes import make_fake_image
+
+
+def test_thumbnails_keep_the_aspect_ratio(temp_dir: Path) -> None:
+    (temp_dir / "3.png").write_bytes(make_fake_image(1024, 512, seed=1337))
+
+    paths = make_thumbnails(temp_dir / "3.png")
+    assert [path.name for path in paths] == ["3.preview-768.webp", "3.thumb-192.webp"]
+    with Image.open(paths[0]) as preview:
+        assert preview.size == (768, 384)
+    with Image.open(paths[1]) as thumbnail:
+        assert thumbnail.size == (192, 96)
+
+    # Gallery tiles only cost a few kilobytes
+    assert paths[1].stat().st_size < 8 * 1024
+
+    # Thumbnails aren't mistaken for images
+    catalog = ImageCatalog(temp_dir)
+    assert catalog.paths() == [temp_dir / "3.png"]
+
+
+def test_small_images_are_not_enlarged(temp_dir: Path) -> None:
+    (temp_dir / "0.png").write_bytes(make_fake_image(160, 120, seed=1337))
+    with Image.open(make_thumbnails(temp_dir / "0.png")[0]) as preview:
+        assert preview.size == (160, 120)
+
+
+def test_thumbnails_are_made_when_missing(temp_dir: Path) -> None:
+    pixels = np.full((96, 128, 3), (200, 40, 10), dtype=np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, format="WEBP", lossless=True)
+    with FrameSequenceWriter(temp_dir / "5.frames") as writer:
+        writer.append(buffer.getvalue())
+
+    path = get_thumbnail(temp_dir / "5.frame", THUMBNAIL)
+    assert path == thumbnail_path(temp_dir / "5.frame", THUMBNAIL)
+    assert thumbnail_path(temp_dir / "5.frame", PREVIEW).is_file()
+    with Image.open(path) as thumbnail:
+        assert thumbnail.size == (128, 96)
+        assert np.abs(np.asarray(thumbnail, dtype=int) - (200, 40, 10)).max() < 8
+
+    with pytest.raises(FileNotFoundError):
+        get_thumbnail(temp_dir / "6.frame", THUMBNAIL)
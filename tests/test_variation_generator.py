@@ -0,0 +1,125 @@
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from PIL import Image
+from replicate.exceptions import ModelError
+
+from portrayt.configuration import PromptGenerateVariations
+from portrayt.generators import Downloader, ReplicateBackend, ResultCache, VariationGenerator
+from tests.fakes import FakePredictionBackend, FakeReplicateServer
+
+
+def fake_download(url: str, path: Path) -> None:
+    path.write_bytes(url.encode())
+
+
+@pytest.mark.parametrize("max_concurrent_predictions", [1, 3])
+def test_generate_concurrently(temp_dir: Path, max_concurrent_predictions: int) -> None:
+    backend = FakePredictionBackend(delay=0.05)
+
+    generator = VariationGenerator(
+        params=PromptGenerateVariations(
+            prompt="cool",
+            num_variations=7,
+            max_concurrent_predictions=max_concurrent_predictions,
+        ),
+        height=1,
+        width=2,
+        seed=100,
+        cache_dir=temp_dir,
+        downloader=mock.Mock(spec=Downloader, download=fake_download),
+        backend=backend,
+    )
+    generator.generate(clear_previous=False)
+    generator.generate(clear_previous=False)
+
+    assert backend.max_running == max_concurrent_predictions
+    assert backend.seeds == sorted(list(range(100, 107)) * 2)
+
+    # Each image should be named deterministically, regardless of completion order
+    for idx in range(14):
+        image_path = generator.images_dir / f"{idx}.png"
+        assert image_path.read_bytes() == f"https://fake/{100 + idx % 7}/0.png".encode()
+
+
+def test_results_are_cached(temp_dir: Path) -> None:
+    backend = FakePredictionBackend()
+    result_cache = ResultCache(temp_dir / ".result-cache", max_bytes=10_000)
+
+    generator = VariationGenerator(
+        params=PromptGenerateVariations(prompt="cool", num_variations=3),
+        height=1,
+        width=2,
+        seed=100,
+        cache_dir=temp_dir,
+        downloader=mock.Mock(spec=Downloader, download=fake_download),
+        backend=backend,
+        result_cache=result_cache,
+    )
+    generator.generate(clear_previous=True)
+    generator.generate(clear_previous=True)
+
+    # The second generation is identical, so no predictions should be repeated
+    assert backend.seeds == [100, 101, 102]
+    assert result_cache.stats.hits == 3
+    assert result_cache.stats.misses == 3
+
+    # Deleting an image shouldn't affect its cached copy
+    (generator.images_dir / "0.png").unlink()
+    generator.generate(clear_previous=True)
+
+    assert backend.seeds == [100, 101, 102]
+    assert (generator.images_dir / "0.png").read_bytes() == b"https://fake/100/0.png"
+
+
+def test_batched_predictions(temp_dir: Path) -> None:
+    backend = FakePredictionBackend()
+
+    generator = VariationGenerator(
+        params=PromptGenerateVariations(prompt="cool", num_variations=7, outputs_per_prediction=3),
+        height=1,
+        width=2,
+        seed=100,
+        cache_dir=temp_dir,
+        downloader=mock.Mock(spec=Downloader, download=fake_download),
+        backend=backend,
+    )
+    generator.generate(clear_previous=True)
+
+    # Each batch is seeded by its first variation, and its outputs are saved in order
+    assert backend.seeds == [100, 103, 106]
+    expected = [f"{seed}/{output}" for seed in (100, 103) for output in range(3)] + ["106/0"]
+    for idx, name in enumerate(expected):
+        image_path = generator.images_dir / f"{idx}.png"
+        assert image_path.read_bytes() == f"https://fake/{name}.png".encode()
+
+
+def test_generate_with_fake_replicate(temp_dir: Path) -> None:
+    with FakeReplicateServer() as server:
+        server.fail_predictions = 1
+        downloader = Downloader(backoff_seconds=0)
+        generator = VariationGenerator(
+            params=PromptGenerateVariations(
+                prompt="cool", num_variations=3, outputs_per_prediction=2
+            ),
+            height=24,
+            width=32,
+            seed=100,
+            cache_dir=temp_dir,
+            downloader=downloader,
+            backend=ReplicateBackend(server.client(), poll_seconds=0),
+        )
+
+        # A failed prediction fails the whole generation, without publishing anything
+        with pytest.raises(ModelError):
+            generator.generate(clear_previous=True)
+        assert generator.catalog.paths() == []
+
+        server.file_error_responses = [503]
+        generator.generate(clear_previous=True)
+        downloader.close()
+
+    for idx in range(3):
+        with Image.open(generator.images_dir / f"{idx}.png") as image:
+            assert image.size == (32, 24)